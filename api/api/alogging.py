@@ -8,7 +8,7 @@ import re
 from aiohttp.abc import AbstractAccessLogger
 from werkzeug.exceptions import Unauthorized
 
-from api.authentication import decode_token
+from api.authentication import get_authentication_result, validate_token
 from wazuh.core.wlogging import WazuhLogger
 
 # compile regex when the module is imported so it's not necessary to compile it everytime log.info is called
@@ -30,11 +30,12 @@ class AccessLogger(AbstractAccessLogger):
         if 'key' in body and '/agents' in request.path:
             body['key'] = '****'
         # With permanent redirect, not found responses or any response with no token information,
-        # decode the JWT token to get the username
+        # get the username from the JWT token checked for this request
         user = request.get('user', '')
         if not user:
             try:
-                user = decode_token(request.headers["authorization"][7:])["sub"]
+                token = request.headers["authorization"][7:]
+                user = get_authentication_result(('bearer', token), validate_token, token)["sub"]
             except Unauthorized:
                 user = UNKNOWN_USER_STRING
 
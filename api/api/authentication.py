@@ -3,13 +3,18 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio
+import base64
+import binascii
 import copy
 import logging
 import os
-
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from time import time
-                               
+from typing import Dict
+
+from cachetools import TTLCache
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import ec
 from jose import JWTError, jwt
@@ -29,6 +34,71 @@ from wazuh.rbac.preprocessor import optimize_resources
 
 pool = ThreadPoolExecutor(max_workers=1)
 
+# Results of the credentials checked by `authenticate_request` for the current request
+_request_credentials: ContextVar[Dict] = ContextVar('request_credentials', default={})
+
+
+async def authenticate_request(authorization, scheme):
+    """Check the credentials of the current request in the event loop.
+
+    Connexion calls `check_user` and `decode_token` synchronously. Checking the credentials of the request before it
+    reaches connexion lets those functions return the result right away instead of waiting for DAPI requests.
+
+    Parameters
+    ----------
+    authorization : str
+        Value of the Authorization header of the request.
+    scheme : str
+        Authentication scheme of the requested endpoint, 'basic' or 'bearer'. Credentials of any other scheme are left
+        to connexion, which will reject them.
+    """
+    try:
+        auth_type, credentials = authorization.split(None, 1)
+        if auth_type.lower() != scheme:
+            return
+        if scheme == 'bearer':
+            key, check = ('bearer', credentials), validate_token(credentials)
+        else:
+            user, password = base64.b64decode(credentials).decode('latin1').split(':', 1)
+            key, check = ('basic', user, password), authenticate_user(user, password)
+    except (AttributeError, ValueError, binascii.Error):
+        # Missing or malformed header, connexion will reject it
+        return
+
+    try:
+        result = await check, None
+    except Exception as e:
+        result = None, e
+    _request_credentials.set({key: result})
+
+
+def get_authentication_result(key, check, *args):
+    """Get the result of a credentials check done by `authenticate_request` for the current request.
+
+    If the credentials were not checked beforehand, the check is run now in the authentication pool.
+
+    Parameters
+    ----------
+    key : tuple
+        Type of the credentials and credentials.
+    check : callable
+        Coroutine function used to check the credentials.
+    args
+        Arguments of `check`.
+
+    Returns
+    -------
+    Result of the check.
+    """
+    try:
+        result, exc = _request_credentials.get()[key]
+    except KeyError:
+        return pool.submit(asyncio.run, check(*args)).result()
+
+    if exc is not None:
+        raise exc
+    return result
+
 
 def check_user_master(user, password):
     """This function must be executed in master node.
@@ -51,8 +121,8 @@ def check_user_master(user, password):
     return {'result': False}
 
 
-def check_user(user, password, required_scopes=None):
-    """Convenience method to use in OpenAPI specification
+async def authenticate_user(user, password):
+    """Check the credentials of a user in the master node.
 
     Parameters
     ----------
@@ -60,11 +130,10 @@ def check_user(user, password, required_scopes=None):
         Unique username
     password : str
         User password
-    required_scopes
 
     Returns
     -------
-    Dict with the username and his status
+    Dict with the username and his status. None if the credentials are not valid
     """
     dapi = DistributedAPI(f=check_user_master,
                           f_kwargs={'user': user, 'password': password},
@@ -73,7 +142,7 @@ def check_user(user, password, required_scopes=None):
                           wait_for_complete=False,
                           logger=logging.getLogger('wazuh-api')
                           )
-    data = raise_if_exc(pool.submit(asyncio.run, dapi.distribute_function()).result())
+    data = raise_if_exc(await dapi.distribute_function())
 
     if data['result']:
         return {'sub': user,
@@ -81,6 +150,24 @@ def check_user(user, password, required_scopes=None):
                 }
 
 
+def check_user(user, password, required_scopes=None):
+    """Convenience method to use in OpenAPI specification
+
+    Parameters
+    ----------
+    user : str
+        Unique username
+    password : str
+        User password
+    required_scopes
+
+    Returns
+    -------
+    Dict with the username and his status
+    """
+    return get_authentication_result(('basic', user, password), authenticate_user, user, password)
+
+
 # Set JWT settings
 JWT_ISSUER = 'wazuh'
 JWT_ALGORITHM = 'ES512'
@@ -88,6 +175,105 @@ _private_key_path = os.path.join(SECURITY_PATH, 'private_key.pem')
 _public_key_path = os.path.join(SECURITY_PATH, 'public_key.pem')
 
 
+# Tokens already validated by decode_token. Each entry is only valid while the files it was validated against
+# (RBAC database, security configuration and public key) are not modified
+TOKEN_CACHE_TTL = 30
+_validated_tokens = TTLCache(maxsize=4500, ttl=TOKEN_CACHE_TTL)
+_validated_tokens_lock = threading.Lock()
+_token_validation_files = (os.path.join(SECURITY_PATH, 'rbac.db'), SECURITY_CONFIG_PATH, _public_key_path)
+# Stamp of the master node files, kept for a few seconds by worker nodes
+MASTER_STAMP_TTL = 5
+_master_stamp = TTLCache(maxsize=1, ttl=MASTER_STAMP_TTL)
+
+
+def get_file_stamp(path):
+    """Get the inode, size and modification time of a file, which change whenever the file is modified or replaced.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+
+    Returns
+    -------
+    tuple or None
+        Inode, size and modification time of the file. None if it does not exist.
+    """
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+
+    return file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+
+
+def get_token_validation_stamp():
+    """Get the state of the files used to validate a token.
+
+    Revoking tokens, modifying users, roles or policies and changing the security configuration modify at least one of
+    these files, so a different stamp means that previously validated tokens must be checked again.
+
+    Returns
+    -------
+    tuple
+        Inode, size and modification time of each file. None for the files that do not exist.
+    """
+    return tuple(get_file_stamp(path) for path in _token_validation_files)
+
+
+def get_master_token_validation_stamp():
+    """Get the state of the files used to validate a token in the node running this function.
+
+    Returns
+    -------
+    dict
+        Stamp of the files used to validate a token.
+    """
+    return {'stamp': get_token_validation_stamp()}
+
+
+async def get_token_cache_stamp():
+    """Get the stamp validated tokens are cached with.
+
+    Tokens are checked in the master node, so revocations and security changes made there do not modify the files of
+    a worker node. Worker nodes also include the stamp of the master node, which is fetched at most once every
+    MASTER_STAMP_TTL seconds. Revocations broadcast to every node clear the cache right away.
+
+    Returns
+    -------
+    tuple
+        Stamp of the local files and, in worker nodes, stamp of the master node files.
+    """
+    stamp = get_token_validation_stamp()
+    if read_config()['node_type'] != 'worker':
+        return stamp
+
+    with _validated_tokens_lock:
+        master_stamp = _master_stamp.get('stamp')
+    if master_stamp is None:
+        dapi = DistributedAPI(f=get_master_token_validation_stamp,
+                              request_type='local_master',
+                              is_async=False,
+                              wait_for_complete=False,
+                              logger=logging.getLogger('wazuh-api')
+                              )
+        master_stamp = raise_if_exc(await dapi.distribute_function())['stamp']
+        with _validated_tokens_lock:
+            _master_stamp['stamp'] = master_stamp
+
+    return stamp, master_stamp
+
+
+def clear_token_cache():
+    """Remove all the tokens validated by decode_token.
+
+    It is called whenever tokens are revoked or the security configuration changes.
+    """
+    with _validated_tokens_lock:
+        _validated_tokens.clear()
+        _master_stamp.clear()
+
+
 def generate_keypair():
     """Generate key files to keep safe or load existing public and private keys."""
     try:
@@ -111,6 +297,32 @@ def generate_keypair():
     return private_key, public_key
 
 
+_keypair = {'stamp': None, 'keys': None}
+_keypair_lock = threading.Lock()
+
+
+def get_keypair():
+    """Get the key objects used to sign and verify tokens.
+
+    The keys are parsed once and kept in memory. They are only loaded again when the key files change on disk, for
+    instance, after the tokens are revoked.
+
+    Returns
+    -------
+    tuple
+        Private and public key objects.
+    """
+    with _keypair_lock:
+        stamp = (get_file_stamp(_private_key_path), get_file_stamp(_public_key_path))
+        if None in stamp or stamp != _keypair['stamp']:
+            private_key, public_key = generate_keypair()
+            _keypair['keys'] = (serialization.load_pem_private_key(private_key.encode(), password=None),
+                                serialization.load_pem_public_key(public_key.encode()))
+            _keypair['stamp'] = (get_file_stamp(_private_key_path), get_file_stamp(_public_key_path))
+
+        return _keypair['keys']
+
+
 def change_keypair():
     """Generate key files to keep safe."""
     key_obj = ec.generate_private_key(ec.SECP521R1())
@@ -127,6 +339,7 @@ def change_keypair():
         key_file.write(private_key)
     with open(_public_key_path, mode='w') as key_file:
         key_file.write(public_key)
+    _keypair['stamp'] = None
 
     return private_key, public_key
 
@@ -137,7 +350,7 @@ def get_security_conf():
     return copy.deepcopy(conf.security_conf)
 
 
-def generate_token(user_id=None, data=None, run_as=False):
+async def generate_token(user_id=None, data=None, run_as=False):
     """Generate an encoded jwt token. This method should be called once a user is properly logged on.
 
     Parameters
@@ -159,7 +372,7 @@ def generate_token(user_id=None, data=None, run_as=False):
                           wait_for_complete=False,
                           logger=logging.getLogger('wazuh-api')
                           )
-    result = raise_if_exc(pool.submit(asyncio.run, dapi.distribute_function()).result()).dikt
+    result = raise_if_exc(await dapi.distribute_function()).dikt
     timestamp = int(time())
 
     payload = {
@@ -173,7 +386,7 @@ def generate_token(user_id=None, data=None, run_as=False):
         "rbac_mode": result['rbac_mode']
     }
 
-    return jwt.encode(payload, generate_keypair()[0], algorithm=JWT_ALGORITHM)
+    return jwt.encode(payload, get_keypair()[0], algorithm=JWT_ALGORITHM)
 
 
 @rbac_utils.token_cache(rbac_utils.tokens_cache)
@@ -230,9 +443,32 @@ def decode_token(token):
     -------
     Dict payload ot the token
     """
+    return get_authentication_result(('bearer', token), validate_token, token)
+
+
+async def validate_token(token):
+    """Decode a jwt formatted token, check it is still valid in the master node and add processed policies.
+    Raise an Unauthorized exception in case validation fails.
+
+    Parameters
+    ----------
+    token : str
+        JWT formatted token
+
+    Returns
+    -------
+    Dict payload ot the token
+    """
+    stamp = await get_token_cache_stamp()
+    with _validated_tokens_lock:
+        cached_token = _validated_tokens.get(token)
+    if cached_token is not None and cached_token[0] == stamp and cached_token[1]['exp'] > time():
+        return copy.deepcopy(cached_token[1])
+
     try:
         # Decode JWT token with local secret
-        payload = jwt.decode(token, generate_keypair()[1], algorithms=[JWT_ALGORITHM], audience='Wazuh API REST')
+        # Keys are passed as a list so the key object is used as is instead of being parsed as a JWK
+        payload = jwt.decode(token, [get_keypair()[1]], algorithms=[JWT_ALGORITHM], audience='Wazuh API REST')
 
         # Check token and add processed policies in the Master node
         dapi = DistributedAPI(f=check_token,
@@ -244,7 +480,7 @@ def decode_token(token):
                               wait_for_complete=False,
                               logger=logging.getLogger('wazuh-api')
                               )
-        data = raise_if_exc(pool.submit(asyncio.run, dapi.distribute_function()).result()).to_dict()
+        data = raise_if_exc(await dapi.distribute_function()).to_dict()
 
         if not data['result']['valid']:
             raise Unauthorized
@@ -258,7 +494,7 @@ def decode_token(token):
                               wait_for_complete=False,
                               logger=logging.getLogger('wazuh-api')
                               )
-        result = raise_if_exc(pool.submit(asyncio.run, dapi.distribute_function()).result())
+        result = raise_if_exc(await dapi.distribute_function())
 
         current_rbac_mode = result['rbac_mode']
         current_expiration_time = result['auth_token_exp_timeout']
@@ -266,6 +502,9 @@ def decode_token(token):
                 or (payload['exp'] - payload['nbf']) != current_expiration_time:
             raise Unauthorized
 
+        with _validated_tokens_lock:
+            _validated_tokens[token] = (stamp, copy.deepcopy(payload))
+
         return payload
     except JWTError as e:
         raise Unauthorized from e
@@ -628,3 +628,49 @@ async def get_hotfixes_info(request, pretty=False, wait_for_complete=False, agen
     data = raise_if_exc(await dapi.distribute_function())
 
     return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+
+
+@check_experimental_feature_value
+async def get_agents_with_element(request, element_type, element, pretty=False, wait_for_complete=False,
+                                  agents_list='*', offset=0, limit=None):
+    """Get the agents whose syscollector inventory contains a package, hotfix or listening port.
+
+    Parameters
+    ----------
+    element_type : str
+        Type of the element: 'packages', 'hotfixes' or 'ports'.
+    element : list
+        Package name and, optionally, version; hotfix ID; or port number and, optionally, protocol.
+    pretty : bool
+        Show results in human-readable format.
+    wait_for_complete : bool
+        Disable timeout response.
+    agents_list : list
+        List of agent's IDs.
+    offset : int
+        First element to return in the collection.
+    limit : int
+        Maximum number of elements to return.
+
+    Returns
+    -------
+    web.Response
+    """
+    f_kwargs = {'agent_list': agents_list,
+                'element_type': element_type,
+                'element': element,
+                'offset': offset,
+                'limit': limit}
+
+    dapi = DistributedAPI(f=syscollector.get_agents_with_element,
+                          f_kwargs=remove_nones_to_dict(f_kwargs),
+                          request_type='distributed_master',
+                          is_async=False,
+                          wait_for_complete=wait_for_complete,
+                          logger=logger,
+                          broadcasting=agents_list == '*',
+                          rbac_permissions=request['token_info']['rbac_policies']
+                          )
+    data = raise_if_exc(await dapi.distribute_function())
+
+    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
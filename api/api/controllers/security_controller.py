@@ -55,7 +55,7 @@ async def login_user(user: str, raw: bool = False) -> web.Response:
 
     token = None
     try:
-        token = generate_token(user_id=user, data=data.dikt)
+        token = await generate_token(user_id=user, data=data.dikt)
     except WazuhException as e:
         raise_if_exc(e)
 
@@ -92,7 +92,7 @@ async def run_as_login(request, user: str, raw: bool = False) -> web.Response:
 
     token = None
     try:
-        token = generate_token(user_id=user, data=data.dikt, run_as=True)
+        token = await generate_token(user_id=user, data=data.dikt, run_as=True)
     except WazuhException as e:
         raise_if_exc(e)
 
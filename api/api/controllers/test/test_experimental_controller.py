@@ -15,7 +15,8 @@ with patch('wazuh.common.wazuh_uid'):
             clear_syscheck_database, get_cis_cat_results, get_hardware_info,
             get_hotfixes_info, get_network_address_info,
             get_network_interface_info, get_network_protocol_info, get_os_info,
-            get_packages_info, get_ports_info, get_processes_info)
+            get_packages_info, get_ports_info, get_processes_info,
+            get_agents_with_element)
         from wazuh import ciscat, rootcheck, syscheck, syscollector
         from wazuh.tests.util import RBAC_bypasser
         wazuh.rbac.decorators.expose_resources = RBAC_bypasser
@@ -478,6 +479,38 @@ async def test_get_hotfixes_info(mock_exc, mock_dapi, mock_remove, mock_dfunc, m
     assert isinstance(result, web_response.Response)
 
 
+@pytest.mark.asyncio
+@patch('api.configuration.api_conf')
+@patch('api.controllers.experimental_controller.DistributedAPI.distribute_function', return_value=AsyncMock())
+@patch('api.controllers.experimental_controller.remove_nones_to_dict')
+@patch('api.controllers.experimental_controller.DistributedAPI.__init__', return_value=None)
+@patch('api.controllers.experimental_controller.raise_if_exc', return_value=CustomAffectedItems())
+@pytest.mark.parametrize('mock_alist', ['*', ['001']])
+async def test_get_agents_with_element(mock_exc, mock_dapi, mock_remove, mock_dfunc, mock_exp, mock_alist,
+                                       mock_request=MagicMock()):
+    """Verify 'get_agents_with_element' endpoint is working as expected."""
+    result = await get_agents_with_element(request=mock_request, element_type='packages', element=['openssl'],
+                                           agents_list=mock_alist)
+    f_kwargs = {'agent_list': mock_alist,
+                'element_type': 'packages',
+                'element': ['openssl'],
+                'offset': 0,
+                'limit': None
+                }
+    mock_dapi.assert_called_once_with(f=syscollector.get_agents_with_element,
+                                      f_kwargs=mock_remove.return_value,
+                                      request_type='distributed_master',
+                                      is_async=False,
+                                      wait_for_complete=False,
+                                      logger=ANY,
+                                      broadcasting=mock_alist == '*',
+                                      rbac_permissions=mock_request['token_info']['rbac_policies']
+                                      )
+    mock_exc.assert_called_once_with(mock_dfunc.return_value)
+    mock_remove.assert_called_once_with(f_kwargs)
+    assert isinstance(result, web_response.Response)
+
+
 @patch('api.controllers.experimental_controller.raise_if_exc')
 def test_check_experimental_feature_value(mock_exc):
     @check_experimental_feature_value
@@ -13,6 +13,7 @@ from connexion.exceptions import ProblemException, OAuthProblem, Unauthorized
 from connexion.problem import problem as connexion_problem
 from secure import SecureHeaders
 
+from api.authentication import authenticate_request
 from api.configuration import api_conf
 from api.util import raise_if_exc
 from wazuh.core.exception import WazuhTooManyRequests, WazuhPermissionError
@@ -23,6 +24,9 @@ secure_headers = SecureHeaders(server="Wazuh", csp="none", xfo="DENY")
 logger = getLogger('wazuh-api')
 pool = concurrent.futures.ThreadPoolExecutor()
 
+# Endpoints authenticated with basicAuth. The rest of them use JWT tokens
+basic_auth_paths = {'/security/user/authenticate', '/security/user/authenticate/run_as'}
+
 
 def _cleanup_detail_field(detail):
     return ' '.join(str(detail).replace("\n\n", ". ").replace("\n", "").split())
@@ -119,6 +123,18 @@ async def security_middleware(request, handler):
     return await handler(request)
 
 
+@web.middleware
+async def authentication_middleware(request, handler):
+    """Check the request credentials in the event loop before connexion validates them.
+
+    Only the credentials of the scheme used by the requested endpoint are checked.
+    """
+    scheme = 'basic' if request.path in basic_auth_paths else 'bearer'
+    await authenticate_request(request.headers.get('Authorization'), scheme)
+
+    return await handler(request)
+
+
 @web.middleware
 async def response_postprocessing(request, handler):
     """Remove unwanted fields from error responses like 400 or 403.
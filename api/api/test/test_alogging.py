@@ -6,7 +6,7 @@
 import logging
 import os
 import sys
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch, MagicMock, call, ANY
 
 import pytest
 from werkzeug.exceptions import Unauthorized
@@ -31,7 +31,7 @@ def test_accesslogger_log(mock_dumps, side_effect, user):
     Parameters
     ----------
     side_effect : function
-        Side effect used in the decode_token mock.
+        Side effect used in the get_authentication_result mock.
     user : str
         User returned by the request.get function of alogging.py, which is mocked using a class.
     """
@@ -41,18 +41,18 @@ def test_accesslogger_log(mock_dumps, side_effect, user):
         def get(self, *args, **kwargs):
             return user
 
-    # Mock decode_token and logger.info
-    with patch('api.alogging.decode_token', side_effect=side_effect) as mock_decode_token:
+    # Mock get_authentication_result and logger.info
+    with patch('api.alogging.get_authentication_result', side_effect=side_effect) as mock_get_authentication_result:
         with patch('logging.Logger.info') as mock_logger_info:
 
             # Create an AccessLogger object and log a mocked call
             test_access_logger = alogging.AccessLogger(logger=logging.getLogger('test'), log_format=MagicMock())
             test_access_logger.log(request=MockedRequest(), response=MagicMock(), time=0.0)
 
-            # If not user, decode_token must be called to get the user and logger.info must be called with the user
-            # if we have token_info or UNKNOWN_USER if not
+            # If not user, get_authentication_result must be called to get the user and logger.info must be called
+            # with the user if we have token_info or UNKNOWN_USER if not
             if not user:
-                mock_decode_token.assert_called_once()
+                mock_get_authentication_result.assert_called_once_with(('bearer', ANY), alogging.validate_token, ANY)
                 expected_user = side_effect[0][
                     "sub"] if side_effect is not Unauthorized else alogging.UNKNOWN_USER_STRING
                 assert mock_logger_info.call_args.args[0].split(" ")[0] == expected_user
@@ -1,14 +1,20 @@
 # Copyright (C) 2015-2021, Wazuh Inc.
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
+import sys
 from copy import copy
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from api.middlewares import set_user_name, unlock_ip, _cleanup_detail_field, prevent_bruteforce_attack, \
-    prevent_denial_of_service, security_middleware
-from wazuh.core.exception import WazuhPermissionError, WazuhTooManyRequests
+with patch('wazuh.core.common.wazuh_uid'):
+    with patch('wazuh.core.common.wazuh_gid'):
+        sys.modules['wazuh.rbac.orm'] = MagicMock()
+        from api.middlewares import set_user_name, unlock_ip, _cleanup_detail_field, prevent_bruteforce_attack, \
+            prevent_denial_of_service, security_middleware, authentication_middleware
+        from wazuh.core.exception import WazuhPermissionError, WazuhTooManyRequests
+
+        del sys.modules['wazuh.rbac.orm']
 
 
 class DummyRequest:
@@ -136,3 +142,19 @@ async def test_middlewares_security_middleware(denial_mock, unlock_mock):
 
         denial_mock.assert_called_once_with(request, max_requests=max_req)
         unlock_mock.assert_called_once_with(request, block_time=block_time)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('path, scheme', [
+    ('/agents', 'bearer'),
+    ('/security/user/authenticate', 'basic'),
+    ('/security/user/authenticate/run_as', 'basic')
+])
+@patch('api.middlewares.authenticate_request')
+async def test_middlewares_authentication_middleware(mock_authenticate_request, path, scheme):
+    """Test `authentication_middleware` checks the request credentials of the endpoint scheme before calling the
+    handler."""
+    req = DummyRequest({'path': path, 'headers': {'Authorization': 'Bearer test_token'}})
+    await authentication_middleware(req, handler_mock)
+    mock_authenticate_request.assert_awaited_once_with('Bearer test_token', scheme)
+    handler_mock.assert_awaited_with(req)
@@ -43,7 +43,7 @@ def start(foreground, root, config_file):
     from api.api_exception import APIError
     from api.constants import CONFIG_FILE_PATH
     from api.middlewares import set_user_name, security_middleware, response_postprocessing, request_logging, \
-        set_secure_headers
+        set_secure_headers, authentication_middleware
     from api.signals import modify_response_headers
     from api.uri_parser import APIUriParser
     from api.util import to_relative_path
@@ -166,8 +166,8 @@ def start(foreground, root, config_file):
                 strict_validation=True,
                 validate_responses=False,
                 pass_context_arg_name='request',
-                options={"middlewares": [response_postprocessing, set_user_name, security_middleware, request_logging,
-                                         set_secure_headers]})
+                options={"middlewares": [response_postprocessing, set_user_name, security_middleware,
+                                         authentication_middleware, request_logging, set_secure_headers]})
 
     # Maximum body size that the API can accept (bytes)
     app.app._client_max_size = configuration.api_conf['max_upload_size']
@@ -7,6 +7,7 @@ from wazuh.core.agent import get_agents_info
 from wazuh.core.exception import WazuhError, WazuhResourceNotFound
 from wazuh.core.results import AffectedItemsWazuhResult, merge
 from wazuh.core.syscollector import WazuhDBQuerySyscollector
+from wazuh.core.utils import run_concurrently
 from wazuh.rbac.decorators import expose_resources
 
 
@@ -41,17 +42,19 @@ def get_ciscat_results(agent_list=None, offset=0, limit=common.database_limit, s
                            'notchecked': 'notchecked', 'unknown': 'unknown', 'score': 'score'}
     table = 'ciscat_results'
 
+    def get_agent_results(agent):
+        if agent not in system_agents:
+            raise WazuhResourceNotFound(1701)
+        with WazuhDBQuerySyscollector(agent_id=agent, offset=offset, limit=limit, select=select,
+                                      search=search,
+                                      sort=sort, filters=filters, fields=valid_select_fields, table=table,
+                                      array=array, nested=nested, query=q) as db_query:
+            return db_query.run()
+
     system_agents = get_agents_info()
-    for agent in agent_list:
+    for agent, query in run_concurrently(get_agent_results, agent_list):
         try:
-            if agent not in system_agents:
-                raise WazuhResourceNotFound(1701)
-            with WazuhDBQuerySyscollector(agent_id=agent, offset=offset, limit=limit, select=select,
-                                          search=search,
-                                          sort=sort, filters=filters, fields=valid_select_fields, table=table,
-                                          array=array, nested=nested, query=q) as db_query:
-                data = db_query.run()
-
+            data = query.result()
             if len(data['items']) > 0:
                 for item in data['items']:
                     item['agent_id'] = agent
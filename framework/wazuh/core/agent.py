@@ -10,7 +10,7 @@ from datetime import datetime
 from functools import lru_cache
 from json import dumps, loads
 from os import chown, chmod
-from os import listdir, path
+from os import listdir, path, scandir, stat
 from time import time
 
 from wazuh.core import common, configuration, stats
@@ -36,6 +36,8 @@ agent_regex = re.compile(r"^(\d{3,}) [^!].* .* .*$", re.MULTILINE)
 
 class WazuhDBQueryAgents(WazuhDBQuery):
 
+    rbac_id_ranges = True
+
     def __init__(self, offset=0, limit=common.database_limit, sort=None, search=None, select=None, count=True,
                  get_data=True, query='', filters=None, default_sort_field='id', min_select_fields=None,
                  remove_extra_fields=True, distinct=False, rbac_negate=True):
@@ -818,6 +820,8 @@ class Agent:
             if new_file:
                 chown(agent_group_path, common.wazuh_uid(), common.wazuh_gid())
                 chmod(agent_group_path, 0o660)
+
+            agent_groups_index.update(agent_id)
         except Exception as e:
             raise WazuhInternalError(1005, extra_message=str(e))
 
@@ -954,16 +958,51 @@ def send_restart_command(agent_id: str = '', agent_version: str = '', wq: WazuhQ
     return ret_msg
 
 
-@common.context_cached('system_agents')
+class ClientKeysIndex:
+    """In-memory index of the agent IDs registered in the client.keys file.
+
+    The file is only parsed again when its inode, size or modification time changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._agent_ids = frozenset({'000'})
+
+    def get_agent_ids(self):
+        """Get the IDs of the agents registered in the system, parsing client.keys again if it has changed.
+
+        Returns
+        -------
+        frozenset
+            Agent IDs, including the manager one.
+        """
+        file_stat = stat(common.client_keys)
+        stamp = (common.client_keys, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+        with self._lock:
+            if stamp != self._stamp:
+                with open(common.client_keys, 'r') as f:
+                    file_content = f.read()
+                self._agent_ids = frozenset(agent_regex.findall(file_content)) | {'000'}
+                self._stamp = stamp
+
+            return self._agent_ids
+
+
+client_keys_index = ClientKeysIndex()
+
+
 def get_agents_info():
-    """Get all agent IDs in the system."""
-    with open(common.client_keys, 'r') as f:
-        file_content = f.read()
+    """Get all agent IDs in the system.
 
-    result = set(agent_regex.findall(file_content))
-    result.add('000')
+    The indexed set is returned as is, callers needing to modify it must make their own copy.
 
-    return result
+    Returns
+    -------
+    frozenset
+        Agent IDs, including the manager one.
+    """
+    return client_keys_index.get_agent_ids()
 
 
 @common.context_cached('system_groups')
@@ -979,6 +1018,129 @@ def get_groups():
     return groups
 
 
+class AgentGroupsIndex:
+    """In-memory index of the agent-group assignments stored in the agent-groups directory.
+
+    Every agent group file is indexed along with its inode, size and modification time. Refreshing the index only
+    needs to stat the directory entries, reading again just the files which have changed since the last refresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path = None
+        self._files = {}
+        self._group_agents = {}
+        self._assigned_agents = set()
+
+    @staticmethod
+    def _read_groups(file_path):
+        """Get the groups listed in an agent group file.
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the agent group file.
+
+        Returns
+        -------
+        tuple
+            Groups the agent belongs to. Files with more than one line are not valid and do not list any group.
+        """
+        with open(file_path, 'r') as f:
+            file_content = f.readlines()
+
+        return tuple(file_content[0].strip().split(',')) if len(file_content) == 1 else ()
+
+    def _set(self, agent_id, stamp, groups):
+        """Replace the indexed groups of an agent. A `None` stamp removes the agent from the index."""
+        _, old_groups = self._files.pop(agent_id, (None, ()))
+        for group in old_groups:
+            agents = self._group_agents.get(group)
+            if agents is not None:
+                agents.discard(agent_id)
+                agents or self._group_agents.pop(group)
+        self._assigned_agents.discard(agent_id)
+
+        if stamp is not None:
+            self._files[agent_id] = (stamp, groups)
+            for group in groups:
+                self._group_agents.setdefault(group, set()).add(agent_id)
+            # Stamp is (inode, size, mtime). Agents with an empty group file are not assigned to any group
+            stamp[1] > 0 and self._assigned_agents.add(agent_id)
+
+    def _update_entry(self, agent_id, file_path, stat_result):
+        """Reindex an agent group file if its stat stamp has changed."""
+        stamp = (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+        indexed = self._files.get(agent_id)
+        if indexed is None or indexed[0] != stamp:
+            self._set(agent_id, stamp, self._read_groups(file_path))
+
+    def _check_path(self):
+        """Drop the index if the agent-groups directory has changed."""
+        if self._path != common.groups_path:
+            self._path = common.groups_path
+            self._files, self._group_agents, self._assigned_agents = {}, {}, set()
+
+    def refresh(self):
+        """Synchronize the index with the agent-groups directory."""
+        with self._lock:
+            self._check_path()
+            found = set()
+            with scandir(self._path) as entries:
+                for entry in entries:
+                    try:
+                        self._update_entry(entry.name, entry.path, entry.stat())
+                        found.add(entry.name)
+                    except FileNotFoundError:
+                        # Agent group removed while running through listed dir
+                        pass
+
+            for agent_id in self._files.keys() - found:
+                self._set(agent_id, None, ())
+
+    def update(self, agent_id):
+        """Reindex the group file of a single agent.
+
+        Parameters
+        ----------
+        agent_id : str
+            ID of the agent whose group file has been written or removed.
+        """
+        with self._lock:
+            self._check_path()
+            file_path = path.join(self._path, agent_id)
+            try:
+                self._update_entry(agent_id, file_path, stat(file_path))
+            except FileNotFoundError:
+                self._set(agent_id, None, ())
+
+    def get_agents(self, group_name):
+        """Get the agents which belong to a group.
+
+        Parameters
+        ----------
+        group_name : str
+            Name of the group. '*' returns the agents assigned to any group.
+
+        Returns
+        -------
+        set
+            IDs of the agents in the group.
+        """
+        with self._lock:
+            return set(self._assigned_agents) if group_name == '*' else set(self._group_agents.get(group_name, ()))
+
+
+agent_groups_index = AgentGroupsIndex()
+
+
+@common.context_cached('system_agent_groups_index')
+def refresh_agent_groups_index():
+    """Refresh the agent-groups index once per request."""
+    agent_groups_index.refresh()
+    return True
+
+
 @common.context_cached('system_expanded_groups')
 def expand_group(group_name):
     """Expand a certain group or all (*) of them
@@ -986,26 +1148,9 @@ def expand_group(group_name):
     :param group_name: Name of the group to be expanded
     :return: List of agents ids
     """
-    agents_ids = set()
-    if group_name == '*':
-        for file in listdir(common.groups_path):
-            try:
-                if path.getsize(path.join(common.groups_path, file)) > 0:
-                    agents_ids.add(file)
-            except FileNotFoundError:
-                # Agent group removed while running through listed dir
-                pass
-    else:
-        for file in listdir(common.groups_path):
-            try:
-                with open(path.join(common.groups_path, file), 'r') as f:
-                    file_content = f.readlines()
-                len(file_content) == 1 and group_name in file_content[0].strip().split(',') and agents_ids.add(file)
-            except FileNotFoundError:
-                # Agent group removed while running through listed dir
-                pass
+    refresh_agent_groups_index()
 
-    return agents_ids & get_agents_info()
+    return agent_groups_index.get_agents(group_name) & get_agents_info()
 
 
 @lru_cache()
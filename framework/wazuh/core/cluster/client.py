@@ -177,6 +177,8 @@ class AbstractClient(common.Handler):
         else:
             self.logger.info("Sucessfully connected to master.")
             self.connected = True
+            self.handshake_done = True
+            asyncio.create_task(self.negotiate_features())
 
     def connection_made(self, transport):
         """Define process of connecting to the server.
@@ -12,11 +12,16 @@ import random
 import re
 import struct
 import traceback
+import zlib
 from importlib import import_module
 from typing import Tuple, Dict, Callable, List
 from uuid import uuid4
 
+import cryptography.exceptions
 import cryptography.fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 import wazuh.core.cluster.utils
 import wazuh.core.results as wresults
@@ -59,28 +64,34 @@ class InBuffer:
     """
 
     divide_flag = b'd'  # flag used to indicate the message is divided
+    divide_total_format = '!Q'  # format of the total size announced in the first part of a divided message
 
-    def __init__(self, total=0):
+    def __init__(self, total=0, preallocate=None):
         """Class constructor.
 
         Parameters
         ----------
         total : int
-            Size of the payload buffer in bytes.
+            Size of the payload in bytes.
+        preallocate : int
+            Bytes of the payload buffer allocated beforehand. The buffer grows as data is received beyond this size.
+            By default, the whole payload is allocated.
         """
-        self.payload = bytearray(total)  # array to store the message's data
+        self.payload = bytearray(total if preallocate is None else min(total, preallocate))  # message's data
         self.total = total  # total of bytes to receive
         self.received = 0  # number of received bytes
         self.cmd = ''  # request's command in header
         self.flag_divided = b''  # request's command flag to indicate a msg division
         self.counter = 0  # request's counter in the box
 
-    def get_info_from_header(self, header: bytes, header_format: str, header_size: int) -> bytes:
+    def get_info_from_header(self, header: memoryview, header_format: str, header_size: int) -> memoryview:
         """Get information contained in the request's header.
 
+        The header is unpacked in place, so no copy of the received buffer is made.
+
         Parameters
         ----------
-        header : bytes
+        header : memoryview
             Raw header to process.
         header_format : str
             Struct format of the header.
@@ -89,10 +100,11 @@ class InBuffer:
 
         Returns
         -------
-        header : bytes
+        header : memoryview
             Buffer without the content of the header.
         """
-        self.counter, self.total, cmd = struct.unpack(header_format, header[:header_size])
+        header = memoryview(header)
+        self.counter, self.total, cmd = struct.unpack_from(header_format, header)
         # The last Byte of the command is the flag indicating the division
         flag = cmd[-1:]
         self.flag_divided = flag if flag == InBuffer.divide_flag else b''
@@ -102,20 +114,25 @@ class InBuffer:
         self.payload = bytearray(self.total)
         return header[header_size:]
 
-    def receive_data(self, data: bytes) -> bytes:
+    def receive_data(self, data: memoryview) -> memoryview:
         """Add received data to payload bytearray.
 
+        Data is copied straight into the preallocated payload, which is extended if needed, and the remaining buffer is
+        returned as a view, so received bytes are only copied once.
+
         Parameters
         ----------
-        data : bytes
+        data : memoryview
             Received data.
 
         Returns
         -------
-            Extended data buffer.
+        memoryview
+            Data not belonging to this message.
         """
-        len_data = len(data[:self.total - self.received])
-        self.payload[self.received:len_data + self.received] = data[:self.total - self.received]
+        data = memoryview(data)
+        len_data = min(len(data), self.total - self.received)
+        self.payload[self.received:self.received + len_data] = data[:len_data]
         self.received += len_data
         return data[len_data:]
 
@@ -244,6 +261,13 @@ class Handler(asyncio.Protocol):
     Define common methods for echo clients and servers.
     """
 
+    aead_flag = b'\x01'  # first byte of AEAD encrypted payloads. Fernet tokens always start with b'g'
+    aead_nonce_size = 12  # size in bytes of the nonce used in each AEAD encryption
+    aead_overhead = len(aead_flag) + aead_nonce_size + 16  # flag, nonce and authentication tag
+    aead_data_format = '!IQ??'  # message ID, offset of the part, final part and compression flags authenticated
+    compression_flag = b'\x02'  # first byte of compressed payloads, placed before the encrypted data
+    available_features = (b'aesgcm', b'zlib')  # optional features that can be negotiated with the peer
+
     def __init__(self, fernet_key: str, cluster_items: Dict, logger: logging.Logger = None, tag: str = "Handler"):
         """Class constructor.
 
@@ -264,7 +288,7 @@ class Handler(asyncio.Protocol):
         self.counter = random.SystemRandom().randint(0, 2 ** 32 - 1)
         # The box stores all sent messages IDs.
         self.box = {}
-        # The div_msg_box stores all divided messages under its IDs.
+        # The div_msg_box stores the buffers of all divided messages under its IDs.
         self.div_msg_box = {}
         # Defines command length.
         self.cmd_len = 12
@@ -272,8 +296,10 @@ class Handler(asyncio.Protocol):
         self.header_len = self.cmd_len + 8  # 4 bytes of counter and 4 bytes of message size
         # Defines header format.
         self.header_format = f'!2I{self.cmd_len}s'
-        # Stores received data.
-        self.in_buffer = b''
+        # Stores received data not processed yet.
+        self.in_buffer = memoryview(b'')
+        # Stores the first bytes of a header split between several reads.
+        self.in_header = bytearray()
         # Stores last received message.
         self.in_msg = InBuffer()
         # Stores incoming file information from file commands.
@@ -282,8 +308,28 @@ class Handler(asyncio.Protocol):
         self.in_str = {}
         # Maximum message length to send in a single request.
         self.request_chunk = 5242880
+        # Maximum size a received divided message can announce.
+        self.max_divided_message_size = 1073741824
+        # Whether the peer has been identified. Until then, only one divided message can be received at a time.
+        self.handshake_done = False
+        # Size of the file chunks read from disk and sent in each file update.
+        self.file_chunk = 2097152
+        # Maximum number of file updates waiting for a response at the same time.
+        self.max_file_chunks_in_flight = 4
+        # Event set while the transport write buffer is below its high-water mark.
+        self.writable = asyncio.Event()
+        self.writable.set()
         # Object use to encrypt and decrypt requests.
         self.my_fernet = cryptography.fernet.Fernet(base64.b64encode(fernet_key.encode())) if fernet_key else None
+        # Object used to encrypt and decrypt requests with AES-GCM. It uses a key derived from the same shared key.
+        self.my_aead = AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                                   info=b'wazuh cluster aesgcm').derive(fernet_key.encode())) if fernet_key else None
+        # Optional features negotiated with the peer.
+        self.features = set()
+        # Minimum payload size to compress, if the zlib feature was negotiated with the peer.
+        self.compression_threshold = 1024
+        # Level used to compress payloads. Lower levels are faster.
+        self.compression_level = 1
         # Logging.Logger object used to write logs.
         self.logger = logging.getLogger('wazuh') if not logger else logger
         # Logging tag.
@@ -304,6 +350,20 @@ class Handler(asyncio.Protocol):
         """
         self.transport.write(message)
 
+    def pause_writing(self):
+        """Stop sending file chunks until the transport write buffer is drained.
+
+        This method overrides asyncio.protocols.BaseProtocol.pause_writing.
+        """
+        self.writable.clear()
+
+    def resume_writing(self):
+        """Resume sending file chunks once the transport write buffer is drained.
+
+        This method overrides asyncio.protocols.BaseProtocol.resume_writing.
+        """
+        self.writable.set()
+
     def next_counter(self) -> int:
         """Increase the message ID counter.
 
@@ -321,6 +381,10 @@ class Handler(asyncio.Protocol):
         Each message contains a header in self.header_format format that includes self.counter, the data size and the
         command. The data is also encrypted and added to the bytearray starting from the position self.header_len.
 
+        If the zlib feature was negotiated with the peer, data larger than self.compression_threshold is compressed
+        before encrypting it. If the AES-GCM feature was negotiated, each message payload is encrypted on its own.
+        Otherwise, the whole data is encrypted with Fernet before dividing it.
+
         Parameters
         ----------
         command : bytes
@@ -342,14 +406,29 @@ class Handler(asyncio.Protocol):
 
         # Adds - to command until it reaches cmd length
         command = command + b' ' + b'-' * (self.cmd_len - cmd_len - 1)
-        encrypted_data = self.my_fernet.encrypt(data) if self.my_fernet is not None else data
-        message_size = self.header_len + len(encrypted_data)
+        compression_flag = b''
+        if b'zlib' in self.features and len(data) >= self.compression_threshold:
+            compressed_data = zlib.compress(data, self.compression_level)
+            # Data that does not shrink, like zip files, is sent as it is.
+            if len(compressed_data) < len(data):
+                data, compression_flag = compressed_data, self.compression_flag
+        if self.my_aead is not None and b'aesgcm' in self.features:
+            encrypt_chunk = self.aead_encrypt
+            overhead = self.aead_overhead
+        else:
+            data = self.my_fernet.encrypt(data) if self.my_fernet is not None else data
+            encrypt_chunk = None
+            overhead = 0
+        message_size = self.header_len + len(compression_flag) + len(data) + overhead
 
         # Message size is <= request_chunk, send the message
         if message_size <= self.request_chunk:
-            msg = bytearray(message_size)
-            msg[:self.header_len] = struct.pack(self.header_format, counter, len(encrypted_data), command)
-            msg[self.header_len:message_size] = encrypted_data
+            payload = encrypt_chunk(data, counter, compressed=bool(compression_flag)) if encrypt_chunk else data
+            payload_start = self.header_len + len(compression_flag)
+            msg = bytearray(payload_start + len(payload))
+            struct.pack_into(self.header_format, msg, 0, counter, len(compression_flag) + len(payload), command)
+            msg[self.header_len:payload_start] = compression_flag
+            msg[payload_start:] = payload
             return [msg]
 
         # Message size > request_chunk, send the message divided
@@ -358,26 +437,141 @@ class Handler(asyncio.Protocol):
             command = command[:-len(InBuffer.divide_flag)] + InBuffer.divide_flag
             msg_list = []
             partial_data_size = 0
-            data_size = len(encrypted_data)
+            data_size = len(data)
+            data = memoryview(data)
+            # The first divided message announces the whole size, so the peer can allocate it only once.
+            announced_size = struct.pack(InBuffer.divide_total_format, data_size)
             while partial_data_size < data_size:
-                message_size = self.request_chunk \
-                    if data_size - partial_data_size + self.header_len >= self.request_chunk \
-                    else data_size - partial_data_size + self.header_len
+                # Every part is flagged when the data is compressed.
+                prefix = compression_flag if msg_list else compression_flag + announced_size
+                chunk_size = min(self.request_chunk - self.header_len - len(prefix) - overhead,
+                                 data_size - partial_data_size)
 
                 # Last divided message, remove the flag
-                if message_size == data_size - partial_data_size + self.header_len:
+                final = partial_data_size + chunk_size == data_size
+                if final:
                     command = command[:-len(InBuffer.divide_flag)] + b'-' * len(InBuffer.divide_flag)
 
-                msg = bytearray(message_size)
-                msg[:self.header_len] = struct.pack(self.header_format, counter, message_size - self.header_len,
-                                                    command)
-                msg[self.header_len:message_size] = encrypted_data[
-                                                    partial_data_size:partial_data_size + message_size - self.header_len]
-                partial_data_size += message_size - self.header_len
+                chunk = data[partial_data_size:partial_data_size + chunk_size]
+                if encrypt_chunk:
+                    chunk = encrypt_chunk(chunk, counter, partial_data_size, final, bool(compression_flag))
+                payload_start = self.header_len + len(prefix)
+                msg = bytearray(payload_start + len(chunk))
+                struct.pack_into(self.header_format, msg, 0, counter, len(prefix) + len(chunk), command)
+                msg[self.header_len:payload_start] = prefix
+                msg[payload_start:] = chunk
+                partial_data_size += chunk_size
                 msg_list.append(msg)
 
             return msg_list
 
+    def aead_encrypt(self, data: bytes, counter: int, offset: int = 0, final: bool = True,
+                     compressed: bool = False) -> bytes:
+        """Encrypt data with AES-GCM.
+
+        The message ID, the position of the part in a divided message and the compression flag are authenticated too,
+        so the encrypted data can not be replayed under a different ID, reordered, swapped or truncated.
+
+        Parameters
+        ----------
+        data : bytes
+            Data to encrypt.
+        counter : int
+            Message ID.
+        offset : int
+            Position of the data in the whole message.
+        final : bool
+            Whether the data is the last part of the message or not.
+        compressed : bool
+            Whether the message is compressed or not.
+
+        Returns
+        -------
+        bytes
+            AEAD flag, nonce and encrypted data.
+        """
+        nonce = os.urandom(self.aead_nonce_size)
+        return self.aead_flag + nonce + self.my_aead.encrypt(
+            nonce, bytes(data), struct.pack(self.aead_data_format, counter, offset, final, compressed))
+
+    def is_aead_encrypted(self, data: bytes) -> bool:
+        """Check whether received data was encrypted with AES-GCM.
+
+        Parameters
+        ----------
+        data : bytes
+            Received data.
+
+        Returns
+        -------
+        bool
+            Whether the data starts with the AEAD flag or not.
+        """
+        return self.my_aead is not None and data[:len(self.aead_flag)] == self.aead_flag
+
+    def split_compression_flag(self, data: bytes) -> Tuple[memoryview, bool]:
+        """Remove the compression flag from received data, if present.
+
+        The flag is placed before the encrypted data, which never starts with it. Therefore, it is only looked for
+        when encryption is used.
+
+        Parameters
+        ----------
+        data : bytes
+            Received data.
+
+        Returns
+        -------
+        memoryview
+            Received data without the compression flag.
+        bool
+            Whether the data is compressed or not.
+        """
+        data = memoryview(data)
+        if self.my_fernet is not None and data[:len(self.compression_flag)] == self.compression_flag:
+            return data[len(self.compression_flag):], True
+        return data, False
+
+    def decrypt(self, data: bytes, counter: int, offset: int = 0, final: bool = True,
+                compressed: bool = False) -> bytes:
+        """Decrypt received data.
+
+        Data encrypted with AES-GCM is identified by its first byte, so both ciphers can be received at any time.
+
+        Parameters
+        ----------
+        data : bytes
+            Received data.
+        counter : int
+            Message ID.
+        offset : int
+            Position of the data in the whole message. Only authenticated by AES-GCM.
+        final : bool
+            Whether the data is the last part of the message or not. Only authenticated by AES-GCM.
+        compressed : bool
+            Whether the message is compressed or not. Only authenticated by AES-GCM.
+
+        Raises
+        ------
+        WazuhClusterError(3025)
+            If the data could not be decrypted.
+
+        Returns
+        -------
+        bytes
+            Decrypted data.
+        """
+        if self.my_fernet is None:
+            return bytes(data)
+        try:
+            if self.is_aead_encrypted(data):
+                nonce_end = len(self.aead_flag) + self.aead_nonce_size
+                return self.my_aead.decrypt(bytes(data[len(self.aead_flag):nonce_end]), bytes(data[nonce_end:]),
+                                            struct.pack(self.aead_data_format, counter, offset, final, compressed))
+            return self.my_fernet.decrypt(bytes(data))
+        except (cryptography.fernet.InvalidToken, cryptography.exceptions.InvalidTag):
+            raise exception.WazuhClusterError(3025)
+
     def msg_parse(self) -> bool:
         """Parse an incoming message.
 
@@ -386,21 +580,29 @@ class Handler(asyncio.Protocol):
         bool
             Whether a message was parsed or not.
         """
-        if self.in_buffer:
-            # Check if a new message was received.
-            if self.in_msg.received == 0 and len(self.in_buffer) >= self.header_len:
-                # A new message has been received. Both header and payload must be processed.
+        if not self.in_buffer:
+            return False
+
+        # Check if a new message was received. Its header must be processed before the payload.
+        if self.in_msg.total == 0:
+            if self.in_header or len(self.in_buffer) < self.header_len:
+                # The header is split between several reads. Only its missing bytes are kept until it is complete.
+                missing = self.header_len - len(self.in_header)
+                self.in_header += self.in_buffer[:missing]
+                self.in_buffer = self.in_buffer[missing:]
+                if len(self.in_header) < self.header_len:
+                    return False
+                self.in_msg.get_info_from_header(header=self.in_header, header_format=self.header_format,
+                                                 header_size=self.header_len)
+                self.in_header = bytearray()
+            else:
                 self.in_buffer = self.in_msg.get_info_from_header(header=self.in_buffer,
                                                                   header_format=self.header_format,
                                                                   header_size=self.header_len)
-                self.in_buffer = self.in_msg.receive_data(data=self.in_buffer)
-                return True
-            elif self.in_msg.received != 0:
-                # The previous message has not been completely received yet. No header to parse, just payload.
-                self.in_buffer = self.in_msg.receive_data(data=self.in_buffer)
-                return True
 
-        return False
+        # Copy the payload straight into the message buffer.
+        self.in_buffer = self.in_msg.receive_data(data=self.in_buffer)
+        return True
 
     def get_messages(self) -> Tuple[bytes, int, bytes, bytes]:
         """Get received command, counter, payload and flag_divided.
@@ -424,13 +626,15 @@ class Handler(asyncio.Protocol):
 
         while parsed:
             if self.in_msg.received == self.in_msg.total:
-                # Decrypt received message if it is not a part of a divided message
-                try:
-                    decrypted_payload = self.my_fernet.decrypt(bytes(self.in_msg.payload)) if self.my_fernet is not \
-                        None and not self.in_msg.flag_divided and self.in_msg.counter not in self.div_msg_box \
-                        else bytes(self.in_msg.payload)
-                except cryptography.fernet.InvalidToken:
-                    raise exception.WazuhClusterError(3025)
+                # Decrypt received message if it is not a part of a divided message. Parts are copied into the
+                # divided message buffer, so they are returned as they are.
+                if self.in_msg.flag_divided or self.in_msg.counter in self.div_msg_box:
+                    decrypted_payload = self.in_msg.payload
+                else:
+                    payload, compressed = self.split_compression_flag(self.in_msg.payload)
+                    decrypted_payload = self.decrypt(payload, self.in_msg.counter, compressed=compressed)
+                    if compressed:
+                        decrypted_payload = zlib.decompress(decrypted_payload)
                 yield self.in_msg.cmd, self.in_msg.counter, decrypted_payload, self.in_msg.flag_divided
                 self.in_msg = InBuffer()
             else:
@@ -478,6 +682,10 @@ class Handler(asyncio.Protocol):
     async def send_file(self, filename: str) -> bytes:
         """Send a file to peer, slicing it into chunks.
 
+        The file is read from disk in chunks of self.file_chunk bytes while its checksum is calculated. No more than
+        self.max_file_chunks_in_flight chunks wait for a response at the same time and no chunk is sent while the
+        transport is paused, so memory usage does not depend on the file size.
+
         Parameters
         ----------
         filename : str
@@ -498,10 +706,30 @@ class Handler(asyncio.Protocol):
 
         # Send each chunk so it is updated in the destination.
         file_hash = hashlib.sha256()
-        with open(filename, 'rb') as f:
-            data = f.read()
-            await self.send_request(command=b'file_upd', data=relative_path + b' ' + data)
-            file_hash.update(data)
+        timeout = self.cluster_items['intervals']['communication']['timeout_cluster_request']
+        pending = set()
+        try:
+            with open(filename, 'rb') as f:
+                while data := f.read(self.file_chunk):
+                    file_hash.update(data)
+                    if len(pending) >= self.max_file_chunks_in_flight:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            task.result()
+                    try:
+                        await asyncio.wait_for(self.writable.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        raise exception.WazuhClusterError(3020)
+                    # Tasks run in creation order, so chunks are pushed to the transport in the same order.
+                    pending.add(asyncio.create_task(
+                        self.send_request(command=b'file_upd', data=relative_path + b' ' + data)))
+            if pending:
+                done, pending = await asyncio.wait(pending)
+                for task in done:
+                    task.result()
+        finally:
+            for task in pending:
+                task.cancel()
 
         # Close the destination file descriptor so the file in memory is dumped to disk.
         await self.send_request(command=b'file_end', data=relative_path + b' ' + file_hash.digest())
@@ -603,25 +831,40 @@ class Handler(asyncio.Protocol):
         message : bytes
             Received data.
         """
-        self.in_buffer += message
+        self.in_buffer = memoryview(message)
         for command, counter, payload, flag_divided in self.get_messages():
             # If the message is a divided one
             if flag_divided == InBuffer.divide_flag:
-                try:
-                    self.div_msg_box[counter] = self.div_msg_box[counter] + payload
-                except KeyError:
-                    self.div_msg_box[counter] = payload
+                payload, compressed = self.split_compression_flag(payload)
+                if counter not in self.div_msg_box:
+                    if self.div_msg_box and not self.handshake_done:
+                        raise exception.WazuhClusterError(3041)
+                    # The first part announces the whole size. Only a few parts are allocated beforehand, so the
+                    # announced size is not committed until the data actually arrives.
+                    total, = struct.unpack_from(InBuffer.divide_total_format, payload)
+                    if total > self.max_divided_message_size:
+                        raise exception.WazuhClusterError(3040, extra_message=str(total))
+                    self.div_msg_box[counter] = InBuffer(total=total, preallocate=4 * self.request_chunk)
+                    payload = payload[struct.calcsize(InBuffer.divide_total_format):]
+                # Parts encrypted with AES-GCM are decrypted on their own.
+                if self.is_aead_encrypted(payload):
+                    payload = self.decrypt(payload, counter, self.div_msg_box[counter].received, False, compressed)
+                self.div_msg_box[counter].receive_data(payload)
             else:
                 # If the message is the last part of a division, join it.
                 if counter in self.div_msg_box:
-                    payload = self.div_msg_box[counter] + payload
-                    del self.div_msg_box[counter]
-                    # Decrypt the joined payload
-                    try:
-                        payload = self.my_fernet.decrypt(bytes(payload)) if self.my_fernet is not \
-                            None else bytes(payload)
-                    except cryptography.fernet.InvalidToken:
-                        raise exception.WazuhClusterError(3025)
+                    div_msg = self.div_msg_box.pop(counter)
+                    payload, compressed = self.split_compression_flag(payload)
+                    aead_encrypted = self.is_aead_encrypted(payload)
+                    if aead_encrypted:
+                        payload = self.decrypt(payload, counter, div_msg.received, True, compressed)
+                    if div_msg.received + len(payload) != div_msg.total:
+                        raise exception.WazuhClusterError(3037)
+                    div_msg.receive_data(payload)
+                    # Decrypt the joined payload, unless each part was decrypted on its own.
+                    payload = bytes(div_msg.payload) if aead_encrypted else self.decrypt(div_msg.payload, counter)
+                    if compressed:
+                        payload = zlib.decompress(payload)
 
                 # If the message is the response of a previously sent request.
                 if counter in self.box:
@@ -695,6 +938,8 @@ class Handler(asyncio.Protocol):
             return self.process_error_str(data)
         elif command == b"file_end":
             return self.end_file(data)
+        elif command == b'features':
+            return self.set_features(data)
         else:
             return self.process_unknown_cmd(command)
 
@@ -720,6 +965,48 @@ class Handler(asyncio.Protocol):
         else:
             return b"Unkown response command received: " + command
 
+    def get_supported_features(self) -> List[bytes]:
+        """Get the optional features this node can use with the peer.
+
+        All of them rely on the flags placed before encrypted payloads, so they are only supported when a key is used.
+
+        Returns
+        -------
+        list
+            Names of the supported features.
+        """
+        return list(self.available_features) if self.my_fernet is not None else []
+
+    async def negotiate_features(self):
+        """Offer the supported optional features to the peer and enable the ones it accepts.
+
+        Peers that do not know the 'features' command reply with an error, so no feature is enabled.
+        """
+        response = await self.send_request(command=b'features', data=b','.join(self.get_supported_features()))
+        if isinstance(response, bytes) and not response.startswith(b'Error'):
+            self.features = set(response.split(b',')) & set(self.get_supported_features())
+        self.logger.debug(f"Negotiated features: {b','.join(sorted(self.features)).decode() or 'none'}.")
+
+    def set_features(self, data: bytes) -> Tuple[bytes, bytes]:
+        """Enable the optional features offered by the peer that this node supports.
+
+        Received messages are decoded according to their content, so features can be enabled at any time.
+
+        Parameters
+        ----------
+        data : bytes
+            Comma separated names of the features offered by the peer.
+
+        Returns
+        -------
+        bytes
+            Result.
+        bytes
+            Comma separated names of the enabled features.
+        """
+        self.features = set(data.split(b',')) & set(self.get_supported_features())
+        return b'ok', b','.join(sorted(self.features))
+
     def echo(self, data: bytes) -> Tuple[bytes, bytes]:
         """Define response to 'echo' command.
 
@@ -3,16 +3,18 @@
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio
+import fnmatch
 import itertools
 import json
 import logging
 import operator
 import os
 import time
+from abc import ABC, abstractmethod
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from copy import copy, deepcopy
-from functools import reduce
+from functools import partial, reduce
 from operator import or_
 from typing import Callable, Dict, Tuple, List
 
@@ -31,7 +33,69 @@ from wazuh.core.cluster.cluster import check_cluster_status
 from wazuh.core.exception import WazuhException, WazuhClusterError, WazuhError
 from wazuh.core.wazuh_socket import wazuh_sendsync
 
-threadpool = ThreadPoolExecutor(max_workers=1)
+default_executor_pools = {'default': {'type': 'thread', 'max_workers': 1}}
+# Functions whose offset and limit apply to the whole result instead of to each agent.
+globally_paginated_functions = {'wazuh.syscollector.get_agents_with_element'}
+executors = {}
+
+
+def get_executor(pool_name: str, pools: Dict) -> Executor:
+    """Get the executor of a pool, creating it the first time it is used in the process.
+
+    Parameters
+    ----------
+    pool_name : str
+        Name of the pool.
+    pools : dict
+        Pools configuration. Each pool defines its `type` ('thread' or 'process') and its `max_workers`.
+
+    Returns
+    -------
+    Executor
+        ThreadPoolExecutor or ProcessPoolExecutor of the pool.
+    """
+    if pool_name not in executors:
+        pool = pools[pool_name]
+        executor_class = ProcessPoolExecutor if pool.get('type', 'thread') == 'process' else ThreadPoolExecutor
+        executors[pool_name] = executor_class(max_workers=pool.get('max_workers', 1))
+    return executors[pool_name]
+
+
+def run_local(f: Callable, f_kwargs: Dict, rbac_permissions: Dict, broadcasting: bool, nodes: list,
+              current_user: str, origin_module: str):
+    """Execute a framework function with the context of an API request.
+
+    It is a module function so it can also be sent to the workers of a process pool.
+
+    Parameters
+    ----------
+    f : callable
+        Function to be executed.
+    f_kwargs : dict
+        Arguments to be passed to function `f`.
+    rbac_permissions : dict
+        RBAC user's permissions.
+    broadcasting : bool
+        True if the request needs to be executed in all managers.
+    nodes : list
+        List of system nodes.
+    current_user : str
+        User who started the request.
+    origin_module : str
+        Module the request comes from.
+
+    Returns
+    -------
+    Result of the function.
+    """
+    common.rbac.set(rbac_permissions)
+    common.broadcast.set(broadcasting)
+    common.cluster_nodes.set(nodes)
+    common.current_user.set(current_user)
+    common.origin_module.set(origin_module)
+    data = f(**f_kwargs)
+    common.reset_context_cache()
+    return data
 
 
 class DistributedAPI:
@@ -231,18 +295,6 @@ class DistributedAPI:
             JSON response.
         """
 
-        def run_local():
-            self.debug_log("Starting to execute request locally")
-            common.rbac.set(self.rbac_permissions)
-            common.broadcast.set(self.broadcasting)
-            common.cluster_nodes.set(self.nodes)
-            common.current_user.set(self.current_user)
-            common.origin_module.set(self.origin_module)
-            data = self.f(**self.f_kwargs)
-            common.reset_context_cache()
-            self.debug_log("Finished executing request locally")
-            return data
-
         try:
             if self.f_kwargs.get('agent_list') == '*':
                 del self.f_kwargs['agent_list']
@@ -258,13 +310,17 @@ class DistributedAPI:
                 self.f_kwargs[self.local_client_arg] = lc
 
             try:
+                self.debug_log("Starting to execute request locally")
+                local_request = partial(run_local, self.f, self.f_kwargs, self.rbac_permissions, self.broadcasting,
+                                        self.nodes, self.current_user, self.origin_module)
                 if self.is_async:
-                    task = run_local()
+                    task = local_request()
                 else:
                     loop = asyncio.get_running_loop()
-                    task = loop.run_in_executor(threadpool, run_local)
+                    task = loop.run_in_executor(self.get_executor(), local_request)
                 try:
                     data = await asyncio.wait_for(task, timeout=timeout)
+                    self.debug_log("Finished executing request locally")
                 except asyncio.TimeoutError:
                     raise exception.WazuhInternalError(3021)
                 except OperationalError:
@@ -294,6 +350,33 @@ class DistributedAPI:
                                                            dapi_errors=self.get_error_info(e)),
                               cls=c_common.WazuhJSONEncoder)
 
+    def get_executor(self) -> Executor:
+        """Get the executor the function of the request must be run in.
+
+        Functions are assigned to pools using the `executor_functions` setting of the distributed API configuration,
+        which maps patterns of `module.function` names to pool names. The first matching pattern is used. Functions not
+        matching any pattern are run in the `default` pool.
+
+        Raises
+        ------
+        WazuhError(3039)
+            If the function receives a LocalClient, which can not be sent to a process pool.
+
+        Returns
+        -------
+        Executor
+            Executor of the pool assigned to the function.
+        """
+        dapi_conf = self.cluster_items.get('distributed_api', {})
+        pools = dapi_conf.get('executor_pools', default_executor_pools)
+        function_name = f"{getattr(self.f, '__module__', '')}.{getattr(self.f, '__name__', '')}"
+        pool_name = next((pool for pattern, pool in dapi_conf.get('executor_functions', {}).items()
+                          if fnmatch.fnmatchcase(function_name, pattern)), 'default')
+        if self.local_client_arg is not None and pools[pool_name].get('type', 'thread') == 'process':
+            raise WazuhError(3039, extra_message=function_name)
+
+        return get_executor(pool_name, pools)
+
     def get_client(self) -> c_common.Handler:
         """
         Create another LocalClient if necessary and stores it to be closed later.
@@ -402,13 +485,16 @@ class DistributedAPI:
         wresults.AbstractWazuhResult or exception.WazuhException
         """
 
-        async def forward(node_name: Tuple) -> [wresults.AbstractWazuhResult, exception.WazuhException]:
+        async def forward(node_name: Tuple, pagination_kwargs: Dict) -> [wresults.AbstractWazuhResult,
+                                                                          exception.WazuhException]:
             """Forward a request to a node.
 
             Parameters
             ----------
             node_name : tuple
                 Node to forward a request to.
+            pagination_kwargs : dict
+                Offset and limit to use in the node instead of the requested ones.
 
             Returns
             -------
@@ -420,13 +506,19 @@ class DistributedAPI:
                 # itself
                 if agent_list is not None and set(self.f_kwargs) & {'agent_id', 'agent_list'}:
                     self.f_kwargs['agent_id' if 'agent_id' in self.f_kwargs else 'agent_list'] = agent_list
-                result = await self.distribute_function()
+                if pagination_kwargs:
+                    local_request = copy(self)
+                    local_request.f_kwargs = {**self.f_kwargs, **pagination_kwargs}
+                    result = await local_request.distribute_function()
+                else:
+                    result = await self.distribute_function()
             else:
                 if 'tmp_file' in self.f_kwargs:
                     await self.send_tmp_file(node_name)
                 client = self.get_client()
                 try:
                     kcopy = deepcopy(self.to_dict())
+                    kcopy['f_kwargs'].update(pagination_kwargs)
                     if agent_list is not None and set(self.f_kwargs) & {'agent_id', 'agent_list'}:
                         kcopy['f_kwargs']['agent_id' if 'agent_id' in kcopy['f_kwargs'] else 'agent_list'] = agent_list
                     result = json.loads(await client.execute(b'dapi_fwd',
@@ -519,8 +611,11 @@ class DistributedAPI:
             allowed_nodes.total_affected_items = len(allowed_nodes.affected_items)
 
         cleaned_valid_nodes = await clean_valid_nodes(valid_nodes)
+        pagination = self.push_down_pagination() if len(cleaned_valid_nodes) > 1 else None
+        pagination_kwargs = {'offset': 0, 'limit': sum(pagination)} if pagination else {}
 
-        response = await asyncio.shield(asyncio.gather(*[forward(node) for node in cleaned_valid_nodes]))
+        response = await asyncio.shield(asyncio.gather(*[forward(node, pagination_kwargs)
+                                                         for node in cleaned_valid_nodes]))
 
         if allowed_nodes.total_affected_items > 1:
             response = reduce(or_, response)
@@ -534,6 +629,10 @@ class DistributedAPI:
         else:
             response = deepcopy(allowed_nodes)
 
+        if pagination is not None and isinstance(response, wresults.AffectedItemsWazuhResult):
+            offset, limit = pagination
+            response.affected_items = response.affected_items[offset:offset + limit]
+
         # It might be a WazuhError after reducing
         if isinstance(response, wresults.AffectedItemsWazuhResult):
             for failed in copy(allowed_nodes.failed_items):
@@ -544,6 +643,30 @@ class DistributedAPI:
 
         return response
 
+    def push_down_pagination(self) -> [Tuple, None]:
+        """Check whether every node can return its first `offset + limit` items instead of its own page of results.
+
+        Each node result is already sorted, so the merged response of all of them contains the requested page. The
+        total number of items keeps being the sum of the totals reported by each node. Only functions whose offset
+        and limit apply to the whole result are paginated this way, so the response does not depend on how many
+        nodes solve the request.
+
+        Returns
+        -------
+        tuple or None
+            Offset and limit to apply to the merged response. None if the pagination cannot be pushed down.
+        """
+        function_name = f"{getattr(self.f, '__module__', '')}.{getattr(self.f, '__name__', '')}"
+        if function_name not in globally_paginated_functions or not {'offset', 'limit'} & set(self.f_kwargs):
+            return None
+
+        offset = int(self.f_kwargs.get('offset', 0))
+        limit = int(self.f_kwargs.get('limit', common.database_limit))
+        if offset + limit > common.maximum_database_limit:
+            return None
+
+        return offset, limit
+
     async def get_solver_node(self) -> Dict:
         """Get the node(s) that can solve a request.
 
@@ -607,13 +730,15 @@ class DistributedAPI:
             return node_name
 
 
-class WazuhRequestQueue:
+class WazuhRequestQueue(ABC):
     """Represents a queue of Wazuh requests"""
 
     def __init__(self, server):
         self.request_queue = asyncio.Queue()
         self.server = server
         self.pending_requests = {}
+        self.max_concurrent_requests = server.cluster_items['distributed_api']['max_concurrent_requests']
+        self.running_requests = set()
 
     def add_request(self, request: bytes):
         """Add a request to the queue.
@@ -626,6 +751,47 @@ class WazuhRequestQueue:
         self.logger.debug(f"Received request: {request}")
         self.request_queue.put_nowait(request.decode())
 
+    async def run(self):
+        """Take requests from the queue and process each of them in its own task.
+
+        At most `max_concurrent_requests` requests are processed at the same time. Once that limit is reached, no more
+        requests are taken from the queue until one of the running requests finishes.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        while True:
+            request = await self.request_queue.get()
+            await semaphore.acquire()
+            task = asyncio.create_task(self.run_request(request, semaphore))
+            self.running_requests.add(task)
+            task.add_done_callback(self.running_requests.discard)
+
+    async def run_request(self, request: str, semaphore: asyncio.Semaphore):
+        """Process a request, making sure an error in it does not affect the rest of requests.
+
+        Parameters
+        ----------
+        request : str
+            Request taken from the queue.
+        semaphore : asyncio.Semaphore
+            Semaphore to release once the request is finished.
+        """
+        try:
+            await self.process_request(request)
+        except Exception as e:
+            self.logger.error(f"Error processing request: {e}", exc_info=True)
+        finally:
+            semaphore.release()
+
+    @abstractmethod
+    async def process_request(self, request: str):
+        """Process a request taken from the queue.
+
+        Parameters
+        ----------
+        request : str
+            Request taken from the queue.
+        """
+
 
 class APIRequestQueue(WazuhRequestQueue):
     """
@@ -638,45 +804,51 @@ class APIRequestQueue(WazuhRequestQueue):
         self.logger = logging.getLogger('wazuh').getChild('dapi')
         self.logger.addFilter(wazuh.core.cluster.utils.ClusterFilter(tag='Cluster', subtag='D API'))
 
-    async def run(self):
-        while True:
-            names, request = (await self.request_queue.get()).split(' ', 1)
-            names = names.split('*', 1)
-            # name    -> node name the request must be sent to. None if called from a worker node.
-            # id      -> id of the request.
-            # request -> JSON containing request's necessary information
-            name_2 = '' if len(names) == 1 else names[1] + ' '
-
-            # Get reference to MasterHandler or WorkerHandler
-            try:
-                node = self.server.client if names[0] == 'master' else self.server.clients[names[0]]
-            except KeyError as e:
-                self.logger.error(
-                    f"Error in DAPI request. The destination node is not connected or does not exist: {e}.")
-                continue
+    async def process_request(self, request: str):
+        """Run a DAPI request and send its result back to the node it came from.
 
-            try:
-                request = json.loads(request, object_hook=c_common.as_wazuh_object)
-                self.logger.info("Receiving request: {} from {}".format(
-                    request['f'].__name__, names[0] if not name_2 else '{} ({})'.format(names[0], names[1])))
-                result = await DistributedAPI(**request,
-                                              logger=self.logger,
-                                              node=node).distribute_function()
-                task_id = await node.send_string(json.dumps(result, cls=c_common.WazuhJSONEncoder).encode())
-            except Exception as e:
-                self.logger.error(f"Error in distributed API: {e}", exc_info=True)
-                task_id = b'Error in distributed API: ' + str(e).encode()
-
-            if task_id.startswith(b'Error'):
-                self.logger.error(task_id.decode())
-                result = await node.send_request(b'dapi_err', name_2.encode() + task_id)
-            else:
-                result = await node.send_request(b'dapi_res', name_2.encode() + task_id)
-            if not isinstance(result, WazuhException):
-                if result.startswith(b'Error'):
-                    self.logger.error(result.decode())
-            else:
-                self.logger.error(result.message)
+        Parameters
+        ----------
+        request : str
+            Request taken from the queue.
+        """
+        names, request = request.split(' ', 1)
+        names = names.split('*', 1)
+        # name    -> node name the request must be sent to. None if called from a worker node.
+        # id      -> id of the request.
+        # request -> JSON containing request's necessary information
+        name_2 = '' if len(names) == 1 else names[1] + ' '
+
+        # Get reference to MasterHandler or WorkerHandler
+        try:
+            node = self.server.client if names[0] == 'master' else self.server.clients[names[0]]
+        except KeyError as e:
+            self.logger.error(
+                f"Error in DAPI request. The destination node is not connected or does not exist: {e}.")
+            return
+
+        try:
+            request = json.loads(request, object_hook=c_common.as_wazuh_object)
+            self.logger.info("Receiving request: {} from {}".format(
+                request['f'].__name__, names[0] if not name_2 else '{} ({})'.format(names[0], names[1])))
+            result = await DistributedAPI(**request,
+                                          logger=self.logger,
+                                          node=node).distribute_function()
+            task_id = await node.send_string(json.dumps(result, cls=c_common.WazuhJSONEncoder).encode())
+        except Exception as e:
+            self.logger.error(f"Error in distributed API: {e}", exc_info=True)
+            task_id = b'Error in distributed API: ' + str(e).encode()
+
+        if task_id.startswith(b'Error'):
+            self.logger.error(task_id.decode())
+            result = await node.send_request(b'dapi_err', name_2.encode() + task_id)
+        else:
+            result = await node.send_request(b'dapi_res', name_2.encode() + task_id)
+        if not isinstance(result, WazuhException):
+            if result.startswith(b'Error'):
+                self.logger.error(result.decode())
+        else:
+            self.logger.error(result.message)
 
 
 class SendSyncRequestQueue(WazuhRequestQueue):
@@ -690,33 +862,39 @@ class SendSyncRequestQueue(WazuhRequestQueue):
         self.logger = logging.getLogger('wazuh').getChild('sendsync')
         self.logger.addFilter(wazuh.core.cluster.utils.ClusterFilter(tag='Cluster', subtag='SendSync'))
 
-    async def run(self):
-        while True:
-            names, request = (await self.request_queue.get()).split(' ', 1)
-            names = names.split('*', 1)
-            # name    -> node name the request must be sent to. None if called from a worker node.
-            # id      -> id of the request.
-            # request -> JSON containing request's necessary information
-            name_2 = '' if len(names) == 1 else names[1] + ' '
+    async def process_request(self, request: str):
+        """Run a SendSync request and send its result back to the node it came from.
 
-            try:
-                node = self.server.clients[names[0]]
-            except KeyError as e:
-                self.logger.error(f"Error in Sendsync. The destination node is not connected or does not exist: {e}.")
-                continue
+        Parameters
+        ----------
+        request : str
+            Request taken from the queue.
+        """
+        names, request = request.split(' ', 1)
+        names = names.split('*', 1)
+        # name    -> node name the request must be sent to. None if called from a worker node.
+        # id      -> id of the request.
+        # request -> JSON containing request's necessary information
+        name_2 = '' if len(names) == 1 else names[1] + ' '
 
-            try:
-                request = json.loads(request, object_hook=c_common.as_wazuh_object)
-                self.logger.debug(f"Receiving SendSync request ({request['daemon_name']}) from {names[0]} ({names[1]})")
-                result = await wazuh_sendsync(**request)
-                task_id = await node.send_string(result.encode())
-            except Exception as e:
-                task_id = f'Error in SendSync (parameters {request}): {str(e)}'.encode()
-
-            if task_id.startswith(b'Error'):
-                self.logger.error(task_id.decode())
-                result = await node.send_request(b'sendsyn_err', name_2.encode() + task_id)
-            else:
-                result = await node.send_request(b'sendsyn_res', name_2.encode() + task_id)
-            if isinstance(result, WazuhException):
-                self.logger.error(result.message)
+        try:
+            node = self.server.clients[names[0]]
+        except KeyError as e:
+            self.logger.error(f"Error in Sendsync. The destination node is not connected or does not exist: {e}.")
+            return
+
+        try:
+            request = json.loads(request, object_hook=c_common.as_wazuh_object)
+            self.logger.debug(f"Receiving SendSync request ({request['daemon_name']}) from {names[0]} ({names[1]})")
+            result = await wazuh_sendsync(**request)
+            task_id = await node.send_string(result.encode())
+        except Exception as e:
+            task_id = f'Error in SendSync (parameters {request}): {str(e)}'.encode()
+
+        if task_id.startswith(b'Error'):
+            self.logger.error(task_id.decode())
+            result = await node.send_request(b'sendsyn_err', name_2.encode() + task_id)
+        else:
+            result = await node.send_request(b'sendsyn_res', name_2.encode() + task_id)
+        if isinstance(result, WazuhException):
+            self.logger.error(result.message)
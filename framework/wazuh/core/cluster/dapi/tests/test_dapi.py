@@ -27,10 +27,10 @@ with patch('wazuh.common.wazuh_uid'):
         from wazuh.tests.util import RBAC_bypasser
 
         wazuh.rbac.decorators.expose_resources = RBAC_bypasser
-        from wazuh.core.cluster.dapi.dapi import DistributedAPI, APIRequestQueue
+        from wazuh.core.cluster.dapi.dapi import DistributedAPI, APIRequestQueue, WazuhRequestQueue
         from wazuh.core.manager import get_manager_status
         from wazuh.core.results import WazuhResult, AffectedItemsWazuhResult
-        from wazuh import agent, cluster, ciscat, manager, WazuhError, WazuhInternalError
+        from wazuh import agent, cluster, ciscat, manager, syscollector, WazuhError, WazuhInternalError
         from wazuh.core.exception import WazuhClusterError
         from api.util import raise_if_exc
 
@@ -275,6 +275,112 @@ def test_DistributedAPI_forward_request_errors(mock_client_execute, mock_get_sol
     raise_if_exc_routine(dapi_kwargs=dapi_kwargs, expected_error=3036)
 
 
+@pytest.mark.parametrize('paginated_functions, f_kwargs, expected_kwargs, expected_ids', [
+    (None, {'offset': 2, 'limit': 3}, {'offset': 0, 'limit': 5}, ['003', '999', '1000']),
+    (None, {'offset': 1}, {'offset': 0, 'limit': 501}, ['002', '003', '999', '1000', '1001']),
+    (None, {'offset': 1, 'limit': common.maximum_database_limit},
+     {'offset': 1, 'limit': common.maximum_database_limit}, ['001', '002', '003', '999', '1000', '1001']),
+    (None, {}, {}, ['001', '002', '003', '999', '1000', '1001']),
+    (set(), {'offset': 2, 'limit': 3}, {'offset': 2, 'limit': 3}, ['001', '002', '003', '999', '1000', '1001'])
+])
+@patch('wazuh.core.cluster.cluster.get_node', return_value={'type': 'master', 'node': 'master-node'})
+@patch('wazuh.core.cluster.dapi.dapi.check_cluster_status', return_value=True)
+@patch('wazuh.core.cluster.dapi.dapi.DistributedAPI.get_solver_node',
+       new=AsyncMock(return_value={'worker1': ['001', '003', '1000'], 'worker2': ['002', '999', '1001']}))
+def test_DistributedAPI_forward_request_pagination(mock_check_cluster_status, mock_get_node, paginated_functions,
+                                                   f_kwargs, expected_kwargs, expected_ids):
+    """Check that offset and limit are pushed down to the nodes and applied to the merged response."""
+    from wazuh.core.cluster.common import WazuhJSONEncoder
+    from wazuh.core.cluster.dapi import dapi as dapi_module
+    forwarded_kwargs = []
+
+    def node_response(client, command, data, wait_for_complete):
+        node_name, request = data.decode().split(' ', 1)
+        forwarded_kwargs.append(json.loads(request)['f_kwargs'])
+        # Result of syscollector.get_agents_with_element: agent IDs sorted by their numeric value
+        result = AffectedItemsWazuhResult()
+        result.affected_items = ['001', '003', '1000'] if node_name == 'worker1' else ['002', '999', '1001']
+        result.total_affected_items = 3
+        return json.dumps(result, cls=WazuhJSONEncoder)
+
+    paginated_functions = dapi_module.globally_paginated_functions if paginated_functions is None \
+        else paginated_functions
+    with patch('wazuh.core.cluster.local_client.LocalClient.execute', new=AsyncMock(side_effect=node_response)), \
+            patch('wazuh.core.cluster.dapi.dapi.globally_paginated_functions', new=paginated_functions):
+        dapi = DistributedAPI(f=syscollector.get_agents_with_element, logger=logger,
+                              request_type='distributed_master', f_kwargs=dict(f_kwargs))
+        result = loop.run_until_complete(dapi.distribute_function())
+
+    # The requested pagination is kept in the request
+    assert dapi.f_kwargs == f_kwargs
+
+    assert all(kwargs == expected_kwargs for kwargs in forwarded_kwargs) and len(forwarded_kwargs) == 2
+    assert result.affected_items == expected_ids
+    assert result.total_affected_items == 6
+
+
+def test_globally_paginated_functions():
+    """Check that every globally paginated function exists and takes an offset and a limit."""
+    import inspect
+    from importlib import import_module
+    from wazuh.core.cluster.dapi.dapi import globally_paginated_functions
+
+    for function_name in globally_paginated_functions:
+        module, name = function_name.rsplit('.', 1)
+        parameters = inspect.signature(getattr(import_module(module), name)).parameters
+        assert {'offset', 'limit'} <= set(parameters)
+
+
+@pytest.mark.parametrize('f, pool_name', [
+    (agent.get_agents, 'read'),
+    (agent.restart_agents, 'default'),
+    (manager.get_status, 'process'),
+])
+def test_DistributedAPI_get_executor(f, pool_name):
+    """Test that each function is run in the executor of the pool assigned to it."""
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from wazuh.core.cluster.dapi import dapi as dapi_module
+
+    dapi = DistributedAPI(f=f, logger=logger)
+    dapi.cluster_items = {'distributed_api': {
+        'executor_pools': {'default': {'type': 'thread', 'max_workers': 1},
+                           'read': {'type': 'thread', 'max_workers': 4},
+                           'process': {'type': 'process', 'max_workers': 2}},
+        'executor_functions': {'wazuh.manager.*': 'process', 'wazuh.*.get_*': 'read'}
+    }}
+    with patch.dict(dapi_module.executors, clear=True):
+        executor = dapi.get_executor()
+        assert dapi_module.executors[pool_name] is executor
+        assert isinstance(executor, ProcessPoolExecutor if pool_name == 'process' else ThreadPoolExecutor)
+        assert executor._max_workers == dapi.cluster_items['distributed_api']['executor_pools'][pool_name][
+            'max_workers']
+        assert dapi.get_executor() is executor
+        executor.shutdown()
+
+
+def test_DistributedAPI_get_executor_local_client():
+    """Test that functions receiving a LocalClient are not run in a process pool."""
+    dapi = DistributedAPI(f=manager.get_status, logger=logger, local_client_arg='lc')
+    dapi.cluster_items = {'distributed_api': {
+        'executor_pools': {'default': {'type': 'thread', 'max_workers': 1},
+                           'process': {'type': 'process', 'max_workers': 2}},
+        'executor_functions': {'wazuh.manager.*': 'process'}
+    }}
+    with pytest.raises(WazuhError, match='.* 3039 .*'):
+        dapi.get_executor()
+
+
+def test_DistributedAPI_local_request_process_pool():
+    """Test that requests can be executed locally in a process pool."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    dapi = DistributedAPI(f=os.path.relpath, f_kwargs={'path': '/var/ossec', 'start': '/var'}, logger=logger)
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        with patch.object(dapi, 'get_executor', return_value=executor), \
+                patch.object(dapi, 'check_wazuh_status'):
+            assert loop.run_until_complete(dapi.execute_local_request()) == 'ossec'
+
+
 @patch('wazuh.core.cluster.dapi.dapi.DistributedAPI.execute_local_request',
        new=AsyncMock(side_effect=WazuhInternalError(1001)))
 def test_DistributedAPI_logger():
@@ -417,3 +523,48 @@ def test_APIRequestQueue():
     api_request_queue = APIRequestQueue(server=server)
     api_request_queue.add_request(b'testing')
     assert api_request_queue.server == server
+    assert api_request_queue.max_concurrent_requests == server.cluster_items['distributed_api'][
+        'max_concurrent_requests']
+
+    # The base queue does not know how to process requests
+    with pytest.raises(TypeError):
+        WazuhRequestQueue(server=server)
+
+
+def test_WazuhRequestQueue_run():
+    """Test that requests are processed concurrently up to the configured limit and that failures are isolated."""
+    server = DistributedAPI(f=agent.get_agents_summary_status, logger=logger)
+    server.cluster_items = {'distributed_api': {'enabled': True, 'max_concurrent_requests': 2}}
+    running, processed = set(), []
+
+    async def check_queue():
+        # The queue and the event are created inside the loop running them
+        api_request_queue = APIRequestQueue(server=server)
+        release = asyncio.Event()
+
+        async def process_request(request):
+            running.add(request)
+            await release.wait()
+            running.discard(request)
+            if request == 'fail':
+                raise Exception('Request failed')
+            processed.append(request)
+
+        with patch.object(api_request_queue, 'process_request', new=process_request), \
+                patch.object(api_request_queue.logger, 'error') as error_mock:
+            for request in [b'fail', b'request1', b'request2']:
+                api_request_queue.add_request(request)
+            run_task = asyncio.create_task(api_request_queue.run())
+            await asyncio.sleep(0.01)
+            assert running == {'fail', 'request1'}
+            release.set()
+            await asyncio.sleep(0.01)
+            run_task.cancel()
+
+        return api_request_queue, error_mock
+
+    api_request_queue, error_mock = loop.run_until_complete(check_queue())
+
+    assert api_request_queue.max_concurrent_requests == 2
+    assert processed == ['request1', 'request2']
+    error_mock.assert_called_once()
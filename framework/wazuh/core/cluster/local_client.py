@@ -41,6 +41,7 @@ class LocalClientHandler(client.AbstractClient):
             Socket to write data on.
         """
         self.transport = transport
+        self.handshake_done = True
 
     def _cancel_all_tasks(self):
         pass
@@ -35,6 +35,8 @@ class LocalServerHandler(server.AbstractServerHandler):
         self.name = str(random.SystemRandom().randint(0, 2 ** 20 - 1))
         self.transport = transport
         self.server.clients[self.name] = self
+        # Local clients connect through a Unix socket and do not send a hello command
+        self.handshake_done = True
         self.tag = "Local " + self.name
         # Modify filter tags with context vars.
         context_tag.set(self.tag)
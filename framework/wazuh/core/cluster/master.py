@@ -21,7 +21,7 @@ from wazuh.core.cluster import server, common as c_common
 from wazuh.core.cluster.dapi import dapi
 from wazuh.core.cluster.utils import context_tag
 from wazuh.core.common import decimals_date_format
-from wazuh.core.wdb import WazuhDBConnection
+from wazuh.core.wdb import AsyncWazuhDBConnection
 
 
 class ReceiveIntegrityTask(c_common.ReceiveFileTask):
@@ -525,7 +525,7 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         logger = self.task_loggers['Agent-info sync']
         logger.info(f"Starting")
         date_start_master = datetime.now()
-        wdb_conn = WazuhDBConnection()
+        wdb_conn = AsyncWazuhDBConnection()
         result = {'updated_chunks': 0, 'error_messages': list()}
 
         try:
@@ -543,17 +543,20 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
 
         # Update chunks in local wazuh-db
         before = time()
-        for i, chunk in enumerate(data['chunks']):
-            try:
-                logger.debug2(f"Sending chunk {i + 1}/{len(data['chunks'])} to wazuh-db: {chunk}")
-                response = wdb_conn.send(f"{data['set_data_command']} {chunk}", raw=True)
-                if response[0] != 'ok':
-                    result['error_messages'].append(response)
-                    logger.error(f"Response for chunk {i}/{len(data['chunks'])} was not 'ok': {response}")
-                else:
-                    result['updated_chunks'] += 1
-            except Exception as e:
-                result['error_messages'].append(str(e))
+        try:
+            for i, chunk in enumerate(data['chunks']):
+                try:
+                    logger.debug2(f"Sending chunk {i + 1}/{len(data['chunks'])} to wazuh-db: {chunk}")
+                    response = await wdb_conn.send(f"{data['set_data_command']} {chunk}", raw=True)
+                    if response[0] != 'ok':
+                        result['error_messages'].append(response)
+                        logger.error(f"Response for chunk {i}/{len(data['chunks'])} was not 'ok': {response}")
+                    else:
+                        result['updated_chunks'] += 1
+                except Exception as e:
+                    result['error_messages'].append(str(e))
+        finally:
+            wdb_conn.close()
         logger.debug(f"All chunks updated in wazuh-db in {(time() - before):3f}s.")
 
         # Send result to worker
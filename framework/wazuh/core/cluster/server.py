@@ -95,7 +95,9 @@ class AbstractServerHandler(c_common.Handler):
         if command == b"echo-c":
             return self.echo_master(data)
         elif command == b'hello':
-            return self.hello(data)
+            result = self.hello(data)
+            self.handshake_done = True
+            return result
         else:
             return super().process_request(command, data)
 
@@ -1,7 +1,9 @@
+import asyncio
+import hashlib
 import json
 import os
 import sys
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 
 import pytest
 
@@ -13,10 +15,10 @@ with patch('wazuh.common.getgrnam'):
 
                 from wazuh.core.cluster.cluster import get_node
                 from wazuh.agent import get_agents_summary_status
-                from wazuh.core.exception import WazuhError, WazuhInternalError
+                from wazuh.core.exception import WazuhClusterError, WazuhError, WazuhInternalError
                 from wazuh.core.manager import status
                 from wazuh.core.results import WazuhResult, AffectedItemsWazuhResult
-                from wazuh.core.cluster.common import WazuhJSONEncoder, as_wazuh_object
+                from wazuh.core.cluster.common import Handler, WazuhJSONEncoder, as_wazuh_object
 
 affected = AffectedItemsWazuhResult(dikt={'data': ['test']}, affected_items=['001', '002'])
 affected.add_failed_item(id_='099', error=WazuhError(code=1750, extra_message='wiiiiiii'))
@@ -63,3 +65,197 @@ def test_encoder_decoder(obj):
     # Decoding first object
     obj_again = json.loads(encoded, object_hook=as_wazuh_object)
     assert (obj_again == obj)
+
+
+@pytest.mark.parametrize('fernet_key, features, read_size', [
+    ('', set(), 1),
+    ('', set(), 7),
+    ('', set(), 64),
+    ('0' * 32, set(), 13),
+    ('0' * 32, set(), 4096),
+    ('0' * 32, {b'aesgcm'}, 1),
+    ('0' * 32, {b'aesgcm'}, 4096),
+    ('0' * 32, {b'zlib'}, 13),
+    ('0' * 32, {b'aesgcm', b'zlib'}, 1),
+    ('0' * 32, {b'aesgcm', b'zlib'}, 4096)
+])
+def test_handler_data_received(fernet_key, features, read_size):
+    """Check that messages split in arbitrary reads are parsed and dispatched correctly."""
+    handler = Handler(fernet_key=fernet_key, cluster_items={})
+    handler.request_chunk = 100
+    handler.features = features
+    handler.compression_threshold = 20
+    messages = [(b'echo', b''), (b'echo', b'a' * 10), (b'echo', os.urandom(1000)), (b'test', b'b' * 35),
+                (b'echo', b'c' * 3000), (b'echo', b','.join(str(i).encode() for i in range(1000)))]
+    stream = b''.join(bytes(msg) for i, (command, data) in enumerate(messages)
+                      for msg in handler.msg_build(command, i, data))
+
+    with patch.object(handler, 'dispatch') as dispatch_mock:
+        for i in range(0, len(stream), read_size):
+            handler.data_received(stream[i:i + read_size])
+
+    assert [call.args for call in dispatch_mock.call_args_list] == \
+           [(command, i, data) for i, (command, data) in enumerate(messages)]
+    assert not handler.in_buffer and not handler.in_header and not handler.div_msg_box
+
+
+def test_handler_divided_messages():
+    """Check that divided messages announce their size and are joined in a buffer allocated once."""
+    handler = Handler(fernet_key='', cluster_items={})
+    handler.request_chunk = 100
+    data = os.urandom(500)
+    msgs = handler.msg_build(b'echo', 1, data)
+
+    assert len(msgs) == 7 and all(len(msg) <= handler.request_chunk for msg in msgs)
+    assert int.from_bytes(msgs[0][handler.header_len:handler.header_len + 8], 'big') == len(data)
+
+    with patch.object(handler, 'dispatch') as dispatch_mock:
+        for msg in msgs[:-1]:
+            handler.data_received(bytes(msg))
+        assert handler.div_msg_box[1].total == len(data)
+        handler.data_received(bytes(msgs[-1]))
+    dispatch_mock.assert_called_once_with(b'echo', 1, data)
+    assert not handler.div_msg_box
+
+    # Only a few parts are allocated beforehand, the buffer grows as the rest of them arrive
+    handler.request_chunk = 25
+    with patch.object(handler, 'dispatch') as dispatch_mock:
+        handler.data_received(bytes(msgs[0]))
+        assert len(handler.div_msg_box[1].payload) == 4 * handler.request_chunk
+        for msg in msgs[1:]:
+            handler.data_received(bytes(msg))
+    dispatch_mock.assert_called_once_with(b'echo', 1, data)
+    handler.request_chunk = 100
+
+    # A divided message whose parts do not match the announced size is rejected
+    with pytest.raises(WazuhClusterError, match='.* 3037 .*'):
+        for msg in msgs[:2] + msgs[3:]:
+            handler.data_received(bytes(msg))
+
+    # Announced sizes above the limit are rejected before allocating the buffer
+    handler = Handler(fernet_key='', cluster_items={})
+    handler.max_divided_message_size = len(data) - 1
+    with pytest.raises(WazuhClusterError, match='.* 3040 .*'):
+        handler.data_received(bytes(msgs[0]))
+    assert not handler.div_msg_box
+
+    # Only one divided message can be pending until the handshake is done
+    handler = Handler(fernet_key='', cluster_items={})
+    handler.request_chunk = 100
+    other_msg = bytes(handler.msg_build(b'echo', 2, data)[0])
+    handler.data_received(bytes(msgs[0]))
+    with pytest.raises(WazuhClusterError, match='.* 3041 .*'):
+        handler.data_received(other_msg)
+    handler.handshake_done = True
+    handler.data_received(other_msg)
+    assert handler.div_msg_box.keys() == {1, 2}
+
+
+@pytest.mark.asyncio
+async def test_handler_send_file(tmp_path):
+    """Check that files are sent in chunks with a bounded number of updates waiting for a response."""
+    handler = Handler(fernet_key='', cluster_items={'intervals': {'communication': {'timeout_cluster_request': 0.1}}})
+    handler.file_chunk = 10
+    handler.max_file_chunks_in_flight = 2
+    content = os.urandom(95)
+    filename = tmp_path / 'file.zip'
+    filename.write_bytes(content)
+    requests, in_flight = [], []
+
+    async def send_request(command, data):
+        requests.append((command, data))
+        in_flight.append(command)
+        assert in_flight.count(b'file_upd') <= handler.max_file_chunks_in_flight
+        await asyncio.sleep(0)
+        in_flight.remove(command)
+        return b'ok'
+
+    with patch('wazuh.common.wazuh_path', new=str(tmp_path)):
+        with patch.object(handler, 'send_request', side_effect=send_request):
+            assert await handler.send_file(str(filename)) == b'File sent'
+
+    assert requests[0] == (b'new_file', b'/file.zip')
+    assert b''.join(data.split(b' ', 1)[1] for command, data in requests[1:-1]) == content
+    assert len(requests) == 12
+    assert requests[-1] == (b'file_end', b'/file.zip ' + hashlib.sha256(content).digest())
+
+    # File chunks are not sent while the transport is paused
+    handler.pause_writing()
+    with patch('wazuh.common.wazuh_path', new=str(tmp_path)):
+        with patch.object(handler, 'send_request', side_effect=send_request):
+            with pytest.raises(WazuhClusterError, match='.* 3020 .*'):
+                await handler.send_file(str(filename))
+
+
+def test_handler_aead():
+    """Check that the AES-GCM feature is negotiated and both ciphers are accepted when receiving."""
+    handler = Handler(fernet_key='0' * 32, cluster_items={})
+    peer = Handler(fernet_key='0' * 32, cluster_items={})
+
+    assert handler.get_supported_features() == [b'aesgcm', b'zlib']
+    assert Handler(fernet_key='', cluster_items={}).get_supported_features() == []
+    assert peer.set_features(b'aesgcm,unknown') == (b'ok', b'aesgcm')
+    assert peer.features == {b'aesgcm'}
+
+    fernet_msg = bytes(handler.msg_build(b'echo', 1, b'data')[0])
+    handler.features = {b'aesgcm'}
+    aead_msg = bytes(handler.msg_build(b'echo', 2, b'data')[0])
+    assert aead_msg[handler.header_len:handler.header_len + 1] == Handler.aead_flag
+    assert len(aead_msg) < len(fernet_msg)
+
+    with patch.object(peer, 'dispatch') as dispatch_mock:
+        peer.data_received(fernet_msg + aead_msg)
+    assert [call.args for call in dispatch_mock.call_args_list] == [(b'echo', 1, b'data'), (b'echo', 2, b'data')]
+
+    # The message ID is authenticated, so a payload can not be moved to another message
+    tampered_msg = bytearray(aead_msg)
+    tampered_msg[:4] = (3).to_bytes(4, 'big')
+    with pytest.raises(WazuhClusterError, match='.* 3025 .*'):
+        peer.data_received(bytes(tampered_msg))
+    with pytest.raises(WazuhClusterError, match='.* 3025 .*'):
+        Handler(fernet_key='1' * 32, cluster_items={}).data_received(aead_msg)
+
+    # The position of each part is authenticated, so the parts of a divided message can not be reordered or cut
+    handler.request_chunk = 100
+    msgs = [bytes(msg) for msg in handler.msg_build(b'echo', 4, os.urandom(500))]
+    with pytest.raises(WazuhClusterError, match='.* 3025 .*'):
+        Handler(fernet_key='0' * 32, cluster_items={}).data_received(msgs[0] + msgs[2] + msgs[1])
+    last_part = bytearray(msgs[1])
+    last_part[handler.header_len - 1:handler.header_len] = b'-'
+    with pytest.raises(WazuhClusterError, match='.* 3025 .*'):
+        Handler(fernet_key='0' * 32, cluster_items={}).data_received(msgs[0] + bytes(last_part))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('response, expected_features', [
+    (b'aesgcm', {b'aesgcm'}),
+    (b'aesgcm,zlib', {b'aesgcm', b'zlib'}),
+    (b'', set()),
+    (WazuhClusterError(3000), set()),
+    (b'Error sending request: timeout expired.', set())
+])
+async def test_handler_negotiate_features(response, expected_features):
+    """Check that only the features accepted by the peer are enabled."""
+    handler = Handler(fernet_key='0' * 32, cluster_items={})
+    with patch.object(handler, 'send_request', side_effect=AsyncMock(return_value=response)) as send_request_mock:
+        await handler.negotiate_features()
+    send_request_mock.assert_called_once_with(command=b'features', data=b'aesgcm,zlib')
+    assert handler.features == expected_features
+
+
+def test_handler_compression():
+    """Check that only payloads above the threshold that shrink are compressed."""
+    handler = Handler(fernet_key='0' * 32, cluster_items={})
+    handler.features = {b'zlib'}
+    json_data = json.dumps([{'id': str(i).zfill(3), 'status': 'active'} for i in range(1000)]).encode()
+
+    compressed_msg = handler.msg_build(b'dapi_res', 1, json_data)[0]
+    assert compressed_msg[handler.header_len:handler.header_len + 1] == Handler.compression_flag
+    assert len(compressed_msg) < len(json_data) // 5
+    for data in (b'a' * (handler.compression_threshold - 1), os.urandom(2048)):
+        assert handler.msg_build(b'echo', 2, data)[0][handler.header_len:handler.header_len + 1] == b'g'
+
+    peer = Handler(fernet_key='0' * 32, cluster_items={})
+    with patch.object(peer, 'dispatch') as dispatch_mock:
+        peer.data_received(bytes(compressed_msg))
+    dispatch_mock.assert_called_once_with(b'dapi_res', 1, json_data)
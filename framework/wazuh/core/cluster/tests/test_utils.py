@@ -155,7 +155,30 @@ def test_get_cluster_items():
                                               'max_allowed_time_without_keepalive': 120},
                                    'communication': {'timeout_cluster_request': 20, 'timeout_dapi_request': 200,
                                                      'timeout_receiving_file': 120}},
-                     'distributed_api': {'enabled': True}}
+                     'distributed_api': {'enabled': True, 'max_concurrent_requests': 8,
+                                         'executor_pools': {'default': {'type': 'thread', 'max_workers': 1},
+                                                            'read': {'type': 'thread', 'max_workers': 4}},
+                                         'executor_functions': {'wazuh.security.*': 'default',
+                                                                'wazuh.*.get_*': 'read'}}}
+
+
+@pytest.mark.parametrize('dapi_conf, error', [
+    ({}, None),
+    ({'executor_pools': {'default': {'type': 'thread', 'max_workers': 1}, 'read': {'type': 'process'}},
+      'executor_functions': {'wazuh.*.get_*': 'read'}}, None),
+    ({'executor_pools': {'read': {'type': 'thread'}}}, "'default' pool"),
+    ({'executor_pools': {'default': {'type': 'greenlet'}}}, "unknown type 'greenlet'"),
+    ({'executor_pools': {'default': {'max_workers': 0}}}, 'invalid max_workers'),
+    ({'executor_functions': {'wazuh.*.get_*': 'read'}}, "unknown pool 'read'")
+])
+def test_check_executor_pools(dapi_conf, error):
+    """Verify that invalid executor pools and unknown pool names are rejected."""
+    if error is None:
+        utils.check_executor_pools(dapi_conf)
+    else:
+        with pytest.raises(WazuhError, match=f'.* 3038 .*{error}'):
+            utils.check_executor_pools(dapi_conf)
+
 
 
 def test_ClusterFilter():
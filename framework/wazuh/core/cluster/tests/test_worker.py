@@ -156,19 +156,19 @@ async def test_SyncWazuhdb(create_log, caplog):
 
     sync_worker = worker.SyncWazuhdb(worker=worker_handler, logger=logger, cmd=b'syn_a_w_m',
                                      get_data_command='test-get', set_data_command='test-set',
-                                     data_retriever=lambda x: [])
+                                     data_retriever=AsyncMock(return_value=[]))
     await check_message(mock=b'True', expected_messages=["(0 chunks sent)",
                                                          "Obtained 0 chunks of data in"], start_time=123.456)
 
     sync_worker = worker.SyncWazuhdb(worker=worker_handler, logger=logger, cmd=b'syn_a_w_m',
                                      get_data_command='test-get', set_data_command='test-set',
-                                     data_retriever=lambda x: ['test0', 'test1'])
+                                     data_retriever=AsyncMock(return_value=['test0', 'test1']))
     await check_message(mock=b'True', expected_messages=["All chunks sent.",
                                                          "Obtained 2 chunks of data in"], start_time=123.456)
 
     sync_worker = worker.SyncWazuhdb(worker=worker_handler, logger=logger, cmd=b'syn_a_w_m',
                                      get_data_command='test-get', set_data_command='test-set',
-                                     data_retriever=lambda x: exec('raise(WazuhException(1000))'))
+                                     data_retriever=AsyncMock(side_effect=WazuhException(1000)))
     await check_message(mock=b'True', expected_messages=["Error obtaining data from wazuh-db"], start_time=123.456)
 
 
@@ -210,10 +210,38 @@ def get_cluster_items():
         # Rebase permissions.
         list(map(lambda x: setitem(x, 'permissions', int(x['permissions'], base=0)),
                  filter(lambda x: 'permissions' in x, cluster_items['files'].values())))
-        return cluster_items
     except Exception as e:
         raise WazuhError(3005, str(e))
 
+    check_executor_pools(cluster_items.get('distributed_api', {}))
+    return cluster_items
+
+
+def check_executor_pools(dapi_conf: typing.Dict):
+    """Check the executor pools defined in the distributed API configuration.
+
+    Parameters
+    ----------
+    dapi_conf : dict
+        Distributed API section of cluster.json.
+
+    Raises
+    ------
+    WazuhError(3038)
+        If a pool is not valid or a function is assigned to an unknown pool.
+    """
+    pools = dapi_conf.get('executor_pools', {'default': {}})
+    if 'default' not in pools:
+        raise WazuhError(3038, extra_message="the 'default' pool is not defined")
+    for name, pool in pools.items():
+        if pool.get('type', 'thread') not in ('thread', 'process'):
+            raise WazuhError(3038, extra_message=f"unknown type '{pool['type']}' in pool '{name}'")
+        if not isinstance(pool.get('max_workers', 1), int) or pool.get('max_workers', 1) < 1:
+            raise WazuhError(3038, extra_message=f"invalid max_workers in pool '{name}'")
+    for pattern, name in dapi_conf.get('executor_functions', {}).items():
+        if name not in pools:
+            raise WazuhError(3038, extra_message=f"unknown pool '{name}' assigned to '{pattern}'")
+
 
 @lru_cache()
 def read_config(config_file=common.ossec_conf):
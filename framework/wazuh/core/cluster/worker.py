@@ -21,7 +21,7 @@ from wazuh.core.cluster import local_client
 from wazuh.core.cluster.dapi import dapi
 from wazuh.core.exception import WazuhClusterError
 from wazuh.core.utils import safe_move
-from wazuh.core.wdb import WazuhDBConnection
+from wazuh.core.wdb import AsyncWazuhDBConnection
 
 
 class ReceiveIntegrityTask(c_common.ReceiveFileTask):
@@ -185,7 +185,7 @@ class SyncWazuhdb(SyncTask):
         logger : Logger object
             Logger to use during synchronization process.
         data_retriever : Callable
-            Function to be called to obtain chunks of data. It must return a list of chunks.
+            Coroutine function to be awaited to obtain chunks of data. It must return a list of chunks.
         """
         super().__init__(worker=worker, logger=logger, cmd=cmd)
         self.get_data_command = get_data_command
@@ -208,7 +208,7 @@ class SyncWazuhdb(SyncTask):
         try:
             # Retrieve information from local wazuh-db
             get_chunks_start_time = time.time()
-            chunks = self.data_retriever(self.get_data_command)
+            chunks = await self.data_retriever(self.get_data_command)
             self.logger.debug(f"Obtained {len(chunks)} chunks of data in {(time.time() - get_chunks_start_time):.3f}s.")
         except exception.WazuhException as e:
             self.logger.error(f"Error obtaining data from wazuh-db: {e}")
@@ -636,25 +636,28 @@ class WorkerHandler(client.AbstractClient, c_common.WazuhCommon):
         and sent to the master's wazuh-db.
         """
         logger = self.task_loggers["Agent-info sync"]
-        wdb_conn = WazuhDBConnection()
+        wdb_conn = AsyncWazuhDBConnection()
         synced = True
         agent_info = SyncWazuhdb(worker=self, logger=logger, cmd=b'syn_a_w_m', data_retriever=wdb_conn.run_wdb_command,
                                  get_data_command='global sync-agent-info-get ',
                                  set_data_command='global sync-agent-info-set')
 
-        while True:
-            try:
-                if self.connected:
-                    start_time = time.time()
-                    if await agent_info.request_permission():
-                        logger.info("Starting.")
-                        self.agent_info_sync_status['date_start'] = start_time
-                        await agent_info.sync(start_time=start_time)
-            except Exception as e:
-                logger.error(f"Error synchronizing agent info: {e}")
-
-            await asyncio.sleep(
-                self.cluster_items['intervals']['worker']['sync_agent_info' if synced else 'sync_agent_info_ko_retry'])
+        try:
+            while True:
+                try:
+                    if self.connected:
+                        start_time = time.time()
+                        if await agent_info.request_permission():
+                            logger.info("Starting.")
+                            self.agent_info_sync_status['date_start'] = start_time
+                            await agent_info.sync(start_time=start_time)
+                except Exception as e:
+                    logger.error(f"Error synchronizing agent info: {e}")
+
+                await asyncio.sleep(self.cluster_items['intervals']['worker'][
+                                        'sync_agent_info' if synced else 'sync_agent_info_ko_retry'])
+        finally:
+            wdb_conn.close()
 
     async def sync_extra_valid(self, extra_valid: Dict):
         """Merge and send files of the worker node that are missing in the master node.
@@ -182,6 +182,7 @@ agent_info_sleep = 2  # Seconds between retries
 agent_name_len_limit = 128
 database_limit = 500
 maximum_database_limit = 100000
+max_concurrent_agent_queries = 8  # Agent databases queried at the same time by multi-agent requests
 limit_seconds = 1800  # 600*3
 date_format = "%Y-%m-%dT%H:%M:%SZ"
 decimals_date_format = "%Y-%m-%dT%H:%M:%S.%fZ"
@@ -7,7 +7,7 @@ from enum import Enum
 
 from wazuh.core import common
 from wazuh.core.exception import WazuhError, WazuhInternalError
-from wazuh.core.utils import load_wazuh_xml, add_dynamic_detail
+from wazuh.core.utils import load_wazuh_xml, add_dynamic_detail, RulesetCache
 
 REQUIRED_FIELDS = ['filename', 'position']
 SORT_FIELDS = ['filename', 'relative_dirname', 'name', 'position', 'status']
@@ -80,3 +80,7 @@ def load_decoders_from_file(decoder_file, decoder_path, decoder_status):
         raise WazuhInternalError(1501, extra_message=os.path.join('WAZUH_HOME', decoder_path, decoder_file))
 
     return decoders
+
+
+decoders_cache = RulesetCache(load_decoders_from_file,
+                              indexed_fields=['name', 'filename', 'relative_dirname', 'status'])
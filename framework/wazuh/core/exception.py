@@ -463,6 +463,12 @@ class WazuhException(Exception):
         3034: "Error sending file. File not found.",
         3035: "String couldn't be found",
         3036: "JSON couldn't be loaded",
+        3037: "Received divided message does not match the size announced in its first part",
+        3038: {'message': 'Invalid distributed API executor pools configuration',
+               'remediation': 'Check the `executor_pools` and `executor_functions` settings of cluster.json'},
+        3039: 'Functions using a local client can not be run in a process pool',
+        3040: 'Received divided message announces a size bigger than the maximum allowed',
+        3041: 'Only one divided message can be received at a time before the connection handshake',
 
         # RBAC exceptions
         # The messages of these exceptions are provisional until the RBAC documentation is published.
@@ -639,6 +645,10 @@ class WazuhException(Exception):
         obj.__dict__ = deepcopy(dict(self.__dict__))
         return obj
 
+    def __reduce__(self):
+        # Allow exceptions raised in a worker process to be sent back to the parent one
+        return self.__class__, (self._code, self._extra_message, None, self._cmd_error), self.__dict__
+
     def to_dict(self):
         return {'type': self._type,
                 'title': self._title,
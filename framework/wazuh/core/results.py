@@ -4,6 +4,7 @@
 
 import builtins
 import collections
+import heapq
 import re
 import sys
 from copy import deepcopy
@@ -631,9 +632,27 @@ def _goes_before_than(a, b, ascending=None, casters=None):
     return False
 
 
+class _MergeKey:
+    """Precomputed sort key of an item to be merged. Keys are compared following the `_goes_before_than` order."""
+    __slots__ = ('values', 'ascending')
+
+    def __init__(self, values, ascending=None):
+        self.values = values
+        self.ascending = ascending
+
+    def __lt__(self, other):
+        return _goes_before_than(self.values, other.values, ascending=self.ascending)
+
+    def __eq__(self, other):
+        return not (self < other or other < self)
+
+
 def merge(*iterables, criteria=None, ascending=None, types=None):
     """ Merges iterables in a single one assuming they are already ordered according to criteria, ascending and types
 
+    Sort keys are computed and casted only once per item and the heads of the iterables are kept in a heap, so merging
+    n items from k iterables takes O(n log k). Items comparing equal keep the order of the iterables they come from.
+
     :param iterables: list of lists to be merged
     :param criteria: list or tuple of expressions accepted by the nested_itemgetter function.
     :param ascending: list or tuple of booleans. Should have the same length as criteria.
@@ -642,24 +661,15 @@ def merge(*iterables, criteria=None, ascending=None, types=None):
     Must fit a class in builtins (int, float, str, ...)
     :return: a new sorted iterable
     """
-    result = list()
-    final_len = sum([len(iterable) for iterable in iterables])
     if criteria is None:
         getters = [lambda x: x]  # Init dummy itemgetter
     else:
         getters = [nested_itemgetter(criterion) for criterion in criteria]
-    casters = [getattr(builtins, type_) for type_ in types]
-    while len(result) < final_len:
-        selected = None
-        for i, iterable in enumerate(iterables):
-            if len(iterable) > 0:
-                if selected is None:
-                    selected = i
-                else:
-                    candidate = [getter(iterable[0]) for getter in getters]
-                    selected_candidate = [getter(iterables[selected][0]) for getter in getters]
-                    if _goes_before_than(candidate, selected_candidate, ascending=ascending, casters=casters):
-                        selected = i
-        result.append(iterables[selected].pop(0))
-
-    return result
+    casters = [getattr(builtins, type_) for type_ in types] if types else [None] * len(getters)
+
+    def sort_key(item):
+        values = [cast(value) if cast is not None and value is not None else value
+                  for value, cast in zip([getter(item) for getter in getters], casters)]
+        return _MergeKey(values, ascending=ascending)
+
+    return list(heapq.merge(*iterables, key=sort_key))
@@ -8,7 +8,7 @@ from glob import glob
 
 from wazuh.core import common
 from wazuh.core.exception import WazuhError
-from wazuh.core.utils import load_wazuh_xml, add_dynamic_detail
+from wazuh.core.utils import load_wazuh_xml, add_dynamic_detail, RulesetCache
 
 REQUIRED_FIELDS = ['id']
 RULE_REQUIREMENTS = ['pci_dss', 'gdpr', 'hipaa', 'nist_800_53', 'gpg13', 'tsc', 'mitre']
@@ -130,6 +130,11 @@ def load_rules_from_file(rule_filename, rule_relative_path, rule_status):
     return rules
 
 
+rules_cache = RulesetCache(load_rules_from_file,
+                           indexed_fields=['id', 'level', 'filename', 'relative_dirname', 'status', 'groups',
+                                           *RULE_REQUIREMENTS])
+
+
 def _remove_files(tmp_data, parameters):
     data = list(tmp_data)
     for d in tmp_data:
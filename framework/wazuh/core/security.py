@@ -9,7 +9,7 @@ import yaml
 
 import api.middlewares as middlewares
 from api import __path__ as api_path
-from api.authentication import change_keypair
+from api.authentication import change_keypair, clear_token_cache
 from api.constants import SECURITY_CONFIG_PATH
 from wazuh import WazuhInternalError, WazuhError
 from wazuh.rbac.orm import RolesManager, TokenManager
@@ -46,6 +46,7 @@ def update_security_conf(new_config):
         middlewares.ip_block = set()
     if 'max_request_per_minute' in new_config.keys():
         middlewares.request_counter = 0
+    clear_token_cache()
 
 
 def check_relationships(roles: list = None):
@@ -74,6 +75,7 @@ def invalid_run_as_tokens():
     """
     with TokenManager() as tm:
         tm.add_user_roles_rules(run_as=True)
+    clear_token_cache()
 
 
 def invalid_users_tokens(users: list = None):
@@ -86,6 +88,7 @@ def invalid_users_tokens(users: list = None):
     """
     with TokenManager() as tm:
         tm.add_user_roles_rules(users=set(users))
+    clear_token_cache()
 
 
 def invalid_roles_tokens(roles: list = None):
@@ -98,6 +101,7 @@ def invalid_roles_tokens(roles: list = None):
     """
     with TokenManager() as tm:
         tm.add_user_roles_rules(roles=set(roles))
+    clear_token_cache()
 
 
 def revoke_tokens():
@@ -105,6 +109,7 @@ def revoke_tokens():
     change_keypair()
     with TokenManager() as tm:
         tm.delete_all_rules()
+    clear_token_cache()
 
     return {'result': 'True'}
 
@@ -2,10 +2,17 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GP
 
+import threading
+from collections import OrderedDict
 from enum import Enum
+from itertools import islice
+from time import time
 
 from wazuh.core.agent import Agent
-from wazuh.core.utils import plain_dict_to_nested_dict, get_fields_to_nest, WazuhDBQuery, WazuhDBBackend
+from wazuh.core.exception import WazuhException
+from wazuh.core.utils import plain_dict_to_nested_dict, get_fields_to_nest, WazuhDBQuery, WazuhDBBackend, \
+    run_concurrently
+from wazuh.core.wdb import WazuhDBConnection
 
 
 class Type(Enum):
@@ -108,3 +115,176 @@ class WazuhDBQuerySyscollector(WazuhDBQuery):
                           self._data]
 
         return super()._format_data_into_dictionary() if self.array else next(iter(self._data), {})
+
+
+class InventoryIndex:
+    """Index of the packages, hotfixes and ports reported by the syscollector of the agents.
+
+    Agents are indexed on demand, the first time a lookup includes them, along with the state of their syscollector
+    scans: the `sync_info` row of the component, updated by every dbsync synchronization, and the last scan ID, which
+    covers legacy scans. Both are read through primary keys, so checking whether an inventory has changed does not scan
+    it. Changes received as dbsync deltas are picked up once the next synchronization of the component updates its
+    `sync_info` row. The state of an agent is checked again by the first lookup made `refresh_interval` seconds after
+    the last check, and the least recently looked up agents are evicted when more than `max_agents` are indexed.
+    """
+
+    # Table, component of the sync_info table, indexed fields and filter of the rows to index for each element type
+    indexed_elements = {
+        Type.PACKAGES: ('sys_programs', 'syscollector-packages', ('name', 'version'), None),
+        Type.HOTFIXES: ('sys_hotfixes', 'syscollector-hotfixes', ('hotfix',), None),
+        Type.PORTS: ('sys_ports', 'syscollector-ports', ('local_port', 'protocol'),
+                     "(state = 'listening' OR protocol LIKE 'udp%')")
+    }
+
+    def __init__(self, refresh_interval=60, max_agents=100000):
+        """Class constructor.
+
+        Parameters
+        ----------
+        refresh_interval : int
+            Seconds the indexed state of an agent is valid for. Lookups made within this time do not query it again.
+        max_agents : int
+            Maximum number of agents to keep indexed, besides the ones included in the last lookup.
+        """
+        self.refresh_interval = refresh_interval
+        self.max_agents = max_agents
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Time of the last check of every indexed agent, from the least to the most recently looked up
+        self._checked = OrderedDict()
+        self._agents = {element_type: dict() for element_type in self.indexed_elements}
+        self._keys = {element_type: dict() for element_type in self.indexed_elements}
+
+    def _get_stamps(self, wdb_conn, agent_id):
+        """Get the state of the indexed syscollector scans of an agent.
+
+        Parameters
+        ----------
+        wdb_conn : WazuhDBConnection
+            Connection to wazuh-db.
+        agent_id : str
+            ID of the agent.
+
+        Returns
+        -------
+        dict
+            Stamp of the inventory of every indexed element type.
+        """
+        components = ', '.join(f"'{component}'" for _, component, _, _ in self.indexed_elements.values())
+        tables = ' UNION ALL '.join(f"SELECT '{table}', max(scan_id), NULL FROM {table}"
+                                    for table, _, _, _ in self.indexed_elements.values())
+        rows = wdb_conn.execute(f"agent {agent_id} sql SELECT component, printf('%d %d', last_attempt, "
+                                f"last_completion) AS state, last_agent_checksum AS checksum FROM sync_info "
+                                f"WHERE component IN ({components}) UNION ALL {tables}")
+        rows = {row.get('component'): (row.get('state'), row.get('checksum')) for row in rows}
+
+        return {element_type: (rows.get(component), rows.get(table))
+                for element_type, (table, component, _, _) in self.indexed_elements.items()}
+
+    def _get_agent_keys(self, agent_id):
+        """Get the indexed keys of the inventories of an agent that have changed since they were indexed.
+
+        Parameters
+        ----------
+        agent_id : str
+            ID of the agent.
+
+        Returns
+        -------
+        dict
+            Stamp and keys of every changed element type.
+        """
+        wdb_conn = WazuhDBConnection()
+        try:
+            changed = dict()
+            for element_type, stamp in self._get_stamps(wdb_conn, agent_id).items():
+                with self._lock:
+                    indexed = self._agents[element_type].get(agent_id)
+                if indexed is not None and indexed[0] == stamp:
+                    continue
+
+                table, _, fields, condition = self.indexed_elements[element_type]
+                rows = wdb_conn.execute(f"agent {agent_id} sql SELECT DISTINCT {', '.join(fields)} FROM {table}"
+                                        f"{f' WHERE {condition}' if condition else ''}", stream=True)
+                keys = set()
+                for row in rows:
+                    key = tuple(row.get(field) for field in fields)
+                    # Every leading subset of the fields can be looked up, like a package name with or without version
+                    keys.update(key[:i] for i in range(1, len(key) + 1))
+                changed[element_type] = (stamp, frozenset(keys))
+
+            return changed
+        finally:
+            wdb_conn.close()
+
+    def _set(self, element_type, agent_id, stamp, keys):
+        """Replace the indexed keys of an agent. A `None` stamp removes the agent from the index."""
+        _, old_keys = self._agents[element_type].pop(agent_id, (None, ()))
+        for key in old_keys:
+            agents = self._keys[element_type].get(key)
+            if agents is not None:
+                agents.discard(agent_id)
+                agents or self._keys[element_type].pop(key)
+
+        if stamp is not None:
+            self._agents[element_type][agent_id] = (stamp, keys)
+            for key in keys:
+                self._keys[element_type].setdefault(key, set()).add(agent_id)
+
+    def refresh(self, agent_list):
+        """Index the agents whose state has not been checked in the last `refresh_interval` seconds.
+
+        Parameters
+        ----------
+        agent_list : iterable
+            IDs of the agents to look up.
+        """
+        agent_list = set(agent_list)
+        with self._refresh_lock:
+            now = time()
+            with self._lock:
+                outdated = [agent_id for agent_id in agent_list
+                            if now - self._checked.get(agent_id, 0) >= self.refresh_interval]
+
+            for agent_id, query in run_concurrently(self._get_agent_keys, outdated):
+                try:
+                    changed = query.result()
+                except WazuhException:
+                    # The inventory of agents whose database cannot be read is unknown
+                    changed = {element_type: (None, ()) for element_type in self.indexed_elements}
+
+                with self._lock:
+                    for element_type, (stamp, keys) in changed.items():
+                        self._set(element_type, agent_id, stamp, keys)
+                    self._checked[agent_id] = now
+
+            with self._lock:
+                for agent_id in agent_list:
+                    self._checked.move_to_end(agent_id)
+                # The agents of this lookup are the last ones, so they are not evicted
+                excess = min(len(self._checked) - self.max_agents, len(self._checked) - len(agent_list))
+                for agent_id in list(islice(self._checked, max(excess, 0))):
+                    del self._checked[agent_id]
+                    for element_type in self.indexed_elements:
+                        self._set(element_type, agent_id, None, ())
+
+    def get_agents(self, element_type, *key):
+        """Get the agents whose inventory contains an element.
+
+        Parameters
+        ----------
+        element_type : Type
+            Type of the element, one of `indexed_elements`.
+        key : str, int
+            Values of the indexed fields of the element, like a package name and, optionally, its version.
+
+        Returns
+        -------
+        set
+            IDs of the agents with the element.
+        """
+        with self._lock:
+            return set(self._keys[element_type].get(key, ()))
+
+
+inventory_index = InventoryIndex()
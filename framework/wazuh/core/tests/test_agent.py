@@ -756,10 +756,7 @@ def test_agent_add_authd_ko(mock_wazuh_socket, mocked_exception, expected_except
 @patch('socket.socket.connect')
 def test_get_manager_name(mock_connect, mock_send):
     get_manager_name()
-    calls = [call('global sql select count(*) from agent where (id = 0)'),
-             call('global sql select name from agent where (id = 0) limit 1 offset 0', raw=True)]
-
-    mock_send.assert_has_calls(calls)
+    mock_send.assert_called_once_with('global sql select name from agent where (id = 0) limit 500 offset 0', raw=True)
 
 
 @patch('wazuh.core.agent.path.exists', return_value=True)
@@ -1307,15 +1304,29 @@ def test_send_restart_command(wq_mock, wq_send_msg, agents_list, versions_list):
 
 def test_get_agents_info():
     """Test that get_agents_info() returns expected agent IDs"""
-    reset_context_cache()
-    with open(os.path.join(test_data_path, 'client.keys')) as f:
-        client_keys = ''.join(f.readlines())
-
     expected_result = {'000', '001', '002', '003', '004', '005', '006', '007', '008', '009', '010'}
 
-    with patch('wazuh.core.agent.open', mock_open(read_data=client_keys)) as m:
+    with patch('wazuh.core.common.client_keys', new=os.path.join(test_data_path, 'client.keys')):
         result = get_agents_info()
         assert result == expected_result
+        assert result is get_agents_info()
+
+
+def test_client_keys_index(tmpdir):
+    """Test that ClientKeysIndex only parses client.keys again when the file changes."""
+    client_keys = tmpdir.join('client.keys')
+    client_keys.write('001 agent-1 any key\n002 agent-2 any key\n')
+
+    index = ClientKeysIndex()
+    with patch('wazuh.core.common.client_keys', new=str(client_keys)):
+        with patch('wazuh.core.agent.agent_regex', wraps=agent_regex) as regex_mock:
+            assert index.get_agent_ids() == {'000', '001', '002'}
+            assert index.get_agent_ids() == {'000', '001', '002'}
+            assert regex_mock.findall.call_count == 1
+
+            client_keys.write('001 agent-1 any key\n002 !agent-2 any key\n003 agent-3 any key\n')
+            assert index.get_agent_ids() == {'000', '001', '003'}
+            assert regex_mock.findall.call_count == 2
 
 
 def test_get_groups():
@@ -1351,14 +1362,13 @@ def test_expand_group(group, expected_agents):
     expected_agents : set
         Expected agent IDs for the selected group
     """
-    # Clear and set get_agents_info cache
     reset_context_cache()
-    test_get_agents_info()
 
     id_groups = {'000': 'group1', '001': 'group2', '002': 'group3', '004': '', '005': 'group3,group4', '006': 'group21'}
     agent_groups = os.path.join(test_data_path, 'agent-groups')
 
-    with patch('wazuh.core.common.groups_path', new=agent_groups):
+    with patch('wazuh.core.common.groups_path', new=agent_groups), \
+            patch('wazuh.core.common.client_keys', new=os.path.join(test_data_path, 'client.keys')):
         try:
             os.makedirs(agent_groups)
             for id_, groups in id_groups.items():
@@ -1373,6 +1383,49 @@ def test_expand_group(group, expected_agents):
             rmtree(agent_groups)
 
 
+@patch('wazuh.core.agent.chown')
+@patch('wazuh.core.common.wazuh_gid')
+@patch('wazuh.core.common.wazuh_uid')
+def test_agent_groups_index(mock_uid, mock_gid, mock_chown, tmpdir):
+    """Test that AgentGroupsIndex only reads changed agent group files and keeps track of removed ones."""
+    agent_groups = str(tmpdir.mkdir('agent-groups'))
+    for id_, groups in {'001': 'default', '002': 'default,group1', '003': ''}.items():
+        with open(os.path.join(agent_groups, id_), 'w') as f:
+            f.write(groups)
+
+    index = AgentGroupsIndex()
+    with patch('wazuh.core.common.groups_path', new=agent_groups):
+        with patch.object(AgentGroupsIndex, '_read_groups', wraps=AgentGroupsIndex._read_groups) as read_mock:
+            index.refresh()
+            assert read_mock.call_count == 3
+            assert index.get_agents('default') == {'001', '002'}
+            assert index.get_agents('group1') == {'002'}
+            assert index.get_agents('*') == {'001', '002'}
+
+            # Unchanged files are not read again
+            index.refresh()
+            assert read_mock.call_count == 3
+
+            with open(os.path.join(agent_groups, '001'), 'w') as f:
+                f.write('group1,group2')
+            os.remove(os.path.join(agent_groups, '002'))
+            index.refresh()
+            assert read_mock.call_count == 4
+            assert index.get_agents('default') == set()
+            assert index.get_agents('group1') == {'001'}
+            assert index.get_agents('*') == {'001'}
+
+        # Writing an agent group file updates the index without a refresh
+        with patch('wazuh.core.agent.agent_groups_index', new=index):
+            Agent.set_agent_group_file('003', 'group2')
+        assert index.get_agents('group2') == {'001', '003'}
+
+    # Changing the agent-groups directory drops the index
+    with patch('wazuh.core.common.groups_path', new=str(tmpdir.mkdir('other-agent-groups'))):
+        index.refresh()
+        assert index.get_agents('*') == set()
+
+
 @pytest.mark.parametrize('system_resources, permitted_resources, filters, expected_result', [
     ({'001', '002', '003', '004'}, ['001', '002', '005', '006'], None,
      {'filters': {'rbac_ids': ['004', '003']}, 'rbac_negate': True}),
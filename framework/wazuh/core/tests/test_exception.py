@@ -2,6 +2,8 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import pickle
+
 from wazuh.core.exception import WazuhException, WazuhError
 
 def test_wazuh_exception__or__():
@@ -21,6 +23,18 @@ def test_wazuh_exception__deepcopy__():
     assert excp1 == excp2 and excp1 is not excp2
 
 
+def test_wazuh_exception_pickle():
+    """Check that WazuhException objects can be pickled, as done when they are raised in a process pool."""
+    excp1 = WazuhError(1000, extra_message='test', ids={'001'})
+    excp1.dapi_errors = {'master-node': {'error': 'test error'}}
+    excp2 = pickle.loads(pickle.dumps(excp1))
+    assert excp1 == excp2 and excp2.ids == {'001'} and excp2.dapi_errors == excp1.dapi_errors
+    assert excp2.message == excp1.message
+
+    excp3 = pickle.loads(pickle.dumps(WazuhException(9999, extra_message='custom error', cmd_error=True)))
+    assert excp3.message == 'custom error'
+
+
 def test_wazuh_error__or__():
     """Check that WazuhError's | operator performs the union of id sets properly."""
     error1 = WazuhError(1309, ids={1, 2, 3})
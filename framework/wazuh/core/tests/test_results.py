@@ -314,6 +314,13 @@ def test_results__goes_before_than(a, b, ascending, casters, expected_result):
     ((['001', '002'], ['003', '004']), None, [True], ['int'], ['001', '002', '003', '004']),
     ((['001', '002'], ['003', '004']), None, [False], ['int'], ['003', '004', '001', '002']),
     ((['001', '002'], ['003', '004']), ['1'], [True], ['int'], ['001', '002', '003', '004']),
+    (([{'id': '002', 'n': 'b'}], [{'id': '001', 'n': 'a'}, {'id': '003', 'n': 'c'}], [{'id': '02', 'n': 'd'}]),
+     ['id'], [True], ['int'],
+     [{'id': '001', 'n': 'a'}, {'id': '002', 'n': 'b'}, {'id': '02', 'n': 'd'}, {'id': '003', 'n': 'c'}]),
+    (([{'a': {'b': 1}}, {'a': {'b': None}}], [{'a': {'b': 3}}, {'a': {'b': 2}}]), ['a.b'], [False], None,
+     [{'a': {'b': 3}}, {'a': {'b': 2}}, {'a': {'b': 1}}, {'a': {'b': None}}]),
+    (tuple([str(i).zfill(3)] for i in range(500, 0, -1)), None, [True], ['int'],
+     [str(i).zfill(3) for i in range(1, 501)]),
 ])
 def test_results_merge(iterables, criteria, ascending, types, expected_result):
     """Test function `merge` from module results.
@@ -36,12 +36,14 @@ def test_revoke_tokens(db_setup):
     db_setup: callable
         This function creates the rbac.db file.
     """
-    with patch('wazuh.core.security.change_keypair', side_effect=None):
+    with patch('wazuh.core.security.change_keypair', side_effect=None), \
+            patch('wazuh.core.security.clear_token_cache') as mock_clear_token_cache:
         security, WazuhResult, _ = db_setup
         mock_current_user = ContextVar('current_user', default='wazuh')
         with patch("wazuh.sca.common.current_user", new=mock_current_user):
             result = security.revoke_current_user_tokens()
             assert isinstance(result, WazuhResult)
+            mock_clear_token_cache.assert_called_once()
 
 
 @pytest.mark.parametrize('role_list, expected_roles', [
@@ -67,9 +69,11 @@ def test_invalid_roles_tokens(db_setup, role_list, expected_roles):
         assert set(TM_mock.call_args.kwargs['roles']) == expected_roles
 
 
+@patch('wazuh.core.security.clear_token_cache')
 @patch('wazuh.core.security.TokenManager.add_user_roles_rules')
-def test_invalid_run_as_tokens(mock_add_user_roles_rules, db_setup):
-    """Check that TokenManager's add_user_roles_rules method is called with the expected parameters.
+def test_invalid_run_as_tokens(mock_add_user_roles_rules, mock_clear_token_cache, db_setup):
+    """Check that TokenManager's add_user_roles_rules method is called with the expected parameters and that the
+    validated tokens are removed from the API cache.
 
     Parameters
     ----------
@@ -79,6 +83,7 @@ def test_invalid_run_as_tokens(mock_add_user_roles_rules, db_setup):
     _, _, core_security = db_setup
     core_security.invalid_run_as_tokens()
     mock_add_user_roles_rules.assert_called_with(run_as=True)
+    mock_clear_token_cache.assert_called_once()
 
 
 @pytest.mark.parametrize('role_list, expected_users', [
@@ -3,6 +3,8 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import re
+import sqlite3
 from unittest.mock import patch
 
 import pytest
@@ -13,6 +15,7 @@ with patch('wazuh.core.common.wazuh_uid'):
     with patch('wazuh.core.common.wazuh_gid'):
         from wazuh.core.syscollector import *
         from wazuh.core import common
+        from wazuh.core.exception import WazuhError
 
 
 # Tests
@@ -49,3 +52,137 @@ def test_WazuhDBQuerySyscollector(mock_basic_info, mock_agents_info):
         db_query._filter_status(None)
         data = db_query.run()
         assert isinstance(db_query, WazuhDBQuerySyscollector) and isinstance(data, dict)
+
+
+class InventoryWDBMock:
+    """Fake wazuh-db connection with an in-memory database for every agent."""
+    schema = """
+        CREATE TABLE sync_info (component TEXT PRIMARY KEY, last_attempt INTEGER DEFAULT 0,
+                                last_completion INTEGER DEFAULT 0, last_agent_checksum TEXT NOT NULL DEFAULT '');
+        INSERT INTO sync_info (component) VALUES ('syscollector-packages'), ('syscollector-hotfixes'),
+                                                 ('syscollector-ports');
+        CREATE TABLE sys_programs (scan_id INTEGER, name TEXT, version TEXT, checksum TEXT DEFAULT 'legacy');
+        CREATE TABLE sys_hotfixes (scan_id INTEGER, hotfix TEXT, checksum TEXT DEFAULT 'legacy');
+        CREATE TABLE sys_ports (scan_id INTEGER, protocol TEXT, local_port INTEGER, state TEXT,
+                                checksum TEXT DEFAULT 'legacy');
+    """
+    databases = dict()
+    queries = list()
+
+    @classmethod
+    def create_agent(cls, agent_id, packages=(), hotfixes=(), ports=()):
+        db = sqlite3.connect(':memory:', check_same_thread=False)
+        db.row_factory = lambda c, r: dict(zip([col[0] for col in c.description], r))
+        db.executescript(cls.schema)
+        db.executemany('INSERT INTO sys_programs (scan_id, name, version) VALUES (0, ?, ?)', packages)
+        db.executemany('INSERT INTO sys_hotfixes (scan_id, hotfix) VALUES (0, ?)', [(hotfix,) for hotfix in hotfixes])
+        db.executemany('INSERT INTO sys_ports (scan_id, protocol, local_port, state) VALUES (0, ?, ?, ?)', ports)
+        cls.databases[agent_id] = db
+
+    def execute(self, query, stream=False):
+        agent_id, sql = re.match(r'^agent (\d{3}) sql (.+)$', query).groups()
+        self.queries.append((agent_id, sql))
+        if agent_id not in self.databases:
+            raise WazuhError(2007)
+        return self.databases[agent_id].execute(sql).fetchall()
+
+    def close(self):
+        pass
+
+
+def test_InventoryIndex():
+    """Test that InventoryIndex indexes the inventory of the agents, reading again only the changed ones."""
+    InventoryWDBMock.databases, InventoryWDBMock.queries = dict(), list()
+    InventoryWDBMock.create_agent('001', packages=[('openssl', '1.1.1'), ('curl', '7.68')], hotfixes=['KB123'],
+                                  ports=[('tcp', 22, 'listening'), ('tcp', 40000, 'established'), ('udp', 53, '')])
+    InventoryWDBMock.create_agent('002', packages=[('openssl', '1.0.2')], ports=[('tcp', 22, 'listening')])
+    index = InventoryIndex(refresh_interval=0)
+
+    def get_reads():
+        return [agent_id for agent_id, sql in InventoryWDBMock.queries if 'DISTINCT' in sql]
+
+    with patch('wazuh.core.syscollector.WazuhDBConnection', new=InventoryWDBMock):
+        index.refresh(['001', '002', '003'])
+        assert index.get_agents(Type.PACKAGES, 'openssl') == {'001', '002'}
+        assert index.get_agents(Type.PACKAGES, 'openssl', '1.0.2') == {'002'}
+        assert index.get_agents(Type.HOTFIXES, 'KB123') == {'001'}
+        assert index.get_agents(Type.PORTS, 22) == {'001', '002'}
+        assert index.get_agents(Type.PORTS, 53, 'udp') == {'001'}
+        assert index.get_agents(Type.PORTS, 40000) == set()
+        assert sorted(get_reads()) == ['001'] * 3 + ['002'] * 3
+        # The state of the inventories is read through the primary key of sync_info and the scan_id index
+        assert all('count(' not in sql and 'rowid' not in sql for _, sql in InventoryWDBMock.queries)
+
+        # Only the agents included in the lookup are indexed
+        InventoryWDBMock.queries.clear()
+        index.refresh(['002'])
+        assert {agent_id for agent_id, _ in InventoryWDBMock.queries} == {'002'}
+        assert get_reads() == []
+
+        # Only the changed inventories are read again
+        InventoryWDBMock.databases['002'].execute("UPDATE sys_programs SET version = '3.0.0'")
+        InventoryWDBMock.databases['002'].execute("UPDATE sync_info SET last_completion = 10, "
+                                                  "last_agent_checksum = 'new' WHERE component = "
+                                                  "'syscollector-packages'")
+        index.refresh(['001', '002'])
+        assert get_reads() == ['002']
+        assert index.get_agents(Type.PACKAGES, 'openssl', '3.0.0') == {'002'}
+        assert index.get_agents(Type.PACKAGES, 'openssl', '1.0.2') == set()
+
+        # dbsync deltas are indexed after the next synchronization attempt of the component
+        InventoryWDBMock.queries.clear()
+        InventoryWDBMock.databases['001'].execute("UPDATE sys_ports SET state = 'listening' WHERE local_port = 40000")
+        index.refresh(['001', '002'])
+        assert get_reads() == []
+        InventoryWDBMock.databases['001'].execute("UPDATE sync_info SET last_attempt = 20, last_agent_checksum = 'a1' "
+                                                  "WHERE component = 'syscollector-ports'")
+        index.refresh(['001', '002'])
+        assert get_reads() == ['001']
+        assert index.get_agents(Type.PORTS, 40000) == {'001'}
+
+        # Legacy scans do not update sync_info
+        InventoryWDBMock.queries.clear()
+        InventoryWDBMock.databases['002'].execute("INSERT INTO sys_hotfixes (scan_id, hotfix) VALUES (1, 'KB456')")
+        index.refresh(['001', '002'])
+        assert get_reads() == ['002']
+        assert index.get_agents(Type.HOTFIXES, 'KB456') == {'002'}
+
+
+def test_InventoryIndex_refresh_interval():
+    """Test that InventoryIndex checks the state of an agent again only after the refresh interval."""
+    InventoryWDBMock.databases, InventoryWDBMock.queries = dict(), list()
+    InventoryWDBMock.create_agent('001', packages=[('openssl', '1.1.1')])
+    index = InventoryIndex(refresh_interval=60)
+
+    with patch('wazuh.core.syscollector.WazuhDBConnection', new=InventoryWDBMock):
+        with patch('wazuh.core.syscollector.time', return_value=1000):
+            index.refresh(['001'])
+            InventoryWDBMock.queries.clear()
+            index.refresh(['001'])
+            assert InventoryWDBMock.queries == []
+
+        with patch('wazuh.core.syscollector.time', return_value=1060):
+            index.refresh(['001'])
+            assert {agent_id for agent_id, _ in InventoryWDBMock.queries} == {'001'}
+
+
+def test_InventoryIndex_max_agents():
+    """Test that InventoryIndex evicts the least recently looked up agents."""
+    InventoryWDBMock.databases, InventoryWDBMock.queries = dict(), list()
+    for agent_id in ('001', '002', '003'):
+        InventoryWDBMock.create_agent(agent_id, hotfixes=['KB123'])
+    index = InventoryIndex(max_agents=2)
+
+    with patch('wazuh.core.syscollector.WazuhDBConnection', new=InventoryWDBMock):
+        index.refresh(['001'])
+        index.refresh(['002'])
+        index.refresh(['001'])
+        index.refresh(['003'])
+        assert index.get_agents(Type.HOTFIXES, 'KB123') == {'001', '003'}
+
+        # The agents of a lookup are not evicted, even if there are more than max_agents
+        index.refresh(['001', '002', '003'])
+        assert index.get_agents(Type.HOTFIXES, 'KB123') == {'001', '002', '003'}
+        index.refresh(['003'])
+        index.refresh(['002'])
+        assert index.get_agents(Type.HOTFIXES, 'KB123') == {'002', '003'}
@@ -4,8 +4,12 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 
+import heapq
 import os
+import re
+import threading
 from collections.abc import KeysView
+from contextvars import ContextVar
 from io import StringIO
 from tempfile import TemporaryDirectory, NamedTemporaryFile
 from unittest.mock import patch, MagicMock, mock_open
@@ -17,6 +21,7 @@ with patch('wazuh.core.common.wazuh_uid'):
     with patch('wazuh.core.common.wazuh_gid'):
         from wazuh import WazuhException
         from wazuh.core.utils import *
+        from wazuh.core.utils import _compile_q, _compile_q_clause
         from wazuh.core import exception
         from wazuh.core.agent import WazuhDBQueryAgents
         from wazuh.core.common import wazuh_path, agent_name_len_limit
@@ -264,6 +269,52 @@ def test_process_array(array, filters, limit, search_text, sort_by, expected_ite
     assert result == {'items': expected_items, 'totalItems': len_expected_items}
 
 
+@pytest.mark.parametrize('offset, limit, sort_ascending, select, search_text', [
+    (0, 10, False, None, None),
+    (5, 10, True, None, None),
+    (0, 10, False, ['id'], None),
+    (0, 10, True, ['id', 'level'], '1'),
+    (0, 1000, False, None, None)
+])
+@patch('wazuh.core.utils.heapq')
+def test_process_array_partial_sort(mock_heapq, offset, limit, sort_ascending, select, search_text):
+    """Test that process_array returns the same page with and without a partial sort."""
+    mock_heapq.nsmallest.side_effect = heapq.nsmallest
+    mock_heapq.nlargest.side_effect = heapq.nlargest
+    array = [{'id': i, 'level': (i * 7) % 16, 'file': f'file_{i % 3}'} for i in range(2000)]
+    expected = sorted(array, key=lambda item: (item['level'], item['file']), reverse=not sort_ascending)
+    if select:
+        expected = [{field: item[field] for field in select} for item in expected]
+    if search_text:
+        expected = [item for item in expected if any(search_text in str(value) for value in item.values())]
+
+    result = process_array(array=array, sort_by=['level', 'file'], sort_ascending=sort_ascending, offset=offset,
+                           limit=limit, select=select, search_text=search_text)
+    assert result == {'items': expected[offset:offset + limit], 'totalItems': len(expected)}
+    # Search after a select must see every element, so the whole array is sorted
+    partial_sort = limit * 50 <= len(array) and not (select and search_text)
+    assert (mock_heapq.nsmallest.called or mock_heapq.nlargest.called) == partial_sort
+
+
+@pytest.mark.parametrize('kwargs, expected_code', [
+    ({'sort_by': ['wrong'], 'allowed_sort_fields': ['id', 'level']}, 1403),
+    ({'sort_by': ['wrong']}, 1403),
+    ({'sort_by': ['id'], 'sort_ascending': 'yes'}, 1402),
+    ({'select': ['wrong'], 'allowed_select_fields': ['id', 'level']}, 1724),
+    ({'select': ['wrong']}, 1724)
+])
+@pytest.mark.parametrize('search_text, offset', [
+    (None, 0),
+    ('not_found', 0),
+    (None, 100)
+])
+def test_process_array_wrong_fields(kwargs, expected_code, search_text, offset):
+    """Test that wrong sort and select fields raise an error even if the result or the page is empty."""
+    array = [{'id': i, 'level': i % 16} for i in range(10)]
+    with pytest.raises(WazuhError, match=f'.* {expected_code} .*'):
+        process_array(array=array, search_text=search_text, offset=offset, limit=5, **kwargs)
+
+
 @pytest.mark.parametrize('array, q, expected_items', [
     ([{'item': 'value_2', 'datetime': '2017-10-25T14:48:53.732000Z'}, {'item': 'value_1',
                                                                        'datetime': '2018-05-15T12:34:12.544000Z'}],
@@ -789,6 +840,20 @@ def test_WazuhDBQuery_protected_clean_filter(mock_socket_conn, mock_isfile, mock
     assert query.wildcard_equal_fields == expected_wef
 
 
+@patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
+def test_WazuhDBQuery_date_fields(mock_conn_db):
+    """Test WazuhDBQuery only asks the backend to decode the dates of the columns known to hold them."""
+    mock_conn_db.return_value.execute.return_value = [{'scan.time': '2021/03/04 10:20:30', 'name': '2021/03/04 10:20:30'}]
+    query = WazuhDBQuery(offset=0, limit=500, table='sys_programs', sort=None, search=None, select=None,
+                         filters=None, fields={'scan.time': 'scan_time', 'name': 'name', 'size': 'size'},
+                         default_sort_field=None, query=None, backend=WazuhDBBackend(agent_id=1), count=5,
+                         get_data=None)
+
+    assert query.backend.date_fields == {'scan.time'}
+    assert query.backend.execute('SELECT name FROM sys_programs', {}) == [
+        {'scan.time': datetime(2021, 3, 4, 10, 20, 30), 'name': '2021/03/04 10:20:30'}]
+
+
 @pytest.mark.parametrize('limit, error, expected_exception', [
     (1, False, None),
     (0, True, 1406),
@@ -969,6 +1034,22 @@ def test_WazuhDBQuery_protected_parse_query(mock_socket_conn, mock_isfile, mock_
     mock_conn_db.assert_called_once_with()
 
 
+@patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
+def test_WazuhDBBackend_substitute_params(mock_conn_db):
+    """Test WazuhDBBackend._substitute_params binds every parameter in a single pass."""
+    backend = WazuhDBBackend(agent_id=1)
+    query = 'SELECT {0} FROM t WHERE (name = :name$0) AND (name = :name) AND id IN (:rbac_ids) LIMIT :limit OFFSET :offset'
+    request = {'name$0': 'a\\b', 'name': ':limit', 'rbac_ids': ['001', 'x'], 'limit': 5, 'offset': 0}
+
+    assert backend._substitute_params(query, request) == "SELECT {0} FROM t WHERE (name = 'a\\b') AND " \
+                                                         "(name = ':limit') AND id IN (001,'x') LIMIT 5 OFFSET 0"
+    # Queries with the same parameters share the compiled regex
+    assert backend._params_regex(tuple(request)) is backend._params_regex(tuple(request))
+
+    with pytest.raises(TypeError):
+        backend._substitute_params(query, {'name': None})
+
+
 @pytest.mark.parametrize('filter_', [
     {'os.name': 'ubuntu,windows'},
     {'name': 'value1,value2'}
@@ -1255,6 +1336,90 @@ def test_WazuhDBQuery_oversized_run(mock_socket_conn, mock_isfile, execute_value
         assert query.oversized_run() == expected_result
 
 
+@pytest.mark.parametrize('ids, expected_ranges, expected_loose_ids', [
+    ([], [], []),
+    (['001', '002', '003'], [], [1, 2, 3]),
+    (['005', '001', '002', '003', '004', '009', 7], [(1, 5)], [7, 9]),
+    ([str(i).zfill(3) for i in range(1, 20001) if i != 10000] + ['30000'], [(1, 9999), (10001, 20000)], [30000])
+])
+def test_group_ids_in_ranges(ids, expected_ranges, expected_loose_ids):
+    """Test group_ids_in_ranges function."""
+    assert group_ids_in_ranges(ids) == (expected_ranges, expected_loose_ids)
+
+
+@pytest.mark.parametrize('items, max_workers', [
+    ([], 4),
+    (['001'], 4),
+    (['001', '002', '003', '004', '005', '006'], 1),
+    (['001', '002', '003', '004', '005', '006'], 2)
+])
+def test_run_concurrently(items, max_workers):
+    """Test that run_concurrently calls the function for every item, limiting the concurrent calls."""
+    context_var = ContextVar('test_run_concurrently', default=None)
+    context_var.set('request')
+    lock = threading.Lock()
+    running = {'current': 0, 'max': 0}
+
+    def func(item):
+        with lock:
+            running['current'] += 1
+            running['max'] = max(running['max'], running['current'])
+        try:
+            threading.Event().wait(0.01)
+            if item == '003':
+                raise WazuhError(1701)
+            return item, context_var.get()
+        finally:
+            with lock:
+                running['current'] -= 1
+
+    results = dict()
+    for item, future in run_concurrently(func, items, max_workers=max_workers):
+        try:
+            results[item] = future.result()
+        except WazuhError as e:
+            results[item] = e.code
+
+    assert results == {item: 1701 if item == '003' else (item, 'request') for item in items}
+    assert running['max'] <= max_workers
+
+
+@pytest.mark.parametrize('rbac_ids, negate, expected_query, expected_request', [
+    ([str(i).zfill(3) for i in range(1, 11)] + ['020'], False, '(id BETWEEN 1 AND 10 OR id IN (:rbac_id))',
+     ['20']),
+    ([str(i).zfill(3) for i in range(1, 11)], True, 'NOT (id BETWEEN 1 AND 10)', None),
+    (['001', '020'], True, 'NOT (id IN (:rbac_id))', ['1', '20'])
+])
+@patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
+def test_WazuhDBQuery_filter_rbac_ranges(mock_conn_db, rbac_ids, negate, expected_query, expected_request):
+    """Test WazuhDBQueryAgents filters RBAC agent IDs using BETWEEN ranges."""
+    query = WazuhDBQueryAgents(offset=0, limit=None, sort=None, search=None, select={'id'}, query=None,
+                               filters={'rbac_ids': rbac_ids}, rbac_negate=negate)
+    query.query = ''
+    query._filter_rbac('id', 'rbac_id', {'value': rbac_ids, 'operator': 'NOT IN' if negate else 'IN'})
+
+    assert query.query == expected_query
+    assert query.request.get('rbac_id') == expected_request
+
+
+@patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
+def test_WazuhDBQuery_run_rbac_ranges(mock_conn_db):
+    """Test large but contiguous RBAC scopes use general_run."""
+    query = WazuhDBQueryAgents(offset=0, limit=None, sort=None, search=None, select={'id'}, query=None,
+                               filters={'rbac_ids': [str(i).zfill(3) for i in range(1, 20001)]})
+    with patch.object(query, 'general_run') as general_run_mock, \
+            patch.object(query, 'oversized_run') as oversized_run_mock:
+        query.run()
+        general_run_mock.assert_called_once_with()
+        oversized_run_mock.assert_not_called()
+
+    # The same scope without ranges does not fit in the query
+    query.rbac_id_ranges = False
+    with patch.object(query, 'oversized_run') as oversized_run_mock:
+        query.run()
+        oversized_run_mock.assert_called_once_with()
+
+
 @patch('wazuh.core.utils.glob.glob', return_value=True)
 @patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
 @patch("wazuh.core.database.isfile", return_value=True)
@@ -1572,6 +1737,32 @@ def test_filter_array_by_query(q, return_length):
     assert (len(result) == return_length)
 
 
+@pytest.mark.parametrize('q, expected_ids', [
+    ('mitre.technique.id=T1110', [1, 3]),
+    ('mitre.technique.id~T10', [1, 2]),
+    ('groups=syslog;level>5', [2, 3]),
+    ('level<10,groups=web', [1, 2]),
+    ('date>2020-01-01', [2, 3]),
+    ('date<2020-06-01T00:00:00Z;date!=2019-05-03 10:00:00', [2]),
+])
+@patch('wazuh.core.utils._compile_q_clause', wraps=_compile_q_clause)
+def test_filter_array_by_query_compiled(mock_compile, q, expected_ids):
+    """Test that filter_array_by_query compiles each query once and filters nested lists, integers and dates."""
+    array = [
+        {'id': 1, 'level': 3, 'groups': ['web'], 'date': '2019-05-03 10:00:00',
+         'mitre': {'technique': [{'id': 'T1110'}, {'id': 'T1078'}]}},
+        {'id': 2, 'level': 7, 'groups': ['web', 'syslog'], 'date': '2020-05-03T10:00:00Z',
+         'mitre': {'technique': [{'id': 'T1059'}]}},
+        {'id': 3, 'level': 12, 'groups': ['syslog'], 'date': '2021-01-01',
+         'mitre': {'technique': [{'id': 'T1110'}]}},
+    ]
+    _compile_q.cache_clear()
+
+    for _ in range(2):
+        assert [item['id'] for item in filter_array_by_query(q, array)] == expected_ids
+    assert mock_compile.call_count == len(re.split('[,;]', q))
+
+
 @pytest.mark.parametrize('select, required_fields, expected_result', [
     (['single_select', 'nested1.nested12.nested121'], {'required'}, {'required': None,
                                                                      'single_select': None,
@@ -1701,6 +1892,44 @@ def test_to_relative_path():
     assert to_relative_path(path, prefix='etc') == basename(path)
 
 
+def test_RulesetCache(tmpdir):
+    """Test that RulesetCache only parses the changed files and indexes the items of every requested combination."""
+    rules_dir = tmpdir.mkdir('rules')
+    rules_dir.join('a.xml').write('1,web\n2,syslog')
+    rules_dir.join('b.xml').write('3,web')
+
+    def load_file(filename, relative_dirname, status):
+        with open(os.path.join(str(tmpdir), relative_dirname, filename)) as f:
+            return [{'id': int(line.split(',')[0]), 'groups': line.split(',')[1:], 'status': status, 'filename': filename}
+                    for line in f.read().splitlines()]
+
+    load_mock = MagicMock(side_effect=load_file)
+    cache = RulesetCache(load_mock, indexed_fields=['id', 'groups', 'status'])
+    files = [{'filename': 'a.xml', 'relative_dirname': 'rules', 'status': 'enabled'},
+             {'filename': 'b.xml', 'relative_dirname': 'rules', 'status': 'disabled'}]
+
+    with patch('wazuh.core.common.wazuh_path', new=str(tmpdir)):
+        ruleset = cache.get(files)
+        assert [item['id'] for item in ruleset.get_items(ruleset.find('groups', ['web']))] == [1, 3]
+        assert ruleset.find('status', ['enabled']) == {0, 1}
+        assert cache.get(files) is ruleset
+        assert cache.get(files[1:]).get_items() == [{'id': 3, 'groups': ['web'], 'status': 'disabled',
+                                                     'filename': 'b.xml'}]
+        assert load_mock.call_count == 2
+
+        rules_dir.join('b.xml').write('3,web\n4,web,syslog')
+        ruleset = cache.get(files)
+        assert load_mock.call_count == 3
+        assert ruleset.find('groups', ['syslog']) == {1, 3}
+        assert 4 in ruleset.indexes['id']
+
+        # Files no longer requested nor part of a kept index are removed
+        cache = RulesetCache(load_mock, indexed_fields=['id'], max_indexes=1)
+        cache.get(files[:1])
+        cache.get(files[1:])
+        assert set(cache._files) == {(os.path.join(str(tmpdir), 'rules', 'b.xml'), 'disabled')}
+
+
 @patch('wazuh.core.utils.common.ruleset_rules_path', new=test_files_path)
 @patch('wazuh.core.utils.common.user_rules_path', new=test_files_path)
 def test_expand_rules():
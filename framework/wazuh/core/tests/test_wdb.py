@@ -2,13 +2,16 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
-from struct import pack
+import asyncio
+import socket
+from datetime import datetime
+from struct import pack, unpack
 from unittest.mock import patch
 
 import pytest
 
 from wazuh.core import exception
-from wazuh.core.wdb import WazuhDBConnection
+from wazuh.core.wdb import AsyncWazuhDBConnection, WazuhDBConnection, WazuhDBConnectionPool, decode_dates
 from wazuh.core.common import MAX_SOCKET_BUFFER_SIZE
 
 
@@ -31,6 +34,118 @@ def test_failed_connection():
             WazuhDBConnection()
 
 
+@patch("socket.socket.connect")
+def test_connection_pool(connect_mock):
+    """
+    Tests idle sockets are reused, unhealthy ones are discarded and the pool size is bounded
+    """
+    pool = WazuhDBConnectionPool(max_idle=1)
+    conn, peer = socket.socketpair()
+    extra_conn, extra_peer = socket.socketpair()
+
+    pool.release('/wdb', conn)
+    pool.release('/wdb', extra_conn)
+    # The pool is full, so the second socket must be closed
+    assert extra_conn.fileno() == -1
+    assert pool.acquire('/wdb') is conn
+    connect_mock.assert_not_called()
+
+    # A socket with unread data can not be reused
+    pool.release('/wdb', conn)
+    peer.send(b'stale')
+    new_conn = pool.acquire('/wdb')
+    assert new_conn is not conn and conn.fileno() == -1
+    connect_mock.assert_called_once_with('/wdb')
+
+    # Sockets with an unfinished exchange are not kept
+    pool.release('/wdb', new_conn, reusable=False)
+    assert new_conn.fileno() == -1
+
+    pool.release('/wdb', socket.socketpair()[0])
+    pool.clear()
+    assert pool._idle == {}
+    peer.close(), extra_peer.close()
+
+
+def test_connection_is_returned_to_pool():
+    """
+    Tests WazuhDBConnection gives its socket back to the pool only when the last exchange was completed
+    """
+    with patch('wazuh.core.wdb.connection_pool') as pool_mock:
+        mywdb = WazuhDBConnection()
+        mywdb.close()
+        mywdb.close()
+        pool_mock.release.assert_called_once_with(mywdb.socket_path, pool_mock.acquire.return_value, reusable=True)
+
+        pool_mock.reset_mock()
+        mywdb = WazuhDBConnection()
+        pool_mock.acquire.return_value.recv.return_value = pack('<I', 20)
+        with patch('wazuh.core.wdb.WazuhDBConnection._recvall', return_value=b'err partial'):
+            with pytest.raises(exception.WazuhException):
+                mywdb._send('test')
+        mywdb.close()
+        pool_mock.release.assert_called_once_with(mywdb.socket_path, pool_mock.acquire.return_value, reusable=False)
+
+
+async def start_wdb_server(path, responses, received):
+    """Start a unix server that answers every request with the next item of `responses`."""
+    async def handle(reader, writer):
+        for response in responses:
+            size = unpack('<I', await reader.readexactly(4))[0]
+            received.append((await reader.readexactly(size)).decode())
+            writer.write(format_msg(response) + response)
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_unix_server(handle, path=path)
+
+
+@pytest.mark.asyncio
+async def test_async_run_wdb_command(tmpdir):
+    """
+    Tests AsyncWazuhDBConnection follows the 'due'/'ok' protocol and decodes the responses
+    """
+    path = str(tmpdir.join('wdb'))
+    received = []
+    server = await start_wdb_server(path, [b'due chunk1', b'ok chunk2', b'ok {"a": "b", "c": "(null)"}'], received)
+    with patch('wazuh.core.common.wdb_socket_path', path):
+        mywdb = AsyncWazuhDBConnection()
+    try:
+        assert await mywdb.run_wdb_command('global sync-agent-info-get ') == ['chunk1', 'chunk2']
+        assert await mywdb._send('global test') == {'a': 'b'}
+        assert received == ['global sync-agent-info-get ', 'global sync-agent-info-get ', 'global test']
+    finally:
+        mywdb.close()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_async_wdb_errors(tmpdir):
+    """
+    Tests AsyncWazuhDBConnection raises the same exceptions as WazuhDBConnection
+    """
+    path = str(tmpdir.join('wdb'))
+    with patch('wazuh.core.common.wdb_socket_path', path):
+        mywdb = AsyncWazuhDBConnection()
+
+    # There is no socket to connect to
+    with pytest.raises(exception.WazuhInternalError, match=".* 2005 .*"):
+        await mywdb.send('global test')
+
+    server = await start_wdb_server(path, [b'err Invalid request', b'due chunk1', b'err chunk2'], [])
+    try:
+        with pytest.raises(exception.WazuhError, match=".* 2003 .*"):
+            await mywdb._send('global test')
+        with pytest.raises(exception.WazuhError, match=".* 2003 .* chunk2"):
+            await mywdb.run_wdb_command('global test')
+        # wazuh-db closed the connection before answering
+        with pytest.raises(exception.WazuhInternalError, match=".* 2005 .*"):
+            await mywdb.send('global test')
+    finally:
+        mywdb.close()
+        server.close()
+
+
 @patch("socket.socket.connect")
 @patch("socket.socket.send")
 def test_wrong_character_encodings_wdb(send_mock, connect_mock):
@@ -63,6 +178,37 @@ def test_null_values_are_removed(send_mock, connect_mock):
         assert received == {"a": "a", "c": [1, 2, 3], "d": {}}
 
 
+def test_decode_dates():
+    """
+    Tests only the given fields are decoded as dates
+    """
+    rows = [{'scan_time': '2021/03/04 10:20:30', 'name': '2021/03/04 10:20:30', 'size': 10},
+            {'scan_time': 'unknown'}]
+    assert decode_dates(rows, {'scan_time', 'size'}) == [
+        {'scan_time': datetime(2021, 3, 4, 10, 20, 30), 'name': '2021/03/04 10:20:30', 'size': 10},
+        {'scan_time': 'unknown'}]
+    assert WazuhDBConnection.json_decoder({'name': '2021/03/04 10:20:30'}) == {'name': '2021/03/04 10:20:30'}
+
+
+@patch("socket.socket.connect")
+@patch("socket.socket.send")
+def test_execute_decodes_date_columns(send_mock, connect_mock):
+    """
+    Tests queries not built by WazuhDBQuery still get the date columns decoded, including expressions over them
+    """
+    def recv_mock(size_to_receive):
+        data = b'ok [{"scan_time": "2021/03/04 10:20:30", "max(detection_time)": "2021/03/05 11:00:00", ' \
+               b'"name": "2021/03/04 10:20:30"}]'
+        return format_msg(data) if size_to_receive == 4 else data
+
+    with patch('socket.socket.recv', side_effect=recv_mock):
+        mywdb = WazuhDBConnection()
+        received = mywdb._send("agent 000 sql SELECT scan_time, max(detection_time), name FROM sys_programs")
+        assert received == [{'scan_time': datetime(2021, 3, 4, 10, 20, 30),
+                             'max(detection_time)': datetime(2021, 3, 5, 11, 0, 0),
+                             'name': '2021/03/04 10:20:30'}]
+
+
 @patch("socket.socket.connect")
 @patch("socket.socket.send")
 def test_failed_send_private(send_mock, connect_mock):
@@ -170,17 +316,45 @@ def test_execute_pagination(socket_send_mock, connect_mock):
 
     # Test pagination
     with patch("wazuh.core.wdb.WazuhDBConnection._send",
-               side_effect=[[{'total': 5}], exception.WazuhInternalError(2009), ['ok', '{"total": 5}'],
-                            ['ok', '{"total": 5}']]):
-        mywdb.execute("agent 000 sql select test from test offset 1 limit 500")
+               side_effect=[exception.WazuhInternalError(2009), ['ok', '[{"total": 5}]'],
+                            ['ok', '[{"total": 5}]']]) as send_mock:
+        assert mywdb.execute("agent 000 sql select test from test offset 1 limit 500") == [{'total': 5}] * 2
+        assert send_mock.call_args_list[-1][0][0] == 'agent 000 sql select test from test offset 251 limit 250'
 
     # Test pagination error
     with patch("wazuh.core.wdb.WazuhDBConnection._send",
-               side_effect=[[{'total': 5}], exception.WazuhInternalError(2009)]):
+               side_effect=[exception.WazuhInternalError(2009)]):
         with pytest.raises(exception.WazuhInternalError, match=".* 2009 .*"):
             mywdb.execute("agent 000 sql select test from test offset 1 limit 1")
 
 
+@patch("socket.socket.connect")
+@patch("socket.socket.send")
+def test_execute_stream(socket_send_mock, connect_mock):
+    """
+    Tests rows are fetched page by page and the total is only queried when requested
+    """
+    mywdb = WazuhDBConnection(request_slice=2)
+    # The second page is requested with a doubled step and it is the last one since it is not full
+    pages = [['ok', '[{"id": 1}, {"id": 2}]'], ['ok', '[{"id": 3}, {"id": 4}, {"id": 5}]']]
+
+    with patch("wazuh.core.wdb.WazuhDBConnection._send", side_effect=pages) as send_mock:
+        rows = mywdb.execute("agent 000 sql select id from test", stream=True)
+        send_mock.assert_not_called()
+        assert next(rows) == {'id': 1}
+        assert send_mock.call_count == 1
+        assert list(rows) == [{'id': 2}, {'id': 3}, {'id': 4}, {'id': 5}]
+        assert send_mock.call_args_list[-1][0][0] == 'agent 000 sql select id from test limit 4 offset 2'
+        assert send_mock.call_count == 2
+
+    mywdb.request_slice = 2
+    with patch("wazuh.core.wdb.WazuhDBConnection._send", side_effect=[[{'count(*)': 5}]] + pages) as send_mock:
+        rows, total = mywdb.execute("agent 000 sql select id from test", count=True, stream=True)
+        assert total == 5
+        assert send_mock.call_args_list[0][0][0] == 'agent 000 sql select count(*) from test'
+        assert len(list(rows)) == 5
+
+
 @pytest.mark.parametrize('error_query, error_type, expected_exception, delete, update', [
     ('agent 000 sql delete test', None, 2004, True, False),
     ('agent 000 sql update test', None, 2004, False, True),
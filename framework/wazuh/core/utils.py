@@ -5,6 +5,7 @@
 import errno
 import glob
 import hashlib
+import heapq
 import json
 import operator
 import os
@@ -12,10 +13,13 @@ import re
 import stat
 import sys
 import tempfile
+import threading
 import typing
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextvars import copy_context
 from copy import deepcopy
 from datetime import datetime, timedelta
-from functools import wraps
+from functools import lru_cache, wraps
 from itertools import groupby, chain
 from os import chmod, chown, path, listdir, mkdir, curdir, rename, utime, remove, walk
 from os.path import join, basename, relpath
@@ -24,7 +28,7 @@ from shutil import Error, copyfile, move
 from subprocess import CalledProcessError, check_output
 from xml.etree.ElementTree import ElementTree
 
-from cachetools import cached, TTLCache
+from cachetools import cached, LRUCache, TTLCache
 from defusedxml.ElementTree import fromstring
 from defusedxml.minidom import parseString
 
@@ -34,7 +38,7 @@ from wazuh.core import common
 from wazuh.core.common import pidfiles_path
 from wazuh.core.database import Connection
 from wazuh.core.exception import WazuhError, WazuhInternalError
-from wazuh.core.wdb import WazuhDBConnection
+from wazuh.core.wdb import DATE_COLUMNS, WazuhDBConnection, decode_dates
 
 # Python 2/3 compatibility
 if sys.version_info[0] == 3:
@@ -182,16 +186,98 @@ def process_array(array, search_text=None, complementary_search=False, search_in
 
         array = new_array
 
+    # Sort and select fields are checked against the whole array, so errors do not depend on the returned page
+    _check_process_fields(array, select=select, sort_by=sort_by, sort_ascending=sort_ascending,
+                          allowed_sort_fields=allowed_sort_fields, allowed_select_fields=allowed_select_fields)
+
+    # Search and query filters only look at the selected fields, so they must be applied after the select
+    filter_selected = select and (search_text or q)
+    if not filter_selected:
+        array = _search_and_query(array, search_text, complementary_search, search_in_fields, q)
+    total_items = len(array)
+
+    # Only the first offset + limit elements are needed if no element is filtered out after sorting
+    sort_limit = None
+    if not filter_selected and limit is not None and 0 < limit <= common.maximum_database_limit and offset >= 0:
+        sort_limit = offset + limit
+
     if sort_by == [""]:
-        array = sort_array(array, sort_ascending=sort_ascending)
+        array = sort_array(array, sort_ascending=sort_ascending, limit=sort_limit)
     elif sort_by:
         array = sort_array(array, sort_by=sort_by, sort_ascending=sort_ascending,
-                           allowed_sort_fields=allowed_sort_fields)
+                           allowed_sort_fields=allowed_sort_fields, limit=sort_limit)
+
+    if filter_selected:
+        array = select_array(array, select=select, required_fields=required_fields,
+                             allowed_select_fields=allowed_select_fields)
+        array = _search_and_query(array, search_text, complementary_search, search_in_fields, q)
+        return {'items': cut_array(array, offset=offset, limit=limit), 'totalItems': len(array)}
 
+    # Select only the fields of the returned elements
+    array = cut_array(array, offset=offset, limit=limit)
     if select:
         array = select_array(array, select=select, required_fields=required_fields,
                              allowed_select_fields=allowed_select_fields)
 
+    return {'items': array, 'totalItems': total_items}
+
+
+def _check_process_fields(array, select=None, sort_by=None, sort_ascending=True, allowed_sort_fields=None,
+                          allowed_select_fields=None):
+    """Check the sort and select parameters of process_array like sort_array and select_array do on the whole array.
+
+    Raises
+    ------
+    WazuhError(1402)
+        If sort_ascending is not a boolean.
+    WazuhError(1403)
+        If a sort field is not allowed or, if no allowed fields are given, not found in the first element.
+    WazuhError(1724)
+        If a select field is not allowed or, if no allowed fields are given, an element has none of them.
+    """
+    if not array:
+        return
+
+    if sort_by:
+        if not isinstance(sort_ascending, bool):
+            raise WazuhError(1402)
+        if sort_by != [""]:
+            if allowed_sort_fields:
+                _check_sort_fields(set(allowed_sort_fields), set(sort_by))
+            elif type(array[0]) is dict:
+                _check_sort_fields(set(array[0].keys()), set(sort_by))
+
+    if select:
+        if allowed_select_fields:
+            select_no_nested = {field for field in select if '.' not in field}
+            if not select_no_nested.issubset(allowed_select_fields):
+                raise WazuhError(1724, "{}".format(', '.join(select_no_nested)))
+        elif not all(any(_has_field(item, field) for field in select) for item in array):
+            raise WazuhError(1724, "{}".format(', '.join(set(select))))
+
+
+def _has_field(item, field):
+    """Check whether an element has a field. Nested fields are separated by dots."""
+    for key in field.split('.'):
+        try:
+            item = item[key]
+        except (KeyError, TypeError):
+            return False
+
+    return True
+
+
+def _check_sort_fields(allowed_sort_fields, sort_by):
+    """Check that every sort field is allowed."""
+    if not sort_by.issubset(allowed_sort_fields):
+        incorrect_fields = ', '.join(sort_by - allowed_sort_fields)
+        raise WazuhError(1403, extra_remediation='Allowed sort fields: {0}. '
+                                                 'Wrong fields: {1}'.format(', '.join(allowed_sort_fields),
+                                                                            incorrect_fields))
+
+
+def _search_and_query(array, search_text=None, complementary_search=False, search_in_fields=None, q=''):
+    """Apply the search and query filters of process_array."""
     if search_text:
         array = search_array(array, search_text=search_text, complementary_search=complementary_search,
                              search_in_fields=search_in_fields)
@@ -199,7 +285,7 @@ def process_array(array, search_text=None, complementary_search=False, search_in
     if q:
         array = filter_array_by_query(q, array)
 
-    return {'items': cut_array(array, offset=offset, limit=limit), 'totalItems': len(array)}
+    return array
 
 
 def cut_array(array, offset=0, limit=common.database_limit):
@@ -231,24 +317,26 @@ def cut_array(array, offset=0, limit=common.database_limit):
         return array[offset:offset + limit]
 
 
-def sort_array(array, sort_by=None, sort_ascending=True, allowed_sort_fields=None):
+def _sorted(array, key=None, reverse=False, limit=None):
+    """Sort an array. If only its first `limit` elements are needed and they are few compared with the array length,
+    select them with a partial sort instead.
+    """
+    if limit is not None and len(array) >= 50 * limit:
+        return heapq.nlargest(limit, array, key=key) if reverse else heapq.nsmallest(limit, array, key=key)
+
+    return sorted(array, key=key, reverse=reverse)
+
+
+def sort_array(array, sort_by=None, sort_ascending=True, allowed_sort_fields=None, limit=None):
     """Sorts an array.
 
     :param array: Array to sort.
     :param sort_by: Array of fields.
     :param sort_ascending: Ascending if true and descending if false
     :param allowed_sort_fields: Check sort_by with allowed_sort_fields (array).
+    :param limit: Only the first `limit` elements of the sorted array are needed. The rest may be left out.
     :return: sorted array.
     """
-
-    def check_sort_fields(allowed_sort_fields, sort_by):
-        # Check if every element in sort['fields'] is in allowed_sort_fields
-        if not sort_by.issubset(allowed_sort_fields):
-            incorrect_fields = ', '.join(sort_by - allowed_sort_fields)
-            raise WazuhError(1403, extra_remediation='Allowed sort fields: {0}. '
-                                                     'Wrong fields: {1}'.format(', '.join(allowed_sort_fields),
-                                                                                incorrect_fields))
-
     if not array:
         return array
 
@@ -257,17 +345,17 @@ def sort_array(array, sort_by=None, sort_ascending=True, allowed_sort_fields=Non
 
     is_sort_valid = False
     if allowed_sort_fields:
-        check_sort_fields(set(allowed_sort_fields), set(sort_by))
+        _check_sort_fields(set(allowed_sort_fields), set(sort_by))
         is_sort_valid = True
 
     if sort_by:  # array should be a dictionary or a Class
         if type(array[0]) is dict:
-            not is_sort_valid and check_sort_fields(set(array[0].keys()), set(sort_by))
+            not is_sort_valid and _check_sort_fields(set(array[0].keys()), set(sort_by))
             try:
-                return sorted(array,
-                              key=lambda o: tuple(
-                                  o.get(a).lower() if type(o.get(a)) in (str, unicode) else o.get(a) for a in sort_by),
-                              reverse=not sort_ascending)
+                return _sorted(array,
+                               key=lambda o: tuple([v.lower() if type(v) in (str, unicode) else v
+                                                    for v in map(o.get, sort_by)]),
+                               reverse=not sort_ascending, limit=limit)
             except TypeError:
                 items_with_missing_keys = list()
                 copy_array = deepcopy(array)
@@ -287,14 +375,14 @@ def sort_array(array, sort_by=None, sort_ascending=True, allowed_sort_fields=Non
                     return sorted_array
 
         else:
-            return sorted(array,
-                          key=lambda o: tuple(
-                              getattr(o, a).lower() if type(getattr(o, a)) in (str, unicode) else getattr(o, a)
-                              for a in sort_by),
-                          reverse=not sort_ascending)
+            return _sorted(array,
+                           key=lambda o: tuple(
+                               getattr(o, a).lower() if type(getattr(o, a)) in (str, unicode) else getattr(o, a)
+                               for a in sort_by),
+                           reverse=not sort_ascending, limit=limit)
     else:
         if type(array) is set or (type(array[0]) is not dict and 'class \'wazuh' not in str(type(array[0]))):
-            return sorted(array, reverse=not sort_ascending)
+            return _sorted(array, reverse=not sort_ascending, limit=limit)
         else:
             return array
 
@@ -926,142 +1014,260 @@ def get_timeframe_in_seconds(timeframe):
     return seconds
 
 
-def filter_array_by_query(q: str, input_array: typing.List) -> typing.List:
+_q_clause_regex = re.compile(r'([\w\-]+)(?:\.?)((?:[\w\-](?:\.[\w\-])*)*)(=|!=|<|>|~)([\w\-./: ]+)')
+_q_date_patterns = ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%fZ']
+# Every date pattern starts with the year, so strings that do not cannot be dates
+_q_date_prefix_regex = re.compile(r'\d{4}-')
+_q_operators = {'=': operator.eq, '!=': operator.ne, '<': operator.lt, '>': operator.gt}
+
+
+@lru_cache(maxsize=4096)
+def _parse_q_date(value: str) -> typing.Optional[datetime]:
+    """Parse a date in any of the formats accepted by the 'q' parameter.
+
+    Parameters
+    ----------
+    value : str
+        String to parse.
+
+    Returns
+    -------
+    datetime or None
+        Parsed date, None if the string is not a date.
     """
-    Filters a list of dictionaries by 'q' parameter, like as a SQL query
+    if _q_date_prefix_regex.match(value):
+        for pattern in _q_date_patterns:
+            try:
+                return datetime.strptime(value, pattern)
+            except ValueError:
+                pass
 
-    :param input_array: list to be filtered
-    :param q: query for filtering a list
+    return None
 
-    :return: list with processed query
+
+def _get_q_candidates(iterable, key_list: list, candidates: list) -> bool:
+    """Get the values found following a list of keys. Lists found on the way are expanded.
+
+    Parameters
+    ----------
+    iterable : dict or list
+        Iterable object to be iterated over.
+    key_list : list
+        List of keys.
+    candidates : list
+        List that will be filled with the values found.
+
+    Returns
+    -------
+    bool
+        True if there is one value at least, False otherwise.
     """
-    def check_date_format(element):
-        """Check if a given field is a date. If so, transform the date to the standard API format (ISO 8601).
-        If not, return the field.
+    for index, key in enumerate(key_list):
+        if isinstance(iterable, list):
+            found = False
+            for element in iterable:
+                found = _get_q_candidates(element, key_list[index:], candidates) or found
+            return found
+        elif key in iterable:
+            iterable = iterable[key]
+        else:
+            return False
 
-        Parameters
-        ----------
-        element : str
-            Item to check.
+    candidates.append(iterable)
+    return True
 
-        Returns
-        -------
-        In case of a date, return the element after its conversion. Otherwise it return the element.
-        """
-        date_patterns = ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%fZ']
 
-        for pattern in date_patterns:
+def _compile_q_comparison(op: str, value: str) -> typing.Callable:
+    """Build the function that compares a field value with the value of a 'q' clause.
+
+    The value of the clause is parsed as a date or integer once, instead of for every compared field.
+
+    Parameters
+    ----------
+    op : str
+        Operator of the clause.
+    value : str
+        Value of the clause.
+
+    Returns
+    -------
+    callable
+        Function returning whether a field value, or any of its items if it is a list, satisfies the clause.
+    """
+    if op == '~':
+        def compare(field_value):
+            # Field value should be str if operator is '~'
+            return value in (str(field_value) if type(field_value) == int else field_value)
+    else:
+        operation = _q_operators[op]
+        date_value = _parse_q_date(value)
+        if date_value is not None:
+            def compare(field_value):
+                field_date = _parse_q_date(field_value) if isinstance(field_value, str) else None
+                return operation(field_value if field_date is None else field_date, date_value)
+        else:
             try:
-                return datetime.strptime(element, pattern)
+                int_value = int(value)
             except ValueError:
-                pass
+                int_value = None
 
-        return element
+            def compare(field_value):
+                # Cast the clause value to integer if the field value is an integer
+                if type(field_value) == int:
+                    return operation(field_value, int_value if int_value is not None else int(value))
+                return operation(field_value, value)
 
-    def check_clause(value1: typing.Union[str, int], op: str, value2: str) -> bool:
-        """
-        Checks an operation between value1 and value2. 'value1' could be an
-        integer, it is necessary cast value2 to integer if this happens
+    def check(field_value):
+        if isinstance(field_value, list):
+            return any(compare(item) for item in field_value)
+        return compare(field_value)
 
-        :param value1: first value of the operation
-        :param op: operation to be done
-        :param value2: second value of the operation
+    return check
 
-        :return: True if operation is satisfied, False otherwise
-        """
-        operators = {'=': operator.eq,
-                     '!=': operator.ne,
-                     '<': operator.lt,
-                     '>': operator.gt}
-        value1 = [value1] if not isinstance(value1, list) else value1
-        for val in value1:
-            if op == '~':
-                # value1 should be str if operator is '~'
-                val = str(val) if type(val) == int else val
-                if value2 in val:
-                    return True
-            else:
-                # cast value2 to integer if value1 is integer
-                value2 = check_date_format(value2)
-                if type(value2) == datetime:
-                    val = check_date_format(val)
-                value2 = int(value2) if type(val) == int else value2
-                if operators[op](val, value2):
-                    return True
 
-        return False
+def _compile_q_clause(clause: str) -> typing.Callable:
+    """Build the predicate of a single clause of the 'q' parameter, like 'field.subfield>value'.
 
-    def get_match_candidates(iterable, key_list: list, candidates: list):
-        """Get the match candidates following a list of keys.
+    Parameters
+    ----------
+    clause : str
+        Clause to compile.
 
-        Parameters
-        ----------
-        iterable : dict or list
-            Iterable object to be iterated over.
-        key_list : list
-            List of keys.
-        candidates : list
-            Empty list that will be filled
+    Raises
+    ------
+    WazuhError(1407)
+        The clause is not valid.
 
-        Returns
-        -------
-        True if there is one match at least. False otherwise.
-        """
-        for index, key in enumerate(key_list):
-            if isinstance(iterable, list):
-                candidate_list = list()
-                for element in list(iterable):
-                    candidate_list.append(get_match_candidates(element, key_list[index:], candidates))
-                if True in candidate_list:
-                    return True
-                else:
-                    return False
+    Returns
+    -------
+    callable
+        Function returning whether an element satisfies the clause.
+    """
+    try:
+        field_name, field_subnames, op, value = _q_clause_regex.match(clause).groups()
+    except AttributeError:
+        raise WazuhError(1407, extra_message=f"Parameter 'q' is not valid: '{clause}'")
+
+    check = _compile_q_comparison(op, value)
+    subnames = field_subnames.split('.') if field_subnames else None
+
+    def predicate(element):
+        if field_name not in element:
+            return False
+        if subnames:
+            candidates = list()
+            if _get_q_candidates(element[field_name], subnames, candidates):
+                return any(check(candidate) for candidate in candidates if candidate)
+        return check(element[field_name])
+
+    return predicate
+
+
+@lru_cache(maxsize=128)
+def _compile_q(q: str) -> typing.List[typing.List[typing.Callable]]:
+    """Compile the 'q' parameter into a list of OR clauses, each of them a list of AND clause predicates."""
+    return [[_compile_q_clause(and_clause) for and_clause in or_clause.split(';')] for or_clause in q.split(',')]
+
+
+def filter_array_by_query(q: str, input_array: typing.List) -> typing.List:
+    """Filter a list of dictionaries by 'q' parameter, like as a SQL query.
+
+    The query is compiled once into predicates which are then applied to every element.
+
+    Parameters
+    ----------
+    q : str
+        Query for filtering a list. Clauses are separated by ',' (OR) and ';' (AND).
+    input_array : list
+        List to be filtered.
+
+    Returns
+    -------
+    list
+        Elements which satisfy the query.
+    """
+    if not input_array:
+        return list()
+
+    or_clauses = _compile_q(q)
+
+    return [element for element in input_array
+            if any(all(predicate(element) for predicate in and_clauses) for and_clauses in or_clauses)]
+
+
+def group_ids_in_ranges(ids, min_range_size=5):
+    """Group numeric IDs into ranges of consecutive values.
+
+    Parameters
+    ----------
+    ids : iterable
+        Numeric IDs, either as integers or as strings of digits (like '001').
+    min_range_size : int
+        Minimum number of consecutive IDs to build a range. Shorter sequences are cheaper to list one by one.
+
+    Returns
+    -------
+    list
+        Tuples with the first and last ID of each range.
+    list
+        IDs that do not belong to any range, as integers.
+    """
+    ranges, loose_ids = list(), list()
+    sequence = list()
+    for number in sorted({int(i) for i in ids}) + [None]:
+        if sequence and (number is None or number != sequence[-1] + 1):
+            if len(sequence) >= min_range_size:
+                ranges.append((sequence[0], sequence[-1]))
             else:
-                if key in iterable:
-                    iterable = iterable[key]
-                else:
-                    return False
-        else:
-            candidates.append(iterable)
-            return True
+                loose_ids.extend(sequence)
+            sequence = list()
+        sequence.append(number)
 
-    # compile regular expression only one time when function is called
-    # get elements in a clause
-    re_get_elements = re.compile(r'([\w\-]+)(?:\.?)((?:[\w\-](?:\.[\w\-])*)*)(=|!=|<|>|~)([\w\-./: ]+)')
-    # get a list with OR clauses
-    or_clauses = q.split(',')
-    output_array = []
-    # process elements of input_array
-    for elem in input_array:
-        # if an element matches an OR clause, it will be added to output
-        for or_clause in or_clauses:
-            # all AND clauses should match for adding an element to output
-            and_clauses = or_clause.split(';')
-            match = True  # flag for checking clauses
-            for and_clause in and_clauses:
-                # get elements in a clause
-                try:
-                    field_name, field_subnames, op, value = re_get_elements.match(and_clause).groups()
-                except AttributeError:
-                    raise WazuhError(1407, extra_message=f"Parameter 'q' is not valid: '{and_clause}'")
-
-                # check if a clause is satisfied
-                match_candidates = list()
-                if field_subnames and field_name in elem and \
-                        get_match_candidates(deepcopy(elem[field_name]), field_subnames.split('.'), match_candidates):
-                    if any([check_clause(candidate, op, value) for candidate in match_candidates if candidate]):
-                        continue
-                else:
-                    if field_name in elem and check_clause(elem[field_name], op, value):
-                        continue
-                match = False
-                break
+    return ranges, loose_ids
 
-            # if match = True, add element to output and break the loop
-            if match:
-                output_array.append(elem)
-                break
-    return output_array
+
+def run_concurrently(func, items, max_workers=common.max_concurrent_agent_queries):
+    """Call a function for every item using a bounded number of threads.
+
+    Each call runs in a copy of the caller's context, so context variables like the RBAC ones remain available.
+
+    Parameters
+    ----------
+    func : callable
+        Function to call with each item as its only argument.
+    items : iterable
+        Items to call the function with, like a list of agent IDs.
+    max_workers : int
+        Maximum number of calls running at the same time.
+
+    Yields
+    ------
+    item
+        Item the call was made with.
+    concurrent.futures.Future
+        Finished call. Its `result()` returns the value or raises the exception of the call.
+    """
+    items = list(items)
+    if len(items) <= 1 or max_workers <= 1:
+        # Threads are not worth it when there is nothing to run concurrently
+        for item in items:
+            future = Future()
+            try:
+                future.set_result(func(item))
+            except Exception as e:
+                future.set_exception(e)
+            yield item, future
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = {executor.submit(copy_context().run, func, item): item for item in items}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future
+        finally:
+            # Do not start pending calls if the caller stops consuming the results
+            for future in futures:
+                future.cancel()
 
 
 class AbstractDatabaseBackend:
@@ -1111,6 +1317,8 @@ class WazuhDBBackend(AbstractDatabaseBackend):
         self.query_format = query_format
         self.max_size = max_size
         self.request_slice = request_slice
+        # Result fields holding dates as text. They are set by WazuhDBQuery according to DATE_COLUMNS
+        self.date_fields = set()
 
         super().__init__()
 
@@ -1120,30 +1328,43 @@ class WazuhDBBackend(AbstractDatabaseBackend):
     def close_connection(self):
         self.conn.close()
 
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _params_regex(params):
+        """Compile a regex matching the placeholders of the given parameters.
+
+        Parameters are sorted by length so a parameter is never matched as the prefix of a longer one. The regex
+        only depends on the parameter names, so it is shared by every query with the same shape.
+        """
+        return re.compile(r':\b(' + '|'.join(re.escape(str(p)) for p in sorted(params, key=lambda p: -len(str(p)))) +
+                          r')\b')
+
     def _substitute_params(self, query, request):
         """
         Substitute request parameters in query. This is only necessary when the backend is wdb. Sqlite substitutes
         parameters by itself.
         """
+        if not request:
+            return query
+
+        values = dict()
         for k, v in request.items():
             if isinstance(v, list):
-                values = list()
+                elements = list()
                 for element in v:
                     if isinstance(element, (int, float)) or (isinstance(element, str) and element.isnumeric()):
-                        values.append(element)
+                        elements.append(element)
                     else:
-                        values.append(f"'{element}'")
-                value = f"{','.join(values)}"
+                        elements.append(f"'{element}'")
+                values[str(k)] = f"{','.join(elements)}"
             elif isinstance(v, (int, float)):
-                value = f"{v}"
+                values[str(k)] = f"{v}"
             elif isinstance(v, str):
-                value = f"'{v}'"
+                values[str(k)] = f"'{v}'"
             else:
                 raise TypeError(f'Invalid type for request parameters: {type(v)}')
-            # Escape backslash to avoid re error
-            value = value.replace('\\', '\\\\')
-            query = re.sub(r':\b' + re.escape(str(k)) + r'\b', value, query)
-        return query
+
+        return self._params_regex(tuple(request.keys())).sub(lambda match: values[match.group(1)], query)
 
     def _render_query(self, query):
         """Render query attending the format."""
@@ -1159,13 +1380,44 @@ class WazuhDBBackend(AbstractDatabaseBackend):
     def execute(self, query, request, count=False):
         """Execute SQL query through WazuhDB socket."""
         query = self._substitute_params(query, request)
-        return self.conn.execute(query=self._render_query(query), count=count)
+        result = self.conn.execute(query=self._render_query(query), count=count)
+        if count or not self.date_fields:
+            return result
+        return decode_dates(result, self.date_fields)
+
+
+@lru_cache(maxsize=1024)
+def _tokenize_q(query_regex, q):
+    """Split a `q` parameter into its filters, or return None if it is not valid.
+
+    The result only depends on the `q` string, so it is cached: dashboards keep sending the same queries.
+    """
+    if not query_regex.match(q):
+        return None
+    return tuple(query_regex.findall(q))
 
 
 class WazuhDBQuery(object):
     """This class describes a database query for wazuh
     """
 
+    # Whether the RBAC resources of the query are numeric IDs, which can be filtered using ranges
+    rbac_id_ranges = False
+
+    # To correctly turn a query into SQL, a regex is used. This regex will extract all necessary information:
+    # For example, the following regex -> (name!=wazuh;id>5),group=webserver <- would return 3 different matches:
+    #   (name != wazuh ;
+    #    id   > 5      ),
+    #    group=webserver
+    query_regex = re.compile(
+        r'(\()?' +  # A ( character.
+        r'([\w.]+)' +  # Field name: name of the field to look on DB
+        '([=!<>~]{1,2})' +  # Operator: looks for =, !=, <, > or ~.
+        r"([\[\]\w _\-\.:\\/']+)" +  # Value: A string.
+        r"(\))?" +  # A ) character
+        "([,;])?"  # Separator: looks for ;, , or nothing.
+    )
+
     def __init__(self, offset, limit, table, sort, search, select, query, fields, default_sort_field, count,
                  get_data, backend, default_sort_order='ASC', filters={}, min_select_fields=set(), date_fields=set(),
                  extra_fields=set(), distinct=False, rbac_negate=True):
@@ -1215,19 +1467,6 @@ class WazuhDBQuery(object):
         self.query_separators = {',': 'OR', ';': 'AND', '': ''}
         self.special_characters = "\'\""
         self.wildcard_equal_fields = set()
-        # To correctly turn a query into SQL, a regex is used. This regex will extract all necessary information:
-        # For example, the following regex -> (name!=wazuh;id>5),group=webserver <- would return 3 different matches:
-        #   (name != wazuh ;
-        #    id   > 5      ),
-        #    group=webserver
-        self.query_regex = re.compile(
-            r'(\()?' +  # A ( character.
-            r'([\w.]+)' +  # Field name: name of the field to look on DB
-            '([' + ''.join(self.query_operators.keys()) + "]{1,2})" +  # Operator: looks for =, !=, <, > or ~.
-            r"([\[\]\w _\-\.:\\/']+)" +  # Value: A string.
-            r"(\))?" +  # A ) character
-            "([" + ''.join(self.query_separators.keys()) + "])?"  # Separator: looks for ;, , or nothing.
-        )
         self.date_regex = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
         self.date_fields = date_fields
         self.extra_fields = extra_fields
@@ -1236,6 +1475,9 @@ class WazuhDBQuery(object):
         self.inverse_fields = {v: k for k, v in self.fields.items()}
         self.backend = backend
         self.rbac_negate = rbac_negate
+        if isinstance(self.backend, WazuhDBBackend):
+            date_columns = DATE_COLUMNS.get(self.table, set())
+            self.backend.date_fields = {field for field, column in self.fields.items() if column in date_columns}
 
     def __enter__(self):
         return self
@@ -1322,11 +1564,12 @@ class WazuhDBQuery(object):
 
         :return: A list with processed query (self.fields)
         """
-        if not self.query_regex.match(self.q):
+        q_filters = _tokenize_q(self.query_regex, self.q)
+        if q_filters is None:
             raise WazuhError(1407, self.q)
 
         level = 0
-        for open_level, field, operator, value, close_level, separator in self.query_regex.findall(self.q):
+        for open_level, field, operator, value, close_level, separator in q_filters:
             if field not in self.fields.keys():
                 raise WazuhError(1408, "Available fields: {}. Field: {}".format(', '.join(self.fields), field))
             if operator not in self.query_operators:
@@ -1389,8 +1632,7 @@ class WazuhDBQuery(object):
             # If it matches the same format as DB (timestamp integer), filter directly by value (next if cond).
             self._filter_date(q_filter, field_name)
         elif 'rbac' in field_name:
-            self.query += f"{field_name.lstrip('rbac_')} {q_filter['operator']} (:{field_filter})"
-            self.request[field_filter] = q_filter['value']
+            self._filter_rbac(field_name.lstrip('rbac_'), field_filter, q_filter)
         else:
             if q_filter['value'] is not None:
                 self.request[field_filter] = q_filter['value'] if field_name != "version" else re.sub(
@@ -1405,6 +1647,35 @@ class WazuhDBQuery(object):
             else:
                 self.query += '{} IS null'.format(self.fields[field_name])
 
+    def _filter_rbac(self, field_name, field_filter, q_filter):
+        """Filter by the resources allowed (or denied) by RBAC.
+
+        Numeric IDs are grouped into ranges when `rbac_id_ranges` is set, so large RBAC scopes still fit in a single
+        query.
+        """
+        if not self._use_rbac_id_ranges(q_filter['value']):
+            self.query += f"{field_name} {q_filter['operator']} (:{field_filter})"
+            self.request[field_filter] = q_filter['value']
+            return
+
+        ranges, loose_ids = group_ids_in_ranges(q_filter['value'])
+        conditions = [f"{field_name} BETWEEN {first} AND {last}" for first, last in ranges]
+        if loose_ids or not ranges:
+            conditions.append(f"{field_name} IN (:{field_filter})")
+            self.request[field_filter] = [str(loose_id) for loose_id in loose_ids]
+        self.query += f"{'NOT ' if q_filter['operator'] == 'NOT IN' else ''}({' OR '.join(conditions)})"
+
+    def _use_rbac_id_ranges(self, rbac_ids):
+        return self.rbac_id_ranges and all(str(rbac_id).isdigit() for rbac_id in rbac_ids)
+
+    def _get_rbac_filter_size(self, rbac_ids):
+        """Estimate the size that the RBAC filter will take in the query."""
+        if not self._use_rbac_id_ranges(rbac_ids):
+            return len(str(rbac_ids))
+
+        ranges, loose_ids = group_ids_in_ranges(rbac_ids)
+        return len(str(loose_ids)) + sum(len(f" OR id BETWEEN {first} AND {last}") for first, last in ranges)
+
     def _add_filters_to_query(self):
         self._parse_filters()
         curr_level = 0
@@ -1531,8 +1802,8 @@ class WazuhDBQuery(object):
             return self.general_run()
 
         rbac_ids = set(self.legacy_filters.get('rbac_ids', set()))
-        return self.general_run() if len(str(rbac_ids)) < common.MAX_QUERY_FILTERS_RESERVED_SIZE else \
-            self.oversized_run()
+        return self.general_run() if self._get_rbac_filter_size(rbac_ids) < common.MAX_QUERY_FILTERS_RESERVED_SIZE \
+            else self.oversized_run()
 
     def reset(self):
         """Resets query to its initial value. Useful when doing several requests to the same DB."""
@@ -1608,6 +1879,136 @@ class WazuhDBQueryGroupBy(WazuhDBQuery):
         self.select = self.select & self.filter_fields['fields']
 
 
+class RulesetIndex:
+    """Ruleset items (rules or decoders) along with indexes of the positions of the items by field value."""
+
+    def __init__(self, items, indexed_fields):
+        """Class constructor.
+
+        Parameters
+        ----------
+        items : list
+            Ruleset items.
+        indexed_fields : list
+            Fields to index. Every value of list fields is indexed.
+        """
+        self.items = items
+        self.indexes = {field: dict() for field in indexed_fields}
+        for position, item in enumerate(items):
+            for field, index in self.indexes.items():
+                values = item[field] if isinstance(item[field], list) else [item[field]]
+                for value in values:
+                    index.setdefault(value, set()).add(position)
+
+    def find(self, field, values):
+        """Get the positions of the items whose field has any of the values.
+
+        Parameters
+        ----------
+        field : str
+            Indexed field.
+        values : iterable
+            Values to look for.
+
+        Returns
+        -------
+        set
+            Positions of the items.
+        """
+        index = self.indexes[field]
+        return set().union(*(index.get(value, ()) for value in values))
+
+    def get_items(self, positions=None):
+        """Get the items in the given positions, in the ruleset order. All the items are returned if no positions
+        are given."""
+        return list(self.items) if positions is None else [self.items[position] for position in sorted(positions)]
+
+
+class RulesetCache:
+    """Ruleset items parsed from their files and kept in memory.
+
+    A file is only parsed again when its modification time, size or inode changes. The indexes of the last combinations
+    of files requested are kept too, as the files of each request depend on the RBAC permissions of the user. Files
+    neither requested nor part of a kept index are dropped when a new index is built. Cached items must not be modified.
+    """
+
+    def __init__(self, load_function, indexed_fields, max_indexes=8):
+        """Class constructor.
+
+        Parameters
+        ----------
+        load_function : callable
+            Function parsing a ruleset file. It receives the filename, relative dirname and status of the file.
+        indexed_fields : list
+            Fields of the items to index.
+        max_indexes : int
+            Maximum number of file combinations whose index is kept.
+        """
+        self._load_function = load_function
+        self._indexed_fields = indexed_fields
+        self._lock = threading.Lock()
+        self._files = dict()
+        self._indexes = LRUCache(maxsize=max_indexes)
+
+    def _load_file(self, filename, relative_dirname, status):
+        """Get the items of a file, parsing it only if it has changed since it was cached."""
+        file_path = join(common.wazuh_path, relative_dirname, filename)
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            # Let the load function raise its own error
+            self._files.pop((file_path, status), None)
+            return None, self._load_function(filename, relative_dirname, status)
+
+        stamp = (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+        cached = self._files.get((file_path, status))
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, self._load_function(filename, relative_dirname, status))
+            self._files[(file_path, status)] = cached
+
+        return cached
+
+    def _prune_files(self, requested):
+        """Remove the cached files which are neither requested nor part of a kept index."""
+        used = {(join(wazuh_path, relative_dirname, filename), status)
+                for wazuh_path, files in [*self._indexes.keys(), (common.wazuh_path, requested)]
+                for filename, relative_dirname, status, *_ in files}
+        for file_key in self._files.keys() - used:
+            del self._files[file_key]
+
+    def get(self, files):
+        """Get the index of the items of a list of ruleset files.
+
+        Parameters
+        ----------
+        files : list
+            Ruleset files, as returned by the functions listing rule or decoder files.
+
+        Returns
+        -------
+        RulesetIndex
+            Items of the files and their indexes.
+        """
+        with self._lock:
+            loaded = [(file['filename'], file['relative_dirname'], file['status'],
+                       *self._load_file(file['filename'], file['relative_dirname'], file['status'])) for file in files]
+            key = (common.wazuh_path, tuple(file[:4] for file in loaded))
+            index = self._indexes.get(key)
+            if index is None:
+                index = RulesetIndex([item for file in loaded for item in file[4]], self._indexed_fields)
+                if all(file[3] is not None for file in loaded):
+                    self._indexes[key] = index
+                self._prune_files(loaded)
+
+            return index
+
+    def clear(self):
+        """Remove every cached file and index."""
+        with self._lock:
+            self._files.clear()
+            self._indexes.clear()
+
+
 @common.context_cached('system_rules')
 def expand_rules():
     """Return all ruleset rule files in the system.
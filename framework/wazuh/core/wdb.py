@@ -2,11 +2,16 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import asyncio
 import datetime
 import json
+import os
 import re
+import select
 import socket
 import struct
+import threading
+from functools import lru_cache
 from typing import List
 
 from wazuh.core import common
@@ -15,6 +20,307 @@ from wazuh.core.exception import WazuhInternalError, WazuhError
 
 DATE_FORMAT = re.compile(r'\d{4}\/\d{2}\/\d{2} \d{2}:\d{2}:\d{2}')
 
+# Columns of each wazuh-db table that store dates as text in DATE_FORMAT
+DATE_COLUMNS = {
+    'sys_netiface': {'scan_time'},
+    'sys_osinfo': {'scan_time'},
+    'sys_hwinfo': {'scan_time'},
+    'sys_ports': {'scan_time'},
+    'sys_programs': {'scan_time', 'install_time'},
+    'sys_hotfixes': {'scan_time'},
+    'sys_processes': {'scan_time'},
+    'ciscat_results': {'scan_time'},
+    'vuln_cves': {'detection_time'}
+}
+# Names of every date column. Results of queries not built by WazuhDBQuery are decoded according to them
+DATE_COLUMN_NAMES = frozenset().union(*DATE_COLUMNS.values())
+
+
+@lru_cache(maxsize=1024)
+def is_date_key(key):
+    """Check whether a result key refers to a date column, like `scan_time` or `max(scan_time)`.
+
+    Parameters
+    ----------
+    key : str
+        Key of a row returned by wazuh-db.
+
+    Returns
+    -------
+    bool
+        Whether the key contains the name of a date column or not.
+    """
+    return any(column in key for column in DATE_COLUMN_NAMES)
+
+
+def decode_dates(rows, date_fields):
+    """Convert the values of the given fields from DATE_FORMAT strings to datetime objects.
+
+    Parameters
+    ----------
+    rows : list
+        Rows returned by wazuh-db. They are updated in place.
+    date_fields : set
+        Fields holding dates in DATE_FORMAT. Usually obtained from DATE_COLUMNS.
+
+    Returns
+    -------
+    list
+        Updated rows.
+    """
+    for row in rows:
+        for field in date_fields & row.keys():
+            value = row[field]
+            if isinstance(value, str) and DATE_FORMAT.match(value):
+                row[field] = datetime.datetime.strptime(value, '%Y/%m/%d %H:%M:%S')
+
+    return rows
+
+
+class WazuhDBConnectionPool:
+    """
+    Process-wide pool of idle sockets connected to wazuh-db
+    """
+
+    def __init__(self, max_idle=10):
+        """Class constructor.
+
+        Parameters
+        ----------
+        max_idle : int
+            Maximum number of idle sockets kept per socket path. Sockets released when the pool is full are closed.
+        """
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        """Drop the sockets inherited from the parent process after a fork, they must not be shared."""
+        if self._pid != os.getpid():
+            self._idle = {}
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _is_healthy(conn):
+        """Check that an idle socket is still usable.
+
+        An idle wazuh-db socket must not have anything to read. If it is readable, wazuh-db either closed it or
+        left unread data in it, so it cannot be reused.
+
+        Parameters
+        ----------
+        conn : socket.socket
+            Idle socket to check.
+
+        Returns
+        -------
+        bool
+            True if the socket can be reused, False otherwise.
+        """
+        try:
+            poller = select.poll()
+            poller.register(conn, select.POLLIN | select.POLLPRI)
+            return not poller.poll(0)
+        except (OSError, ValueError):
+            return False
+
+    def acquire(self, socket_path):
+        """Get a socket connected to `socket_path`, reusing an idle one when possible.
+
+        Parameters
+        ----------
+        socket_path : str
+            Path to the wazuh-db socket.
+
+        Raises
+        ------
+        WazuhInternalError(2005)
+            If a new connection could not be established.
+
+        Returns
+        -------
+        socket.socket
+            Connected socket.
+        """
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.get(socket_path, [])
+            while idle:
+                conn = idle.pop()
+                if self._is_healthy(conn):
+                    return conn
+                conn.close()
+
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(socket_path)
+        except OSError as e:
+            conn.close()
+            raise WazuhInternalError(2005, e)
+
+        return conn
+
+    def release(self, socket_path, conn, reusable=True):
+        """Give a socket back to the pool.
+
+        Parameters
+        ----------
+        socket_path : str
+            Path the socket is connected to.
+        conn : socket.socket
+            Socket to give back.
+        reusable : bool
+            Whether the socket is in a consistent state. Sockets with a pending request or response are closed.
+        """
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.setdefault(socket_path, [])
+            if reusable and len(idle) < self.max_idle and self._is_healthy(conn):
+                idle.append(conn)
+                return
+
+        conn.close()
+
+    def clear(self):
+        """Close every idle socket of the pool."""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle = {}
+
+
+connection_pool = WazuhDBConnectionPool()
+
+
+class AsyncWazuhDBConnection:
+    """
+    Represents an asynchronous connection to the wdb socket
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.socket_path = common.wdb_socket_path
+        self._reader = None
+        self._writer = None
+
+    async def open_connection(self):
+        """Connect to the wdb socket.
+
+        Raises
+        ------
+        WazuhInternalError(2005)
+            If the connection could not be established.
+        """
+        try:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+        except OSError as e:
+            raise WazuhInternalError(2005, e)
+
+    def close(self):
+        """Close the connection with the wdb socket."""
+        if self._writer is not None:
+            self._writer.close()
+            self._reader, self._writer = None, None
+
+    async def _send(self, msg, raw=False):
+        """Send a message to the wdb socket and wait for its response without blocking the event loop.
+
+        The connection is opened the first time it is needed and again if wazuh-db closed it.
+
+        Parameters
+        ----------
+        msg : str
+            Message to be sent.
+        raw : bool
+            Whether to return the response without decoding its JSON payload.
+
+        Raises
+        ------
+        WazuhInternalError(2005)
+            If the connection could not be established or it was closed before receiving the full response.
+
+        Returns
+        -------
+        list, dict
+            Status and payload of the response if `raw`, decoded payload otherwise.
+        """
+        if self._writer is None or self._writer.is_closing():
+            await self.open_connection()
+
+        encoded_msg = msg.encode(encoding='utf-8')
+        try:
+            self._writer.write(struct.pack('<I', len(encoded_msg)) + encoded_msg)
+            await self._writer.drain()
+            data_size = struct.unpack('<I', await self._reader.readexactly(4))[0]
+            data = await self._reader.readexactly(data_size)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            # The stream can not be reused once a request was left without a complete response
+            self.close()
+            raise WazuhInternalError(2005, e)
+
+        data = data.decode(encoding='utf-8', errors='ignore').split(" ", 1)
+
+        # Max size socket buffer is 64KB
+        if data_size >= MAX_SOCKET_BUFFER_SIZE:
+            raise WazuhInternalError(2009)
+
+        if data[0] == "err":
+            raise WazuhError(2003, data[1])
+        elif raw:
+            return data
+        else:
+            return json.loads(data[1], object_hook=WazuhDBConnection.json_decoder)
+
+    async def send(self, query, raw=True):
+        """Send a message to the wdb socket.
+
+        Parameters
+        ----------
+        query : str
+            Query to be executed in wazuh-db.
+        raw : bool
+            Whether to process the response.
+
+        Returns
+        -------
+        str, dict
+            Result of the query.
+        """
+        return await self._send(query, raw)
+
+    async def run_wdb_command(self, command):
+        """Run command in wdb and return list of retrieved information.
+
+        It follows the same 'ok'/'due'/'err' protocol as `WazuhDBConnection.run_wdb_command`.
+
+        Parameters
+        ----------
+        command : str
+            Command to be executed inside wazuh-db
+
+        Returns
+        -------
+        response : list
+            List with JSON results
+        """
+        response = []
+
+        while True:
+            status, payload = await self._send(command, raw=True)
+            if status == 'err':
+                raise WazuhInternalError(2007, extra_message=payload)
+            if payload != '[]':
+                response.append(payload)
+            # Exit if there are no items left to return
+            if status == 'ok':
+                break
+
+        return response
+
 
 class WazuhDBConnection:
     """
@@ -28,14 +334,16 @@ class WazuhDBConnection:
         self.socket_path = common.wdb_socket_path
         self.request_slice = request_slice
         self.max_size = max_size
-        self.__conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        try:
-            self.__conn.connect(self.socket_path)
-        except OSError as e:
-            raise WazuhInternalError(2005, e)
+        self.__conn = None
+        # Whether the socket has a request whose response has not been completely read yet
+        self.__pending = False
+        self.__conn = connection_pool.acquire(self.socket_path)
 
     def close(self):
-        self.__conn.close()
+        """Give the socket back to the connection pool. Sockets with an unfinished exchange are closed."""
+        if self.__conn is not None:
+            conn, self.__conn = self.__conn, None
+            connection_pool.release(self.socket_path, conn, reusable=not self.__pending)
 
     def __del__(self):
         self.close()
@@ -87,13 +395,16 @@ class WazuhDBConnection:
         encoded_msg = msg.encode(encoding='utf-8')
         packed_msg = struct.pack('<I', len(encoded_msg)) + encoded_msg
         # Send msg
+        self.__pending = True
         self.__conn.send(packed_msg)
 
         # Get the data size (4 bytes)
         data = self.__conn.recv(4)
         data_size = struct.unpack('<I', data[0:4])[0]
 
-        data = self._recvall(data_size).decode(encoding='utf-8', errors='ignore').split(" ", 1)
+        data = self._recvall(data_size)
+        self.__pending = len(data) < data_size
+        data = data.decode(encoding='utf-8', errors='ignore').split(" ", 1)
 
         # Max size socket buffer is 64KB
         if data_size >= MAX_SOCKET_BUFFER_SIZE:
@@ -117,14 +428,19 @@ class WazuhDBConnection:
 
     @staticmethod
     def json_decoder(dct):
+        """Remove '(null)' values from the objects returned by wazuh-db and decode the dates of the keys referring to
+        date columns.
+
+        Only the keys matching DATE_COLUMN_NAMES are checked. Fields renamed by WazuhDBQuery are decoded by its
+        backend, see `decode_dates`.
+        """
         result = {}
         for k, v in dct.items():
             if v == "(null)":
                 continue
-            if isinstance(v, str) and DATE_FORMAT.match(v):
-                result[k] = datetime.datetime.strptime(v, '%Y/%m/%d %H:%M:%S')
-            else:
-                result[k] = v
+            if isinstance(v, str) and is_date_key(k) and DATE_FORMAT.match(v):
+                v = datetime.datetime.strptime(v, '%Y/%m/%d %H:%M:%S')
+            result[k] = v
 
         return result
 
@@ -214,28 +530,109 @@ class WazuhDBConnection:
         """
         return self._send(query, raw)
 
-    def execute(self, query, count=False, delete=False, update=False):
+    def _send_page(self, query_lower, step, off):
+        """Fetch `step` rows starting at `off`, splitting the request when the response is too big for the socket.
+
+        Parameters
+        ----------
+        query_lower : str
+            Select query with ':limit' and ':offset' placeholders.
+        step : int
+            Number of rows to fetch.
+        off : int
+            Offset of the first row to fetch.
+
+        Raises
+        ------
+        WazuhInternalError(2009)
+            If a single row does not fit in the socket buffer.
+
+        Returns
+        -------
+        list
+            Fetched rows.
+        int
+            Suggested number of rows to fetch in the next request.
         """
-        Sends a sql query to wdb socket
+        try:
+            request = query_lower.replace(':limit', 'limit {}'.format(step)).replace(':offset', 'offset {}'.format(off))
+            request_response = self._send(request, raw=True)[1]
+            rows = json.loads(request_response, object_hook=WazuhDBConnection.json_decoder)
+            return rows, step * 2 if len(request_response) * 2 < MAX_SOCKET_BUFFER_SIZE else step
+        except WazuhInternalError:
+            # if the step is already 1, it can't be divided
+            if step == 1:
+                raise WazuhInternalError(2009)
+
+            rows, _ = self._send_page(query_lower, step // 2, off)
+            # Add step // 2 remaining when the step is odd to avoid losing information
+            remaining_rows, next_step = self._send_page(query_lower, step // 2 + step % 2, step // 2 + off)
+            return rows + remaining_rows, next_step
+
+    def _paginate(self, query_lower, offset, limit):
+        """Yield the result of a select query page by page.
+
+        Pages are requested until `limit` rows are fetched or wazuh-db returns fewer rows than requested, so the
+        total number of rows does not need to be known beforehand.
+
+        Parameters
+        ----------
+        query_lower : str
+            Select query with ':limit' and ':offset' placeholders.
+        offset : int
+            Offset of the first row to fetch.
+        limit : int
+            Maximum number of rows to fetch. 0 to fetch every row.
+
+        Yields
+        ------
+        list
+            Rows of each page.
         """
-        def send_request_to_wdb(query_lower, step, off, response):
-            try:
-                request = query_lower.replace(':limit', 'limit {}'.format(step)).replace(':offset', 'offset {}'.format(off))
-                request_response = self._send(request, raw=True)[1]
-                response.extend(json.loads(request_response, object_hook=WazuhDBConnection.json_decoder))
-                if len(request_response)*2 < MAX_SOCKET_BUFFER_SIZE:
-                    return step*2
-                else:
-                    return step
-            except WazuhInternalError:
-                # if the step is already 1, it can't be divided
-                if step == 1:
-                    raise WazuhInternalError(2009)
-
-                send_request_to_wdb(query_lower, step // 2, off, response)
-                # Add step // 2 remaining when the step is odd to avoid losing information
-                return send_request_to_wdb(query_lower, step // 2 + step % 2, step // 2 + off, response)
+        try:
+            off = offset
+            while not limit or off < limit + offset:
+                step = limit if self.request_slice > limit > 0 else self.request_slice
+                if limit:
+                    # Min() used to avoid fetching more items than the maximum specified in `limit`.
+                    step = min(limit + offset - off, step)
+                rows, self.request_slice = self._send_page(query_lower, step, off)
+                yield rows
+                if len(rows) < step:
+                    break
+                off += step
+        except ValueError as e:
+            raise WazuhError(2006, str(e))
+        except (WazuhError, WazuhInternalError) as e:
+            raise e
+        except Exception as e:
+            raise WazuhInternalError(2007, str(e))
+
+    def execute(self, query, count=False, delete=False, update=False, stream=False):
+        """Send a sql query to wdb socket.
+
+        Select queries are paginated to keep every response under the socket buffer size. The total number of rows
+        is only queried when `count` is True.
+
+        Parameters
+        ----------
+        query : str
+            Query to be executed in wazuh-db.
+        count : bool
+            Whether to return the total number of rows matching the query too.
+        delete : bool
+            Whether the query is a delete query.
+        update : bool
+            Whether the query is an update query.
+        stream : bool
+            Whether to return an iterator that fetches the rows page by page instead of a list with all of them.
 
+        Returns
+        -------
+        list, iterator, int, dict
+            Rows of the select query (and their total if `count`), the value of a count query or the wazuh-db
+            response for delete and update queries.
+        """
         query_lower = self.__query_lower(query)
 
         self.__query_input_validation(query_lower)
@@ -272,43 +669,34 @@ class WazuhDBConnection:
                 # Replace limit with a wildcard
                 query_lower = ' :limit'.join(query_lower.rsplit((' limit {}'.format(lim)), 1))
 
-            regex = re.compile(r"\w+(?: \d*|)? sql select ([A-Z a-z0-9,*_` \.\-%\(\):\']+?) from")
-            select = regex.match(query_lower).group(1)
-            gb_regex = re.compile(r"(group by [^\s]+)")
-            countq = query_lower.replace(select, "count(*)", 1).replace(":limit", "").replace(":offset", "")
-            try:
-                group_by = gb_regex.search(query_lower)
-                if group_by:
-                    countq = countq.replace(group_by.group(1), '')
-            except IndexError:
-                pass
-
-            try:
-                total = list(self._send(countq)[0].values())[0]
-            except IndexError:
-                total = 0
-
-            limit = lim if lim != 0 else total
-
-            response = []
+            total = 0
+            if count:
+                regex = re.compile(r"\w+(?: \d*|)? sql select ([A-Z a-z0-9,*_` \.\-%\(\):\']+?) from")
+                select = regex.match(query_lower).group(1)
+                gb_regex = re.compile(r"(group by [^\s]+)")
+                countq = query_lower.replace(select, "count(*)", 1).replace(":limit", "").replace(":offset", "")
+                try:
+                    group_by = gb_regex.search(query_lower)
+                    if group_by:
+                        countq = countq.replace(group_by.group(1), '')
+                except IndexError:
+                    pass
+
+                try:
+                    total = list(self._send(countq)[0].values())[0]
+                except IndexError:
+                    total = 0
+
             if ':limit' not in query_lower:
                 query_lower += ' :limit'
             if ':offset' not in query_lower:
                 query_lower += ' :offset'
 
-            try:
-                off = offset
-                while off < limit + offset:
-                    step = limit if self.request_slice > limit > 0 else self.request_slice
-                    # Min() used to avoid fetching more items than the maximum specified in `limit`.
-                    self.request_slice = send_request_to_wdb(query_lower, min(limit + offset - off, step), off, response)
-                    off += step
-            except ValueError as e:
-                raise WazuhError(2006, str(e))
-            except (WazuhError, WazuhInternalError) as e:
-                raise e
-            except Exception as e:
-                raise WazuhInternalError(2007, str(e))
+            pages = self._paginate(query_lower, offset, lim)
+            if stream:
+                response = (row for page in pages for row in page)
+            else:
+                response = [row for page in pages for row in page]
 
             if count:
                 return response, total
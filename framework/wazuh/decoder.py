@@ -1,6 +1,7 @@
 # Copyright (C) 2015-2021, Wazuh Inc.
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+from copy import deepcopy
 from os import remove
 from os.path import join, exists
 from typing import Union
@@ -10,7 +11,7 @@ import xmltodict
 
 import wazuh.core.configuration as configuration
 from wazuh.core import common
-from wazuh.core.decoder import load_decoders_from_file, check_status, REQUIRED_FIELDS, SORT_FIELDS, DECODER_FIELDS
+from wazuh.core.decoder import decoders_cache, check_status, REQUIRED_FIELDS, SORT_FIELDS, DECODER_FIELDS
 from wazuh.core.exception import WazuhInternalError, WazuhError
 from wazuh.core.results import AffectedItemsWazuhResult
 from wazuh.core.rule import format_rule_decoder_file
@@ -44,44 +45,35 @@ def get_decoders(names=None, status=None, filename=None, relative_dirname=None,
     result = AffectedItemsWazuhResult(none_msg='No decoder was returned',
                                       some_msg='Some decoders were not returned',
                                       all_msg='All selected decoders were returned')
-    all_decoders = list()
     if names is None:
         names = list()
 
-    for decoder_file in get_decoders_files(limit=None).affected_items:
-        all_decoders.extend(load_decoders_from_file(decoder_file['filename'], decoder_file['relative_dirname'],
-                                                    decoder_file['status']))
+    ruleset = decoders_cache.get(get_decoders_files(limit=None).affected_items)
 
     status = check_status(status)
     status = ['enabled', 'disabled'] if status == 'all' else [status]
-    parameters = {'relative_dirname': relative_dirname, 'filename': filename, 'name': names, 'parents': parents, 'status': status}
-    decoders = list(all_decoders)
-    no_existent_files = names[:]
-    for d in all_decoders:
-        for key, value in parameters.items():
-            if value:
-                if key == 'name':
-                    if d[key] not in value and d in decoders:
-                        decoders.remove(d)
-                    elif d[key] in no_existent_files:
-                        no_existent_files.remove(d[key])
-                elif key == 'status' and d[key] not in value and d in decoders:
-                    decoders.remove(d)
-                elif key == 'filename' and d[key] not in filename and d in decoders:
-                    decoders.remove(d)
-                elif key == 'relative_dirname' and d[key] != relative_dirname and d in decoders:
-                    decoders.remove(d)
-                elif 'parent' in d['details'] and parents and d in decoders:
-                    decoders.remove(d)
-
-    for decoder_name in no_existent_files:
-        result.add_failed_item(id_=decoder_name, error=WazuhError(1504))
+    filters = [ruleset.find('status', status)]
+    if names:
+        filters.append(ruleset.find('name', names))
+    if filename:
+        filters.append(ruleset.find('filename', [value for value in ruleset.indexes['filename'] if value in filename]))
+    if relative_dirname:
+        filters.append(ruleset.find('relative_dirname', [relative_dirname]))
+    positions = set.intersection(*filters)
+    if parents:
+        positions = {position for position in positions if 'parent' not in ruleset.items[position]['details']}
+    decoders = ruleset.get_items(positions)
+
+    for decoder_name in names:
+        if decoder_name not in ruleset.indexes['name']:
+            result.add_failed_item(id_=decoder_name, error=WazuhError(1504))
 
     data = process_array(decoders, search_text=search_text, search_in_fields=search_in_fields,
                          complementary_search=complementary_search, sort_by=sort_by, sort_ascending=sort_ascending,
                          allowed_sort_fields=SORT_FIELDS, offset=offset, select=select, limit=limit, q=q,
                          required_fields=REQUIRED_FIELDS, allowed_select_fields=DECODER_FIELDS)
-    result.affected_items = data['items']
+    # Decoders are shared with the ruleset cache
+    result.affected_items = deepcopy(data['items'])
     result.total_affected_items = data['totalItems']
 
     return result
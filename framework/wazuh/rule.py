@@ -2,6 +2,7 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+from copy import deepcopy
 from os import remove
 from os.path import exists, join
 from xml.parsers.expat import ExpatError
@@ -14,7 +15,7 @@ from wazuh.core.cluster.cluster import get_node
 from wazuh.core.cluster.utils import read_cluster_config
 from wazuh.core.exception import WazuhError
 from wazuh.core.results import AffectedItemsWazuhResult
-from wazuh.core.rule import check_status, load_rules_from_file, format_rule_decoder_file, REQUIRED_FIELDS, \
+from wazuh.core.rule import check_status, rules_cache, format_rule_decoder_file, REQUIRED_FIELDS, \
     RULE_REQUIREMENTS, SORT_FIELDS, RULE_FIELDS
 from wazuh.core.utils import process_array, safe_move, validate_wazuh_xml, upload_file, delete_file_with_backup, \
     to_relative_path
@@ -57,7 +58,6 @@ def get_rules(rule_ids=None, status=None, group=None, pci_dss=None, gpg13=None,
     result = AffectedItemsWazuhResult(none_msg='No rule was returned',
                                       some_msg='Some rules were not returned',
                                       all_msg='All selected rules were returned')
-    rules = list()
     if rule_ids is None:
         rule_ids = list()
     levels = None
@@ -67,38 +67,39 @@ def get_rules(rule_ids=None, status=None, group=None, pci_dss=None, gpg13=None,
         if len(levels) < 0 or len(levels) > 2:
             raise WazuhError(1203)
 
-    for rule_file in get_rules_files(limit=None).affected_items:
-        rules.extend(load_rules_from_file(rule_file['filename'], rule_file['relative_dirname'], rule_file['status']))
+    ruleset = rules_cache.get(get_rules_files(limit=None).affected_items)
 
     status = check_status(status)
     status = ['enabled', 'disabled'] if status == 'all' else [status]
     parameters = {'groups': group, 'pci_dss': pci_dss, 'gpg13': gpg13, 'gdpr': gdpr, 'hipaa': hipaa,
-                  'nist_800_53': nist_800_53, 'tsc': tsc, 'mitre': mitre, 'relative_dirname': relative_dirname,
-                  'filename': filename, 'id': rule_ids, 'level': levels, 'status': status}
-    original_rules = list(rules)
-    no_existent_ids = rule_ids[:]
-    for r in original_rules:
-        if r['id'] in no_existent_ids:
-            no_existent_ids.remove(r['id'])
-        for key, value in parameters.items():
-            if value:
-                if key == 'level' and (len(value) == 1 and int(value[0]) != r['level'] or len(value) == 2
-                                       and not int(value[0]) <= r['level'] <= int(value[1])) or \
-                        (key == 'id' and r[key] not in value) or \
-                        (key == 'filename' and r[key] not in filename) or \
-                        (key == 'status' and r[key] not in value) or \
-                        (not isinstance(value, list) and value not in r[key]):
-                    rules.remove(r)
-                    break
-
-    for rule_id in no_existent_ids:
-        result.add_failed_item(id_=rule_id, error=WazuhError(1208))
+                  'nist_800_53': nist_800_53, 'tsc': tsc, 'mitre': mitre}
+    filters = [ruleset.find('status', status)]
+    if rule_ids:
+        filters.append(ruleset.find('id', rule_ids))
+    if filename:
+        filters.append(ruleset.find('filename', [value for value in ruleset.indexes['filename'] if value in filename]))
+    if levels:
+        min_level, max_level = int(levels[0]), int(levels[-1])
+        filters.append(ruleset.find('level', [value for value in ruleset.indexes['level']
+                                              if min_level <= value <= max_level]))
+    if relative_dirname:
+        filters.append(ruleset.find('relative_dirname', [value for value in ruleset.indexes['relative_dirname']
+                                                         if relative_dirname in value]))
+    for key, value in parameters.items():
+        if value and not isinstance(value, list):
+            filters.append(ruleset.find(key, [value]))
+    rules = ruleset.get_items(set.intersection(*filters))
+
+    for rule_id in rule_ids:
+        if rule_id not in ruleset.indexes['id']:
+            result.add_failed_item(id_=rule_id, error=WazuhError(1208))
 
     data = process_array(rules, search_text=search_text, search_in_fields=search_in_fields,
                          complementary_search=complementary_search, select=select, sort_by=sort_by,
                          sort_ascending=sort_ascending, allowed_sort_fields=SORT_FIELDS, offset=offset,
                          limit=limit, q=q, required_fields=REQUIRED_FIELDS, allowed_select_fields=RULE_FIELDS)
-    result.affected_items = data['items']
+    # Rules are shared with the ruleset cache
+    result.affected_items = deepcopy(data['items'])
     result.total_affected_items = data['totalItems']
 
     return result
@@ -168,7 +169,7 @@ def get_groups(offset=0, limit=common.database_limit, sort_by=None, sort_ascendi
                                       some_msg='Some groups in rules were not returned',
                                       all_msg='All groups in rules were returned')
 
-    groups = {group for rule in get_rules(limit=None).affected_items for group in rule['groups']}
+    groups = set(rules_cache.get(get_rules_files(limit=None).affected_items).indexes['groups'])
 
     data = process_array(list(groups), search_text=search_text, search_in_fields=search_in_fields,
                          complementary_search=complementary_search, sort_by=sort_by, sort_ascending=sort_ascending,
@@ -202,7 +203,7 @@ def get_requirement(requirement=None, offset=0, limit=common.database_limit, sor
 
         return result
 
-    req = list({req for rule in get_rules(limit=None).affected_items for req in rule[requirement]})
+    req = list(rules_cache.get(get_rules_files(limit=None).affected_items).indexes[requirement])
 
     data = process_array(req, search_text=search_text, search_in_fields=search_in_fields,
                          complementary_search=complementary_search, sort_by=sort_by, sort_ascending=sort_ascending,
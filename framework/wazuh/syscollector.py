@@ -6,7 +6,8 @@ from wazuh.core import common
 from wazuh.core.agent import get_agents_info
 from wazuh.core.exception import WazuhError, WazuhResourceNotFound
 from wazuh.core.results import AffectedItemsWazuhResult, merge
-from wazuh.core.syscollector import WazuhDBQuerySyscollector, get_valid_fields, Type
+from wazuh.core.syscollector import WazuhDBQuerySyscollector, get_valid_fields, Type, inventory_index
+from wazuh.core.utils import run_concurrently, cut_array
 from wazuh.rbac.decorators import expose_resources
 
 
@@ -37,18 +38,20 @@ def get_item_agent(agent_list, offset=0, limit=common.database_limit, select=Non
         sort_ascending=[sort['order'] == 'asc' for _ in sort['fields']] if sort is not None else ['True']
     )
 
+    def get_agent_items(agent):
+        if agent not in system_agents:
+            raise WazuhResourceNotFound(1701)
+        table, valid_select_fields = get_valid_fields(Type(element_type), agent_id=agent)
+        with WazuhDBQuerySyscollector(agent_id=agent, offset=offset, limit=limit, select=select,
+                                      search=search,
+                                      sort=sort, filters=filters, fields=valid_select_fields, table=table,
+                                      array=array, nested=nested, query=q) as db_query:
+            return db_query.run()
+
     system_agents = get_agents_info()
-    for agent in agent_list:
+    for agent, query in run_concurrently(get_agent_items, agent_list):
         try:
-            if agent not in system_agents:
-                raise WazuhResourceNotFound(1701)
-            table, valid_select_fields = get_valid_fields(Type(element_type), agent_id=agent)
-            with WazuhDBQuerySyscollector(agent_id=agent, offset=offset, limit=limit, select=select,
-                                          search=search,
-                                          sort=sort, filters=filters, fields=valid_select_fields, table=table,
-                                          array=array, nested=nested, query=q) as db_query:
-                data = db_query.run()
-
+            data = query.result()
             for item in data['items']:
                 item['agent_id'] = agent
                 result.affected_items.append(item)
@@ -74,3 +77,53 @@ def get_item_agent(agent_list, offset=0, limit=common.database_limit, select=Non
                                   types=result.sort_casting)
 
     return result
+
+
+@expose_resources(actions=['syscollector:read'], resources=['agent:id:{agent_list}'])
+def get_agents_with_element(agent_list, element_type, element, offset=0, limit=common.database_limit):
+    """Get the agents whose syscollector inventory contains a package, hotfix or listening port.
+
+    The lookup is served by the inventory index, which reads again only the inventories of the agents that have
+    changed since they were indexed.
+
+    Parameters
+    ----------
+    agent_list : list
+        Agent IDs to look for the element in.
+    element_type : str
+        Type of the element: 'packages', 'hotfixes' or 'ports'.
+    element : list
+        Values identifying the element: package name and, optionally, version; hotfix ID; or port number and,
+        optionally, protocol.
+    offset : int
+        First item to return.
+    limit : int
+        Maximum number of items to return.
+
+    Returns
+    -------
+    AffectedItemsWazuhResult
+        IDs of the agents with the element.
+    """
+    result = AffectedItemsWazuhResult(all_msg='All agents with the specified element were returned',
+                                      none_msg='No agent with the specified element was found')
+
+    try:
+        element_type = Type(element_type)
+    except ValueError:
+        raise WazuhError(1104, extra_message=element_type)
+    if element_type not in inventory_index.indexed_elements:
+        raise WazuhError(1104, extra_message=element_type.value)
+    if element_type == Type.PORTS:
+        try:
+            element = [int(element[0]), *element[1:]]
+        except ValueError:
+            raise WazuhError(1109, extra_message=f'Port: {element[0]}')
+
+    inventory_index.refresh(agent_list)
+    agents = sorted(inventory_index.get_agents(element_type, *element) & set(agent_list), key=int)
+
+    result.affected_items = cut_array(agents, offset=offset, limit=limit)
+    result.total_affected_items = len(agents)
+
+    return result
@@ -48,6 +48,12 @@ full_agent_list = ['000', '001', '002', '003', '004', '005', '006', '007', '008'
 short_agent_list = ['000', '001', '002', '003', '004', '005']
 
 
+@pytest.fixture(scope='module', autouse=True)
+def mock_client_keys():
+    with patch('wazuh.core.common.client_keys', new=os.path.join(test_agent_path, 'client.keys')):
+        yield
+
+
 def send_msg_to_wdb(msg, raw=False):
     query = ' '.join(msg.split(' ')[2:])
     result = list(map(remove_nones_to_dict, map(dict, test_data.cur.execute(query).fetchall())))
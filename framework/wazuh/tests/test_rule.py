@@ -73,6 +73,12 @@ def mock_rules_path():
         yield
 
 
+@pytest.fixture(autouse=True)
+def clear_rules_cache():
+    # Some tests mock the content of the rule files
+    rule.rules_cache.clear()
+
+
 @pytest.mark.parametrize('func', [
     rule.get_rules_files,
     rule.get_rules
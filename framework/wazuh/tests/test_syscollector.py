@@ -20,6 +20,7 @@ with patch('wazuh.core.common.wazuh_uid'):
         wazuh.rbac.decorators.expose_resources = RBAC_bypasser
         from wazuh import syscollector
         from wazuh.core.results import AffectedItemsWazuhResult
+        from wazuh.core.exception import WazuhError
         from wazuh.core.syscollector import Type, get_valid_fields
 
 
@@ -125,3 +126,34 @@ def test_agent_elements(mock_agent_attr, mock_basic_info, mock_agents_info, elem
 
         assert isinstance(results, AffectedItemsWazuhResult)
         valid_fields_asserter(results.render())
+
+
+@pytest.mark.parametrize('element_type, element, expected_key', [
+    ('packages', ['openssl'], ('openssl',)),
+    ('packages', ['openssl', '1.1.1'], ('openssl', '1.1.1')),
+    ('hotfixes', ['KB123'], ('KB123',)),
+    ('ports', ['22', 'tcp'], (22, 'tcp'))
+])
+@patch('wazuh.syscollector.inventory_index')
+def test_get_agents_with_element(mock_index, element_type, element, expected_key):
+    """Test that get_agents_with_element returns the permitted agents found in the inventory index."""
+    mock_index.indexed_elements = {Type.PACKAGES: None, Type.HOTFIXES: None, Type.PORTS: None}
+    mock_index.get_agents.return_value = {'010', '001', '002'}
+
+    result = syscollector.get_agents_with_element(agent_list=['001', '002', '010'], element_type=element_type,
+                                                  element=element, offset=1)
+    mock_index.refresh.assert_called_once_with(['001', '002', '010'])
+    mock_index.get_agents.assert_called_once_with(Type(element_type), *expected_key)
+    assert result.affected_items == ['002', '010']
+    assert result.total_affected_items == 3
+
+
+@pytest.mark.parametrize('element_type, element, expected_code', [
+    ('os', ['value'], 1104),
+    ('unknown', ['value'], 1104),
+    ('ports', ['ssh', 'tcp'], 1109)
+])
+def test_get_agents_with_element_ko(element_type, element, expected_code):
+    """Test that get_agents_with_element raises an error with element types that are not indexed or wrong ports."""
+    with pytest.raises(WazuhError, match=f'.* {expected_code} .*'):
+        syscollector.get_agents_with_element(agent_list=['001'], element_type=element_type, element=element)